@@ -1,100 +1,3167 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_from_directory, g, Response, stream_with_context
 from flask_cors import CORS
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
 import io
 import csv
+import re
+import zipfile
+import mimetypes
+import gzip
+import hashlib
+import os
+from xml.sax.saxutils import escape as xml_escape
+import base64
+import binascii
+import queue
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from functools import lru_cache, wraps
+import bisect
+import heapq
+import itertools
+import sys
+import threading
+import unicodedata
+import time
+import click
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['X-Next-Cursor'])
 
 DATABASE = 'fme_tracker.db'
 
-def get_db():
-    """Connexion à la base de données"""
-    conn = sqlite3.connect(DATABASE)
+# Pagination de la liste des interventions
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Synchronisation delta : au-delà de CHANGES_MAX_ROWS interventions
+# modifiées, le client est invité à tout recharger
+CHANGES_MAX_ROWS = 1000
+TOMBSTONE_RETENTION_DAYS = 7
+
+# Connexions SQLite : réglages et taille du pool (par type de connexion)
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_CACHE_SIZE_KB = 16384
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+SQLITE_JOURNAL_SIZE_LIMIT = 64 * 1024 * 1024
+POOL_SIZE = 8
+
+# Longueur minimale d'une recherche pour utiliser MATCH (tokenizer trigram)
+FTS_MIN_QUERY_LENGTH = 3
+
+# Nombre de lignes insérées par transaction lors d'un import en masse
+BULK_CHUNK_SIZE = 1000
+
+# Nombre d'interventions copiées par transaction (commande compact-interventions)
+COMPACT_BATCH_SIZE = 5000
+
+# Archivage : âge minimal (jours depuis l'arrivée) des interventions
+# terminées déplacées vers la base d'archive, et taille des lots
+ARCHIVE_AFTER_DAYS = 90
+ARCHIVE_BATCH_SIZE = 5000
+
+# File d'écriture : nombre maximal de mutations validées par transaction,
+# et attente (ms) d'autres mutations avant de valider un lot. Avec 0, le
+# lot réunit les mutations arrivées pendant la validation du précédent,
+# sans retarder une mutation isolée. Désactivée (mesures de comparaison,
+# python -m bench writes), chaque mutation est validée seule par le thread
+# de sa requête, sur une connexion du pool d'écriture.
+WRITE_QUEUE_ENABLED = True
+WRITE_BATCH_SIZE = 64
+WRITE_MAX_WAIT_MS = 0
+
+# Nombre maximal d'entrées du cache des tables de référence
+LOOKUP_CACHE_SIZE = 10000
+
+# Flux d'événements : taille de la file par client et intervalle
+# des commentaires de maintien de connexion
+EVENT_QUEUE_SIZE = 100
+EVENT_HEARTBEAT_SECONDS = 15
+
+# Compression gzip des réponses JSON et HTML à partir de cette taille (octets)
+GZIP_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+
+# Nombre de lignes lues à la fois pendant un export
+EXPORT_BATCH_SIZE = 500
+
+# Formats compacts des listes (paramètre format) : noms de colonnes une
+# seule fois, puis une liste de valeurs par ligne (rows) ou par colonne
+# (columnar). Sans format, chaque ligne est un objet.
+LIST_FORMATS = ('rows', 'columnar')
+
+# Listes de référence de /api/bootstrap (paramètre lists : toutes par défaut)
+BOOTSTRAP_LISTS = ('sites', 'companies', 'fme', 'suggestions')
+
+# Cache des réponses GET (listes, recherches, statistiques) : corps JSON
+# déjà encodés, par route et paramètres. Chaque écriture de l'application
+# incrémente la génération, ce qui périme toutes les entrées ;
+# RESULT_CACHE_MAX_AGE (secondes) borne en plus leur durée de vie, pour les
+# écritures faites par un autre processus (commandes flask). Éviction LRU
+# au-delà de RESULT_CACHE_MAX_BYTES ; une réponse plus grande que
+# RESULT_CACHE_MAX_ENTRY_BYTES n'est pas conservée.
+RESULT_CACHE_ENABLED = True
+RESULT_CACHE_MAX_BYTES = 32 * 2 ** 20
+RESULT_CACHE_MAX_ENTRY_BYTES = 2 * 2 ** 20
+RESULT_CACHE_MAX_AGE = 30
+
+# Autocomplétion du formulaire (/api/autocomplete) : sites, FME, entreprises
+# et actions indexés en mémoire par préfixe, classés par usage récent (une
+# intervention compte deux fois moins tous les AUTOCOMPLETE_HALF_LIFE_DAYS
+# jours). Quand plus de AUTOCOMPLETE_SCAN_LIMIT termes commencent par le
+# préfixe, les éléments sont parcourus du mieux classé au moins bien classé.
+# Une recherche attend l'index au plus AUTOCOMPLETE_READY_WAIT_MS ; au-delà
+# (index en construction ou en échec), les listes sont filtrées en SQL.
+AUTOCOMPLETE_KINDS = ('sites', 'fme', 'companies', 'actions')
+AUTOCOMPLETE_HALF_LIFE_DAYS = 30
+AUTOCOMPLETE_DEFAULT_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+AUTOCOMPLETE_SCAN_LIMIT = 256
+AUTOCOMPLETE_READY_WAIT_MS = 100
+
+# Tableau de bord précompilé par python frontend/build.py : fichiers nommés
+# d'après leur contenu, donc mis en cache par le navigateur sans revalidation
+FRONTEND_DIST = 'dist'
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+# Instrumentation exposée par /metrics : durées des requêtes HTTP et des
+# instructions SQL (bornes des histogrammes en ms). Les instructions plus
+# lentes que SLOW_QUERY_MS sont journalisées avec leur plan d'exécution.
+# Désactivée par défaut : les connexions SQLite ne sont alors pas enveloppées.
+# Les instructions sont étiquetées par une empreinte de leur texte normalisé,
+# au plus METRICS_MAX_STATEMENTS séries (les suivantes comptées ensemble
+# sous « other ») ; le texte est donné par /api/metrics/statements.
+METRICS_ENABLED = False
+METRICS_BUCKETS_MS = [1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+METRICS_MAX_STATEMENTS = 200
+SLOW_QUERY_MS = 200
+SLOW_QUERY_LOG_SIZE = 100
+
+# Maintenance périodique par un thread de l'application : intervalle de
+# chaque tâche en secondes (0 = désactivée), la première exécution ayant
+# lieu un intervalle après le démarrage. ANALYZE échantillonné (au plus
+# ANALYZE_ROW_LIMIT lignes par index) après ANALYZE_MIN_CHANGES écritures ;
+# espace libre récupéré par pas de VACUUM_STEP_PAGES pages au-delà de
+# VACUUM_MIN_FREE_PAGES (auto_vacuum = INCREMENTAL).
+MAINTENANCE_ENABLED = True
+MAINTENANCE_TICK_SECONDS = 30
+MAINTENANCE_INTERVALS = {
+    'analyze': 6 * 3600,
+    'checkpoint': 300,
+    'vacuum': 600,
+    'backup': 24 * 3600,
+}
+ANALYZE_ROW_LIMIT = 1000
+ANALYZE_MIN_CHANGES = 1000
+VACUUM_MIN_FREE_PAGES = 256
+VACUUM_STEP_PAGES = 128
+VACUUM_MAX_STEPS = 64
+
+# Sauvegardes en ligne : dossier, nombre de copies gardées par base, et
+# copie par pas de BACKUP_STEP_PAGES pages séparés de BACKUP_STEP_SLEEP_MS
+BACKUP_DIR = 'backups'
+BACKUP_KEEP = 7
+BACKUP_STEP_PAGES = 64
+BACKUP_STEP_SLEEP_MS = 20
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _prometheus_labels(labels):
+    """Étiquettes Prometheus {nom="valeur",...} (valeurs échappées)"""
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+class Metrics:
+    """Mesures en mémoire, exposées au format Prometheus par /metrics.
+    
+    Requêtes HTTP par route (nombre par statut, histogramme des durées,
+    octets envoyés) et instructions SQL par empreinte du texte normalisé
+    (nombre, durée cumulée, lignes lues), en nombre de séries borné par
+    max_statements, plus un histogramme de toutes les instructions.
+    Les instructions lentes sont gardées dans slow_queries, avec leurs
+    paramètres et leur plan d'exécution.
+    """
+    
+    def __init__(self, buckets_ms, slow_ms, slow_log_size, max_statements):
+        self.buckets = [bound / 1000 for bound in buckets_ms]
+        self.slow_seconds = slow_ms / 1000
+        # Réentrant : un curseur finalisé pendant un enregistrement peut en déclencher un autre
+        self.lock = threading.RLock()
+        self.requests = {}
+        self.request_durations = {}
+        self.response_bytes = {}
+        self.max_statements = max_statements
+        self.statements = {}
+        self.statement_texts = {}
+        self.sql_durations = self._histogram()
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self.slow_total = 0
+    
+    def _histogram(self):
+        # Effectif de chaque intervalle (le dernier au-delà de la plus grande borne), somme, nombre
+        return [0] * (len(self.buckets) + 1) + [0.0, 0]
+    
+    def _observe(self, histogram, seconds):
+        histogram[bisect.bisect_left(self.buckets, seconds)] += 1
+        histogram[-2] += seconds
+        histogram[-1] += 1
+    
+    def observe_request(self, method, route, status, seconds):
+        with self.lock:
+            key = (method, route, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.request_durations.setdefault((method, route), self._histogram())
+            self._observe(histogram, seconds)
+    
+    def observe_bytes(self, method, route, size):
+        with self.lock:
+            self.response_bytes[(method, route)] = self.response_bytes.get((method, route), 0) + size
+    
+    def count_stream(self, chunks, method, route):
+        """Envelopper une réponse envoyée au fil de l'eau pour compter ses octets"""
+        size = 0
+        try:
+            for chunk in chunks:
+                size += len(chunk) if isinstance(chunk, bytes) else len(chunk.encode('utf-8'))
+                yield chunk
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+            self.observe_bytes(method, route, size)
+    
+    def observe_statement(self, sql, seconds, rows):
+        statement = statement_id(sql)
+        with self.lock:
+            if statement not in self.statements:
+                if len(self.statement_texts) < self.max_statements:
+                    self.statement_texts[statement] = normalize_sql(sql)
+                else:
+                    statement = 'other'
+            totals = self.statements.setdefault(statement, [0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += rows
+            self._observe(self.sql_durations, seconds)
+    
+    def record_slow(self, conn, sql, parameters, seconds, rows):
+        """Journaliser une instruction lente avec son plan d'exécution"""
+        try:
+            # Curseur non instrumenté : le plan ne doit pas être mesuré lui-même
+            plan = [row[3] for row in sqlite3.Cursor(conn).execute('EXPLAIN QUERY PLAN ' + sql, parameters)]
+        except sqlite3.Error:
+            plan = None
+        entry = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'duration_ms': round(seconds * 1000, 1),
+            'rows': rows,
+            'statement': statement_id(sql),
+            'sql': ' '.join(sql.split()),
+            'parameters': repr(parameters)[:500],
+            'plan': plan,
+        }
+        with self.lock:
+            self.slow_queries.append(entry)
+            self.slow_total += 1
+        app.logger.warning('Requête SQL lente (%.1f ms, %d ligne(s)) : %s %s ; plan : %s',
+                           seconds * 1000, rows, entry['sql'], entry['parameters'], plan)
+    
+    def render(self, gauges):
+        """Texte Prometheus des mesures et des jauges [(nom, type, aide, {étiquettes: valeur})]"""
+        lines = []
+    
+        def family(name, kind, description, samples):
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{name}{_prometheus_labels(labels)} {value}')
+    
+        def histogram(name, description, series):
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} histogram')
+            for labels, values in series:
+                cumulative = 0
+                for bound, count in zip(self.buckets + ['+Inf'], values[:-2]):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_prometheus_labels({**labels, "le": bound})} {cumulative}')
+                lines.append(f'{name}_sum{_prometheus_labels(labels)} {values[-2]}')
+                lines.append(f'{name}_count{_prometheus_labels(labels)} {values[-1]}')
+    
+        with self.lock:
+            family('fme_http_requests_total', 'counter', 'Requêtes HTTP traitées', [
+                ({'method': method, 'route': route, 'status': status}, count)
+                for (method, route, status), count in sorted(self.requests.items())
+            ])
+            histogram('fme_http_request_duration_seconds', 'Durée de traitement des requêtes HTTP', [
+                ({'method': method, 'route': route}, list(values))
+                for (method, route), values in sorted(self.request_durations.items())
+            ])
+            family('fme_http_response_bytes_total', 'counter', 'Octets envoyés (après compression)', [
+                ({'method': method, 'route': route}, size)
+                for (method, route), size in sorted(self.response_bytes.items())
+            ])
+            statements = sorted(self.statements.items())
+            family('fme_sql_statements_total', 'counter', 'Instructions SQL exécutées',
+                   [({'statement': statement}, totals[0]) for statement, totals in statements])
+            family('fme_sql_statement_seconds_total', 'counter', 'Durée cumulée des instructions SQL (lecture des lignes comprise)',
+                   [({'statement': statement}, totals[1]) for statement, totals in statements])
+            family('fme_sql_rows_total', 'counter', 'Lignes lues par instruction SQL',
+                   [({'statement': statement}, totals[2]) for statement, totals in statements])
+            histogram('fme_sql_duration_seconds', 'Durée des instructions SQL', [({}, list(self.sql_durations))])
+            family('fme_sql_slow_statements_total', 'counter', f'Instructions SQL de plus de {self.slow_seconds * 1000:g} ms',
+                   [({}, self.slow_total)])
+    
+        for name, kind, description, samples in gauges:
+            family(name, kind, description, samples)
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics(METRICS_BUCKETS_MS, SLOW_QUERY_MS, SLOW_QUERY_LOG_SIZE, METRICS_MAX_STATEMENTS)
+
+_SQL_MARKS = re.compile(r'\?(\s*,\s*\?)+')
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """Texte d'une instruction pour les mesures : espaces réduits, listes
+    de paramètres IN (?, ?, ...) de longueur variable confondues"""
+    return _SQL_MARKS.sub('?, ...', ' '.join(sql.split()))
+
+@lru_cache(maxsize=1024)
+def statement_id(sql):
+    """Étiquette d'une instruction dans /metrics : empreinte courte de son texte normalisé"""
+    return hashlib.sha1(normalize_sql(sql).encode('utf-8')).hexdigest()[:12]
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Curseur chronométré : la durée d'une instruction comprend son
+    exécution et la lecture de ses lignes. Elle est enregistrée quand
+    l'instruction se termine (lignes épuisées, instruction suivante,
+    fermeture ou destruction du curseur)."""
+    
+    _statement = None
+    _elapsed = 0.0
+    _rows = 0
+    
+    def execute(self, sql, parameters=()):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._statement = (sql, parameters)
+            self._elapsed = time.perf_counter() - start
+            self._rows = 0
+    
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            # Le plan d'une instruction répétée est calculé sans valeurs
+            self._statement = (sql, (None,) * sql.count('?'))
+            self._elapsed = time.perf_counter() - start
+            self._rows = 0
+    
+    def fetchone(self):
+        if self._statement is None:
+            return super().fetchone()
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._elapsed += time.perf_counter() - start
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+    
+    def fetchmany(self, size=None):
+        if size is None:
+            size = self.arraysize
+        if self._statement is None:
+            return super().fetchmany(size)
+        start = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._elapsed += time.perf_counter() - start
+        self._rows += len(rows)
+        if len(rows) < size:
+            self._finish()
+        return rows
+    
+    def fetchall(self):
+        if self._statement is None:
+            return super().fetchall()
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._elapsed += time.perf_counter() - start
+        self._rows += len(rows)
+        self._finish()
+        return rows
+    
+    def __next__(self):
+        if self._statement is None:
+            return super().__next__()
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._elapsed += time.perf_counter() - start
+            self._finish()
+            raise
+        self._elapsed += time.perf_counter() - start
+        self._rows += 1
+        return row
+    
+    def close(self):
+        self._finish()
+        super().close()
+    
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            # Connexion déjà fermée ou interpréteur en cours d'arrêt
+            pass
+    
+    def _finish(self):
+        if self._statement is None:
+            return
+        sql, parameters = self._statement
+        self._statement = None
+        metrics.observe_statement(sql, self._elapsed, self._rows)
+        if self._elapsed >= metrics.slow_seconds:
+            metrics.record_slow(self.connection, sql, parameters, self._elapsed, self._rows)
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connexion dont tous les curseurs (conn.execute compris) sont chronométrés"""
+    
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def archive_database():
+    """Fichier de la base d'archive, à côté de DATABASE"""
+    root, extension = os.path.splitext(DATABASE)
+    return f'{root}_archive{extension}'
+
+def connect_db(readonly=False):
+    """Ouvrir une connexion SQLite configurée, base d'archive attachée"""
+    factory = InstrumentedConnection if METRICS_ENABLED else sqlite3.Connection
+    conn = sqlite3.connect(DATABASE, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, check_same_thread=False, factory=factory)
     conn.row_factory = sqlite3.Row
+    conn.execute(f'PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size = {SQLITE_MMAP_SIZE}')
+    conn.execute('ATTACH DATABASE ? AS archive', (archive_database(),))
+    # Fichiers WAL ramenés à cette taille après chaque checkpoint complet
+    for schema in ('main', 'archive'):
+        conn.execute(f'PRAGMA {schema}.journal_size_limit = {SQLITE_JOURNAL_SIZE_LIMIT}')
+    conn.execute(HISTORY_VIEW)
+    if readonly:
+        conn.execute('PRAGMA query_only = ON')
     return conn
 
+def _get_pool(readonly):
+    """Pool de connexions pour la base courante (lecture ou écriture)"""
+    key = (DATABASE, readonly)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = queue.LifoQueue(maxsize=POOL_SIZE)
+        return _pools[key]
+
+def _acquire_db(readonly):
+    try:
+        return _get_pool(readonly).get_nowait()
+    except queue.Empty:
+        return connect_db(readonly)
+
+def _release_db(conn, readonly):
+    # Une transaction laissée ouverte (exception, return anticipé) est annulée
+    if conn.in_transaction:
+        conn.rollback()
+    try:
+        _get_pool(readonly).put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+def run_blocking(function, *args):
+    """Exécuter function(*args). Sous gevent (gunicorn -k gevent, voir
+    gunicorn.conf.py), l'appel part dans un thread système du pool du hub :
+    SQLite ne rend pas la main à la boucle d'événements, et un long appel y
+    figerait toutes les requêtes et tous les flux /api/events. function ne
+    doit alors faire que du SQL ou du calcul (ni file, ni événement gevent).
+    """
+    monkey = sys.modules.get('gevent.monkey')
+    if monkey is None or not monkey.is_module_patched('threading'):
+        return function(*args)
+    import gevent
+    return gevent.get_hub().threadpool.apply(function, args)
+
+class WriteQueue:
+    """Thread écrivain unique : les mutations des requêtes sont exécutées
+    par lots, une transaction (et un verrou d'écriture) par lot.
+    
+    submit(job) renvoie un Future. job(cursor) s'exécute dans le thread
+    écrivain, dans un SAVEPOINT : une exception n'annule que ce job et est
+    relancée par Future.result(). Le résultat n'est disponible qu'après le
+    COMMIT du lot ; caches et événements sont mis à jour par la requête,
+    après result().
+    """
+    
+    def __init__(self, batch_size, max_wait_ms):
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.batches = 0
+        self.committed = 0
+    
+    def submit(self, job):
+        if not WRITE_QUEUE_ENABLED:
+            return self._submit_direct(job)
+        future = Future()
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='write-queue', daemon=True)
+                self.thread.start()
+        self.jobs.put((job, future))
+        return future
+    
+    def _submit_direct(self, job):
+        """Exécuter job tout de suite, seul dans sa transaction (file désactivée)"""
+        future = Future()
+        conn = _acquire_db(readonly=False)
+        try:
+            (result, error), = run_blocking(self._execute, conn, [job])
+        except Exception as e:
+            future.set_exception(e)
+            return future
+        finally:
+            _release_db(conn, readonly=False)
+        with self.lock:
+            self.batches += 1
+            self.committed += 1
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+        return future
+    
+    def stats(self):
+        with self.lock:
+            return {'batches': self.batches, 'jobs': self.committed, 'pending': self.jobs.qsize()}
+    
+    def _next_batch(self):
+        """Attendre une mutation, puis regrouper celles qui arrivent dans max_wait"""
+        batch = [self.jobs.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.jobs.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        conn = None
+        database = None
+        while True:
+            batch = self._next_batch()
+            # Connexion rouverte si la base a changé
+            if database != DATABASE:
+                if conn is not None:
+                    conn.close()
+                    conn = None
+                try:
+                    conn = connect_db()
+                except Exception as e:
+                    for _, future in batch:
+                        future.set_exception(e)
+                    continue
+                database = DATABASE
+            self._commit(conn, batch)
+    
+    @staticmethod
+    def _execute(conn, jobs):
+        """Exécuter les jobs dans une transaction : [(résultat, exception)]"""
+        cursor = conn.cursor()
+        outcomes = []
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            for job in jobs:
+                cursor.execute('SAVEPOINT job')
+                try:
+                    outcomes.append((job(cursor), None))
+                except Exception as e:
+                    cursor.execute('ROLLBACK TO job')
+                    outcomes.append((None, e))
+                cursor.execute('RELEASE job')
+            conn.commit()
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        return outcomes
+    
+    def _commit(self, conn, batch):
+        # Futures résolus ici, dans le thread de la file, et non dans le
+        # thread système de run_blocking
+        try:
+            outcomes = run_blocking(self._execute, conn, [job for job, _ in batch])
+        except Exception as e:
+            # Verrou, disque ou job ayant invalidé la transaction : tout le lot échoue
+            for _, future in batch:
+                future.set_exception(e)
+            return
+    
+        with self.lock:
+            self.batches += 1
+            self.committed += len(batch)
+        for (_, future), (result, error) in zip(batch, outcomes):
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+write_queue = WriteQueue(WRITE_BATCH_SIZE, WRITE_MAX_WAIT_MS)
+
+class MaintenanceScheduler:
+    """Thread de maintenance : exécute chaque tâche (nom -> fonction) tous
+    les intervals[nom] secondes, sur la base courante.
+    
+    Les tâches qui écrivent passent par write_queue, en petits pas entre
+    les mutations. Une erreur est journalisée et comptée sans arrêter le
+    thread ; la dernière exécution de chaque tâche est exposée par stats().
+    """
+    
+    def __init__(self, tasks, intervals, tick_seconds):
+        self.tasks = tasks
+        self.intervals = intervals
+        self.tick = tick_seconds
+        self.lock = threading.Lock()
+        self.thread = None
+        self.runs = {name: {'runs': 0, 'failures': 0, 'last_run': None, 'duration_ms': None,
+                            'result': None, 'error': None} for name in tasks}
+    
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='maintenance', daemon=True)
+                self.thread.start()
+    
+    def run(self, name):
+        """Exécuter une tâche maintenant et enregistrer son résultat"""
+        started = time.time()
+        result = error = None
+        try:
+            result = self.tasks[name]()
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+            app.logger.exception('Maintenance %s en échec', name)
+        with self.lock:
+            run = self.runs[name]
+            run['runs'] += 1
+            run['failures'] += error is not None
+            run['last_run'] = started
+            run['duration_ms'] = round((time.time() - started) * 1000, 1)
+            run['result'] = result
+            run['error'] = error
+        return result
+    
+    def stats(self):
+        with self.lock:
+            return {name: {**run, 'interval_seconds': self.intervals.get(name, 0)} for name, run in self.runs.items()}
+    
+    def _run(self):
+        now = time.monotonic()
+        due = {name: now + interval for name, interval in self.intervals.items() if interval and name in self.tasks}
+        while True:
+            time.sleep(self.tick)
+            for name in sorted(due):
+                if time.monotonic() >= due[name]:
+                    self.run(name)
+                    due[name] = time.monotonic() + self.intervals[name]
+
+# Version de synchronisation au dernier ANALYZE, par base
+_analyzed_versions = {}
+
+def maintenance_analyze():
+    """Mettre à jour les statistiques de l'optimiseur (ANALYZE échantillonné)
+    si au moins ANALYZE_MIN_CHANGES écritures ont eu lieu depuis le précédent"""
+    conn = connect_db(readonly=True)
+    try:
+        version = conn.execute('SELECT version FROM sync_state WHERE id = 1').fetchone()[0]
+    finally:
+        conn.close()
+    previous = _analyzed_versions.get(DATABASE)
+    if previous is not None and version - previous < ANALYZE_MIN_CHANGES:
+        return {'skipped': True, 'changes': version - previous}
+    
+    def job(cursor):
+        cursor.execute(f'PRAGMA analysis_limit = {ANALYZE_ROW_LIMIT}')
+        cursor.execute('ANALYZE main')
+        cursor.execute('ANALYZE archive')
+    
+    write_queue.submit(job).result()
+    _analyzed_versions[DATABASE] = version
+    return {'skipped': False, 'changes': None if previous is None else version - previous}
+
+def maintenance_checkpoint():
+    """Reporter le WAL dans les bases sans attendre les lecteurs ni bloquer
+    l'écrivain (checkpoint PASSIVE) ; renvoie les pages du WAL et celles reportées"""
+    conn = connect_db()
+    try:
+        result = {}
+        for schema in ('main', 'archive'):
+            busy, log, checkpointed = conn.execute(f'PRAGMA {schema}.wal_checkpoint(PASSIVE)').fetchone()
+            result[schema] = {'busy': busy, 'log_pages': log, 'checkpointed_pages': checkpointed}
+        return result
+    finally:
+        conn.close()
+
+def maintenance_vacuum():
+    """Rendre au système les pages libres (suppressions, archivage) par pas
+    de VACUUM_STEP_PAGES, chacun un job de write_queue entre les mutations"""
+    conn = connect_db(readonly=True)
+    try:
+        free = {}
+        for schema in ('main', 'archive'):
+            # 2 = INCREMENTAL ; les bases créées avant restent à 0 jusqu'à vacuum-db
+            if conn.execute(f'PRAGMA {schema}.auto_vacuum').fetchone()[0] == 2:
+                free[schema] = conn.execute(f'PRAGMA {schema}.freelist_count').fetchone()[0]
+    finally:
+        conn.close()
+    
+    reclaimed = {}
+    for schema, pages in free.items():
+        if pages < VACUUM_MIN_FREE_PAGES:
+            continue
+        steps = min(-(-pages // VACUUM_STEP_PAGES), VACUUM_MAX_STEPS)
+    
+        def job(cursor, schema=schema):
+            # Le module sqlite3 n'exécute qu'un pas de la pragma, qui libère
+            # alors une seule page : une instruction par page
+            for _ in range(VACUUM_STEP_PAGES):
+                cursor.execute(f'PRAGMA {schema}.incremental_vacuum(1)')
+            return cursor.execute(f'PRAGMA {schema}.freelist_count').fetchone()[0]
+    
+        remaining = pages
+        for _ in range(steps):
+            remaining = write_queue.submit(job).result()
+            if remaining == 0:
+                break
+        reclaimed[schema] = pages - remaining
+    return {'free_pages': free, 'reclaimed_pages': reclaimed}
+
+def backup_database():
+    """Sauvegarder en ligne la base principale et l'archive dans BACKUP_DIR
+    (API de sauvegarde de SQLite) ; renvoie les fichiers écrits.
+    
+    La copie se fait dans une transaction de lecture : c'est un instantané
+    cohérent, que les écritures concurrentes ne font pas recommencer, et
+    qui ne bloque ni les lecteurs ni l'écrivain (WAL). Elle avance par pas
+    de BACKUP_STEP_PAGES pages, avec une pause entre deux pas pour laisser
+    le disque aux requêtes. Seules les BACKUP_KEEP dernières copies de
+    chaque base sont gardées.
+    """
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    conn = connect_db(readonly=True)
+    files = {}
+    try:
+        conn.execute('BEGIN')
+        for schema in ('main', 'archive'):
+            conn.execute(f'SELECT COUNT(*) FROM {schema}.sqlite_master').fetchone()
+    
+        for schema, source in (('main', DATABASE), ('archive', archive_database())):
+            root, extension = os.path.splitext(os.path.basename(source))
+            path = os.path.join(BACKUP_DIR, f'{root}-{stamp}{extension}')
+            steps = []
+    
+            def pause(status, remaining, total):
+                steps.append(time.perf_counter())
+                time.sleep(BACKUP_STEP_SLEEP_MS / 1000)
+    
+            started = time.perf_counter()
+            target = sqlite3.connect(path + '.partial')
+            try:
+                conn.backup(target, pages=BACKUP_STEP_PAGES, name=schema, progress=pause)
+            finally:
+                target.close()
+            os.replace(path + '.partial', path)
+            # Durée du pas le plus long (copie seule, pause exclue)
+            bounds = [started] + [step + BACKUP_STEP_SLEEP_MS / 1000 for step in steps[:-1]]
+            longest = max((end - start for start, end in zip(bounds, steps)), default=0)
+            files[schema] = {'path': path, 'bytes': os.path.getsize(path), 'steps': len(steps),
+                             'longest_step_ms': round(longest * 1000, 1)}
+            prune_backups(root, extension)
+    finally:
+        conn.rollback()
+        conn.close()
+    return files
+
+def prune_backups(root, extension):
+    """Supprimer les copies de la base root au-delà des BACKUP_KEEP plus récentes"""
+    pattern = re.compile(re.escape(root) + r'-\d{8}-\d{6}' + re.escape(extension) + '$')
+    copies = sorted(name for name in os.listdir(BACKUP_DIR) if pattern.match(name))
+    for name in copies[:-BACKUP_KEEP] if BACKUP_KEEP else []:
+        os.remove(os.path.join(BACKUP_DIR, name))
+
+# analyze et vacuum écrivent par write_queue ; checkpoint et sauvegarde ne
+# font que du SQL, confié à run_blocking
+maintenance = MaintenanceScheduler({
+    'analyze': maintenance_analyze,
+    'checkpoint': lambda: run_blocking(maintenance_checkpoint),
+    'vacuum': maintenance_vacuum,
+    'backup': lambda: run_blocking(backup_database),
+}, MAINTENANCE_INTERVALS, MAINTENANCE_TICK_SECONDS)
+
+class LookupCache:
+    """Cache LRU borné des tables de référence utilisées à l'écriture.
+    
+    Clés : ('company', nom) -> id, ('fme', nom, company_id) -> (id, téléphone),
+    ('site', t_number) -> (id, nom du site), ('label', libellé) -> id. Ces
+    lignes ne sont jamais supprimées
+    ni renommées ; seul le téléphone d'un FME change, et il est remis à jour
+    après chaque écriture validée.
+    """
+    
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.database = None
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+    
+    def _check_database(self):
+        # Les entrées ne valent que pour la base sur laquelle elles ont été lues
+        if self.database != DATABASE:
+            self.entries.clear()
+            self.database = DATABASE
+    
+    def get(self, key):
+        with self.lock:
+            self._check_database()
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+    
+    def update(self, values):
+        """Enregistrer des valeurs lues ou écrites (après commit uniquement)"""
+        with self.lock:
+            self._check_database()
+            for key, value in values.items():
+                self.entries[key] = value
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+    
+    def invalidate(self, key=None):
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+    
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0
+            }
+
+lookup_cache = LookupCache(LOOKUP_CACHE_SIZE)
+
+def resolve_company(cursor, company_name, pending):
+    """Id de l'entreprise (créée si besoin) ; pending reçoit les entrées à mettre en cache"""
+    company_id = lookup_cache.get(('company', company_name))
+    if company_id is not None:
+        return company_id
+    
+    cursor.execute('SELECT id FROM companies WHERE company_name = ?', (company_name,))
+    company = cursor.fetchone()
+    
+    if company:
+        company_id = company['id']
+    else:
+        cursor.execute('INSERT INTO companies (company_name) VALUES (?)', (company_name,))
+        company_id = cursor.lastrowid
+    
+    pending[('company', company_name)] = company_id
+    return company_id
+
+def resolve_label(cursor, name, pending):
+    """Id du libellé name (action, état ou statut), créé si besoin"""
+    if name is None:
+        return None
+    label_id = lookup_cache.get(('label', name))
+    if label_id is not None:
+        return label_id
+    
+    cursor.execute('INSERT OR IGNORE INTO labels (name) VALUES (?)', (name,))
+    cursor.execute('SELECT id FROM labels WHERE name = ?', (name,))
+    label_id = cursor.fetchone()['id']
+    
+    pending[('label', name)] = label_id
+    return label_id
+
+class EventBroadcaster:
+    """Diffusion des événements aux abonnés du flux /api/events.
+    
+    Chaque abonné possède une file bornée : un client trop lent ne bloque
+    jamais l'écriture. Si sa file déborde, elle est vidée et remplacée par
+    un unique événement 'resync' qui invite le client à se resynchroniser.
+    """
+    
+    def __init__(self, queue_size):
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.lock = threading.Lock()
+    
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self.lock:
+            self.subscribers.add(subscriber)
+        return subscriber
+    
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+    
+    def publish(self, event, data):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait((event, data))
+            except queue.Full:
+                self._overflow(subscriber)
+    
+    def _overflow(self, subscriber):
+        while True:
+            try:
+                subscriber.get_nowait()
+            except queue.Empty:
+                break
+        subscriber.put_nowait(('resync', {}))
+    
+    def count(self):
+        with self.lock:
+            return len(self.subscribers)
+
+events = EventBroadcaster(EVENT_QUEUE_SIZE)
+
+class ReferenceCache:
+    """Versions en mémoire des tables de référence et réponses associées.
+    
+    Chaque écriture validée incrémente la version des tables touchées
+    (bump) ; les listes de référence sont servies depuis la mémoire, avec
+    leur variante gzip, tant que leurs tables n'ont pas changé. Le jeton
+    de démarrage invalide les ETags émis par un processus précédent.
+    """
+    
+    def __init__(self):
+        self.database = None
+        self.boot = None
+        self.versions = {}
+        self.entries = {}
+        self.lock = threading.Lock()
+    
+    def _check_database(self):
+        if self.database != DATABASE:
+            self.database = DATABASE
+            self.boot = format(int(datetime.now().timestamp() * 1000), 'x')
+            self.versions.clear()
+            self.entries.clear()
+    
+    def tag(self, name, tables):
+        with self.lock:
+            self._check_database()
+            return '-'.join([name, self.boot] + [str(self.versions.get(table, 0)) for table in tables])
+    
+    def bump(self, *tables):
+        with self.lock:
+            self._check_database()
+            for table in tables:
+                self.versions[table] = self.versions.get(table, 0) + 1
+    
+    def body(self, name, tag, build):
+        """Corps JSON (brut, gzip) de la liste name pour la version tag"""
+        with self.lock:
+            entry = self.entries.get(name)
+        if entry and entry[0] == tag:
+            return entry[1], entry[2]
+    
+        body = app.json.dumps(build()).encode('utf-8')
+        gzipped = gzip.compress(body, GZIP_LEVEL)
+        with self.lock:
+            self.entries[name] = (tag, body, gzipped)
+        return body, gzipped
+    
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'versions': dict(self.versions)}
+
+reference_cache = ReferenceCache()
+
+class ResultCache:
+    """Réponses GET déjà sérialisées, par route et paramètres de requête.
+    
+    Une entrée est un tuple (génération, date, tag, corps, corps gzip,
+    en-têtes) ; la variante gzip n'est calculée qu'à la première demande.
+    bump() incrémente la génération après chaque écriture validée : les
+    entrées d'une génération antérieure, comme celles plus vieilles que
+    max_age, sont retirées à leur prochaine lecture. La taille totale des
+    corps est bornée à max_bytes, les moins récemment lus partant d'abord.
+    """
+    
+    def __init__(self, max_bytes, max_entry_bytes, max_age):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.max_age = max_age
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.generation = 0
+        self.stored = 0
+        self.database = None
+        self.boot = None
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+    
+    def _check_database(self):
+        # Générations et entrées ne valent que pour la base courante
+        if self.database != DATABASE:
+            self.database = DATABASE
+            self.boot = format(int(datetime.now().timestamp() * 1000), 'x')
+            self.entries.clear()
+            self.bytes = 0
+    
+    @staticmethod
+    def _size(entry):
+        return len(entry[3]) + len(entry[4] or b'')
+    
+    def _evict(self):
+        while self.bytes > self.max_bytes:
+            _, entry = self.entries.popitem(last=False)
+            self.bytes -= self._size(entry)
+            self.evictions += 1
+    
+    def bump(self):
+        with self.lock:
+            self._check_database()
+            self.generation += 1
+    
+    def get(self, key):
+        """(entrée valide pour key ou None, génération courante)"""
+        with self.lock:
+            self._check_database()
+            entry = self.entries.get(key)
+            if entry is not None and (entry[0] != self.generation or time.monotonic() - entry[1] > self.max_age):
+                del self.entries[key]
+                self.bytes -= self._size(entry)
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            return entry, self.generation
+    
+    def put(self, key, generation, body, headers):
+        """Entrée pour un corps calculé à la génération generation ; conservée
+        seulement si aucune écriture n'a eu lieu entre-temps"""
+        with self.lock:
+            self._check_database()
+            self.stored += 1
+            entry = (generation, time.monotonic(), f'r{self.boot}-{generation}-{self.stored}', body, None, headers)
+            if generation == self.generation and len(body) <= self.max_entry_bytes:
+                previous = self.entries.pop(key, None)
+                if previous is not None:
+                    self.bytes -= self._size(previous)
+                self.entries[key] = entry
+                self.bytes += len(body)
+                self._evict()
+            return entry
+    
+    def bodies(self, key, entry):
+        """Corps (brut, gzip) de l'entrée, gzip compressé au premier client qui l'accepte"""
+        body, gzipped = entry[3], entry[4]
+        if gzipped is None and accepts_gzip():
+            gzipped = gzip.compress(body, GZIP_LEVEL)
+            with self.lock:
+                if self.entries.get(key) is entry:
+                    self.entries[key] = entry[:4] + (gzipped,) + entry[5:]
+                    self.bytes += len(gzipped)
+                    self._evict()
+        return body, gzipped
+    
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': RESULT_CACHE_ENABLED,
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'generation': self.generation,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0,
+                'expired': self.expired,
+                'evictions': self.evictions
+            }
+
+result_cache = ResultCache(RESULT_CACHE_MAX_BYTES, RESULT_CACHE_MAX_ENTRY_BYTES, RESULT_CACHE_MAX_AGE)
+
+def normalize_term(text):
+    """Texte sans accents ni majuscules, pour comparer les préfixes"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+def prefix_terms(texts):
+    """Termes indexés pour des libellés : chaque libellé normalisé et ses
+    fins commençant à un mot ('T-0012' donne 't-0012' et '0012')"""
+    terms = set()
+    for text in texts:
+        if text:
+            text = normalize_term(text)
+            terms.add(text)
+            terms.update(text[match.start():] for match in re.finditer(r'\w+', text))
+    return tuple(sorted(terms))
+
+class PrefixIndex:
+    """Éléments d'un type recherchés par préfixe, les mieux classés d'abord.
+    
+    items associe à chaque id (charge utile, termes, score, libellé) ;
+    terms est la liste triée des couples (terme, id) et ranked celle des
+    clés de classement (-score, libellé, id). Une mise à jour insère et
+    retire par dichotomie, sans retrier.
+    """
+    
+    def __init__(self, items=()):
+        self.items = {}
+        self.terms = []
+        self.ranked = []
+        for item_id, payload, texts, score in items:
+            entry = (payload, prefix_terms(texts), score, normalize_term(texts[0] or ''))
+            self.items[item_id] = entry
+            self.terms.extend((term, item_id) for term in entry[1])
+            self.ranked.append(self._rank(item_id, entry))
+        self.terms.sort()
+        self.ranked.sort()
+    
+    @staticmethod
+    def _rank(item_id, entry):
+        return (-entry[2], entry[3], item_id)
+    
+    @staticmethod
+    def _remove(values, value):
+        position = bisect.bisect_left(values, value)
+        if position < len(values) and values[position] == value:
+            del values[position]
+    
+    def put(self, item_id, payload, texts, weight=0.0):
+        """Ajouter ou remplacer un élément ; weight s'ajoute à son score"""
+        old = self.items.get(item_id)
+        entry = (payload, prefix_terms(texts), weight + (old[2] if old else 0.0), normalize_term(texts[0] or ''))
+        if old:
+            if old[1] != entry[1]:
+                for term in old[1]:
+                    self._remove(self.terms, (term, item_id))
+            self._remove(self.ranked, self._rank(item_id, old))
+        if not old or old[1] != entry[1]:
+            for term in entry[1]:
+                bisect.insort(self.terms, (term, item_id))
+        bisect.insort(self.ranked, self._rank(item_id, entry))
+        self.items[item_id] = entry
+    
+    def search(self, prefix, limit):
+        """Charges utiles des limit éléments les mieux classés ayant un terme commençant par prefix"""
+        if not prefix:
+            return [self.items[key[2]][0] for key in self.ranked[:limit]]
+    
+        start = bisect.bisect_left(self.terms, (prefix,))
+        end = bisect.bisect_left(self.terms, (prefix + '\U0010ffff',))
+        if end - start <= AUTOCOMPLETE_SCAN_LIMIT:
+            keys = sorted({self._rank(item_id, self.items[item_id]) for _, item_id in self.terms[start:end]})[:limit]
+        else:
+            # Préfixe courant : les premiers éléments classés correspondent vite
+            keys = []
+            for key in self.ranked:
+                if any(term.startswith(prefix) for term in self.items[key[2]][1]):
+                    keys.append(key)
+                    if len(keys) == limit:
+                        break
+        return [self.items[key[2]][0] for key in keys]
+
+def text_epoch(text):
+    """Secondes depuis l'epoch d'une date texte 'YYYY-MM-DD HH:MM:SS' (comme epoch_sql)"""
+    return int((datetime.strptime(text, '%Y-%m-%d %H:%M:%S') - datetime(1970, 1, 1)).total_seconds())
+
+class AutocompleteIndex:
+    """Index de préfixes des sites, FME, entreprises et actions (un
+    PrefixIndex par type), classés par fréquence d'utilisation récente.
+    
+    Le score d'un élément est la somme, sur ses interventions, de
+    2 ** ((arrivée - origine) / demi-vie) : l'ordre des scores est celui
+    d'une fréquence à décroissance exponentielle, sans recalcul quand le
+    temps passe. L'index est construit en arrière-plan à la première
+    requête, puis mis à jour par les routes d'écriture après le commit ;
+    les mises à jour reçues pendant la construction sont appliquées à la
+    fin.
+    """
+    
+    def __init__(self, half_life_days):
+        self.half_life = half_life_days * 86400
+        self.database = None
+        self.origin = None
+        self.indexes = {}
+        self.pending = []
+        self.ready = threading.Event()
+        self.build_ms = None
+        self.lock = threading.Lock()
+    
+    def start(self):
+        """Lancer la construction si l'index ne correspond pas à la base courante"""
+        with self.lock:
+            if self.database == DATABASE:
+                return
+            self.database = DATABASE
+            self.origin = time.time()
+            self.indexes = {}
+            self.pending = []
+            self.ready = threading.Event()
+        threading.Thread(target=self._build, args=(DATABASE,), name='autocomplete', daemon=True).start()
+    
+    def weight(self, epoch):
+        return 2.0 ** ((epoch - self.origin) / self.half_life)
+    
+    def _build(self, database):
+        start = time.perf_counter()
+        try:
+            indexes = run_blocking(self._scan)
+        except Exception:
+            app.logger.exception('Construction de l\'index d\'autocomplétion en échec')
+            with self.lock:
+                # Nouvelle tentative à la prochaine requête ; les recherches en attente passent par SQL
+                if self.database == database:
+                    self.database = None
+                    self.ready.set()
+            return
+    
+        with self.lock:
+            if self.database != database:
+                return
+            self.indexes = indexes
+            for update in self.pending:
+                self._apply(*update)
+            self.pending = []
+            self.build_ms = round((time.perf_counter() - start) * 1000, 1)
+            self.ready.set()
+    
+    def _scan(self):
+        """Lire la base et construire un PrefixIndex par type"""
+        conn = connect_db(readonly=True)
+        try:
+            cursor = conn.cursor()
+            # Lectures dans un même instantané
+            cursor.execute('BEGIN')
+            weights = {kind: {} for kind in AUTOCOMPLETE_KINDS}
+            for schema in ('main', 'archive'):
+                cursor.execute(f'SELECT site_id, fme_id, action_id, arrival_epoch / 3600 FROM {schema}.intervention_records')
+                hourly = {}
+                for site_id, fme_id, action_id, hour in cursor:
+                    weight = hourly.get(hour)
+                    if weight is None:
+                        weight = hourly[hour] = self.weight(hour * 3600)
+                    for kind, item_id in (('sites', site_id), ('fme', fme_id), ('actions', action_id)):
+                        weights[kind][item_id] = weights[kind].get(item_id, 0.0) + weight
+            items = self._load(cursor, weights)
+            # Actions : libellés déjà utilisés comme action uniquement
+            items['actions'] = {item_id: item for item_id, item in items['actions'].items() if item_id in weights['actions']}
+            conn.rollback()
+        finally:
+            conn.close()
+    
+        return {
+            kind: PrefixIndex((item_id, payload, texts, weights[kind].get(item_id, 0.0))
+                              for item_id, (payload, texts) in items[kind].items())
+            for kind in AUTOCOMPLETE_KINDS
+        }
+    
+    @staticmethod
+    def _load(cursor, weights, ids=None):
+        """Charges utiles et libellés indexés {type: {id: (charge, libellés)}},
+        de tous les éléments ou de ceux de ids ({type: ids}) ; ajoute aux
+        entreprises le poids de leurs FME"""
+        queries = {
+            'sites': 'SELECT id, t_number, site_name FROM sites',
+            'fme': '''SELECT f.id, f.fme_name, c.company_name, f.phone_number, f.company_id
+                      FROM fme f LEFT JOIN companies c ON c.id = f.company_id''',
+            'companies': 'SELECT id, company_name FROM companies',
+            'actions': 'SELECT id, name FROM labels',
+        }
+        columns = {'sites': 'id', 'fme': 'f.id', 'companies': 'id', 'actions': 'id'}
+        items = {}
+        for kind, query in queries.items():
+            if ids is None:
+                cursor.execute(query)
+                rows = cursor.fetchall()
+            else:
+                rows = _select_in(cursor, f'{query} WHERE {columns[kind]} IN ({{marks}})', ids.get(kind, ()))
+            items[kind] = {}
+            for row in rows:
+                if kind == 'sites':
+                    items[kind][row[0]] = ({'t_number': row[1], 'site_name': row[2]}, (row[1], row[2]))
+                elif kind == 'fme':
+                    payload = {'id': row[0], 'fme_name': row[1], 'company_name': row[2], 'phone_number': row[3]}
+                    items[kind][row[0]] = (payload, (row[1], row[2]))
+                    weight = weights['fme'].get(row[0])
+                    if weight:
+                        weights['companies'][row[4]] = weights['companies'].get(row[4], 0.0) + weight
+                elif kind == 'companies':
+                    items[kind][row[0]] = ({'id': row[0], 'company_name': row[1]}, (row[1],))
+                else:
+                    items[kind][row[0]] = ({'action': row[1]}, (row[1],))
+        return items
+    
+    def _apply(self, items, weights):
+        for kind, kind_items in items.items():
+            for item_id, (payload, texts) in kind_items.items():
+                self.indexes[kind].put(item_id, payload, texts, weights[kind].get(item_id, 0.0))
+    
+    def _update(self, conn, ids, weights):
+        """Relire les éléments de ids sur conn (après le commit) et les indexer"""
+        if self.database != DATABASE:
+            return
+        items = self._load(conn.cursor(), weights, ids)
+        with self.lock:
+            if self.database != DATABASE:
+                return
+            if not self.ready.is_set():
+                self.pending.append((items, weights))
+            elif self.indexes:
+                self._apply(items, weights)
+    
+    def record(self, conn, usages, sign=1):
+        """Compter des interventions créées (ou supprimées avec sign=-1),
+        données par (site_id, fme_id, action_id, arrivée en secondes)"""
+        if self.origin is None:
+            return
+        weights = {kind: {} for kind in AUTOCOMPLETE_KINDS}
+        for site_id, fme_id, action_id, epoch in usages:
+            weight = sign * self.weight(epoch)
+            for kind, item_id in (('sites', site_id), ('fme', fme_id), ('actions', action_id)):
+                weights[kind][item_id] = weights[kind].get(item_id, 0.0) + weight
+        ids = {kind: set(kind_weights) for kind, kind_weights in weights.items()}
+        # Entreprises des FME concernés, dont _load reporte le poids
+        ids['companies'] = {row[0] for row in _select_in(
+            conn.cursor(), 'SELECT DISTINCT company_id FROM fme WHERE id IN ({marks})', ids['fme'])}
+        self._update(conn, ids, weights)
+    
+    def refresh(self, conn, **ids):
+        """Indexer (ou relire) des éléments créés ou modifiés sans
+        intervention, donnés par type (sites=[...], fme=[...]...)"""
+        self._update(conn, ids, {kind: {} for kind in AUTOCOMPLETE_KINDS})
+    
+    def search(self, kind, prefix, limit, timeout=None):
+        """Charges utiles des limit meilleurs éléments de kind pour prefix ;
+        None si l'index n'est pas prêt au bout de timeout secondes ou si sa
+        construction a échoué"""
+        self.start()
+        if not self.ready.wait(timeout):
+            return None
+        with self.lock:
+            index = self.indexes.get(kind)
+            return index.search(normalize_term(prefix.strip()), limit) if index else None
+    
+    def stats(self):
+        with self.lock:
+            return {
+                'ready': self.ready.is_set(),
+                'build_ms': self.build_ms,
+                'items': {kind: len(index.items) for kind, index in self.indexes.items()},
+                'terms': {kind: len(index.terms) for kind, index in self.indexes.items()}
+            }
+
+autocomplete = AutocompleteIndex(AUTOCOMPLETE_HALF_LIFE_DAYS)
+
+def accepts_gzip():
+    return request.accept_encodings['gzip'] > 0
+
+def conditional_response(tag, load, mimetype):
+    """Réponse validée par ETag fort : 304 si le client est à jour,
+    sinon le corps renvoyé par load() (brut, gzip) selon Accept-Encoding"""
+    use_gzip = accepts_gzip()
+    etag = f'{tag}-gz' if use_gzip else tag
+    
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        body, gzipped = load()
+        response = Response(gzipped if use_gzip else body, mimetype=mimetype)
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+    
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def reference_response(name, tables, build):
+    """Liste de référence servie depuis la mémoire tant que ses tables n'ont pas changé"""
+    tag = reference_cache.tag(name, tables)
+    return conditional_response(tag, lambda: reference_cache.body(name, tag, build), 'application/json')
+
+def reference_rows_response(name, tables, query):
+    """Lignes de référence (query lance leur SELECT) au format demandé,
+    mises en cache séparément pour chaque format"""
+    try:
+        format = list_format(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    def build():
+        return encode_rows(query(tuple_cursor(get_read_db())), format=format)
+    
+    return reference_response(f'{name}.{format}' if format else name, tables, build)
+
+def cached_result(view):
+    """Servir une route GET depuis result_cache, par chemin et paramètres
+    triés : une entrée valide évite SQL et encodage JSON. Seules les
+    réponses JSON 200 sont conservées ; toutes portent un ETag."""
+    @wraps(view)
+    def cached_view(*args, **kwargs):
+        if not RESULT_CACHE_ENABLED:
+            return view(*args, **kwargs)
+    
+        key = (request.path, tuple(sorted(request.args.items(multi=True))))
+        entry, generation = result_cache.get(key)
+        if entry is None:
+            response = app.make_response(view(*args, **kwargs))
+            if (response.status_code != 200
+                    or response.mimetype != 'application/json'
+                    or response.is_streamed
+                    or 'Content-Encoding' in response.headers):
+                return response
+            headers = [(name, value) for name, value in response.headers.items()
+                       if name not in ('Content-Type', 'Content-Length')]
+            entry = result_cache.put(key, generation, response.get_data(), headers)
+    
+        response = conditional_response(entry[2], lambda: result_cache.bodies(key, entry), 'application/json')
+        for name, value in entry[5]:
+            response.headers[name] = value
+        return response
+    
+    return cached_view
+
+@app.before_request
+def start_request_timer():
+    if METRICS_ENABLED:
+        g.request_start = time.perf_counter()
+
+@app.before_request
+def start_maintenance():
+    # Démarrée avec la première requête : pas dans le processus de
+    # surveillance du rechargement automatique, ni pour les commandes flask
+    if MAINTENANCE_ENABLED:
+        maintenance.start()
+
+@app.before_request
+def start_autocomplete():
+    # Index construit en arrière-plan dès la première requête
+    autocomplete.start()
+
+# Enregistré avant compress_response, donc exécuté après : les octets
+# comptés sont ceux envoyés
+@app.after_request
+def record_request_metrics(response):
+    """Mesurer la durée de la requête et la taille de la réponse"""
+    start = g.pop('request_start', None)
+    if start is None:
+        return response
+    
+    method = request.method
+    route = request.url_rule.rule if request.url_rule else 'inconnue'
+    metrics.observe_request(method, route, str(response.status_code), time.perf_counter() - start)
+    # Flux (exports, événements) : durée jusqu'au début de l'envoi, octets comptés à la fin
+    if response.is_streamed:
+        response.response = metrics.count_stream(response.response, method, route)
+    else:
+        metrics.observe_bytes(method, route, response.content_length or 0)
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Compresser les réponses JSON et HTML non mises en cache"""
+    if (response.mimetype not in ('application/json', 'text/html')
+            or response.status_code != 200
+            or response.is_streamed
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    if not accepts_gzip() or response.content_length < GZIP_MIN_SIZE:
+        return response
+    
+    response.set_data(gzip.compress(response.get_data(), GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+def get_db():
+    """Connexion d'écriture de la requête courante (imports en masse ; les
+    autres mutations passent par write_queue)"""
+    if 'db' not in g:
+        g.db = _acquire_db(readonly=False)
+    return g.db
+
+def get_read_db():
+    """Connexion en lecture seule de la requête courante"""
+    if 'read_db' not in g:
+        g.read_db = _acquire_db(readonly=True)
+    return g.read_db
+
+@app.teardown_appcontext
+def release_db(exception):
+    """Rendre les connexions de la requête au pool"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        _release_db(conn, readonly=False)
+    conn = g.pop('read_db', None)
+    if conn is not None:
+        _release_db(conn, readonly=True)
+
 def init_db():
     """Initialisation de la base de données"""
-    conn = get_db()
+    conn = connect_db()
+    # Sans effet sur une base existante tant qu'elle n'est pas reconstruite
+    # (commande vacuum-db) : doit précéder la première écriture
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('PRAGMA archive.auto_vacuum = INCREMENTAL')
+    # Le mode WAL est persistant : les lecteurs ne bloquent plus derrière l'écrivain
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA archive.journal_mode = WAL')
     cursor = conn.cursor()
     
-    # Table des entreprises
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS companies (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            company_name TEXT UNIQUE NOT NULL,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    # Table des entreprises
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS companies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            company_name TEXT UNIQUE NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            row_version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    
+    # Table des FME
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS fme (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fme_name TEXT NOT NULL,
+            company_id INTEGER NOT NULL,
+            phone_number TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            row_version INTEGER NOT NULL DEFAULT 0,
+            UNIQUE(fme_name, company_id),
+            FOREIGN KEY (company_id) REFERENCES companies (id)
+        )
+    ''')
+    
+    # Table des sites
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sites (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            t_number TEXT UNIQUE NOT NULL,
+            site_name TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            row_version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    
+    # Table des interventions avec système de tickets (schéma compact,
+    # lue à travers la vue interventions)
+    create_intervention_tables(cursor)
+    cursor.execute(INTERVENTIONS_VIEW)
+    
+    # Interventions terminées anciennes, déplacées dans la base d'archive
+    create_archive_tables(cursor)
+    
+    # Compteur global de versions pour la synchronisation delta
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL,
+            pruned_version INTEGER NOT NULL,
+            archiving INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO sync_state (id, version, pruned_version) VALUES (1, 0, 0)')
+    
+    # Interventions supprimées, pour que les clients les retirent
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS intervention_tombstones (
+            id INTEGER NOT NULL,
+            row_version INTEGER PRIMARY KEY,
+            deleted_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Dernier numéro de ticket attribué pour chaque jour (YYYYMMDD)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ticket_sequences (
+            day TEXT PRIMARY KEY,
+            last_number INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    
+    # Compteurs statistiques maintenus par triggers (voir STATS_DIMENSIONS)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            dimension TEXT NOT NULL,
+            key TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (dimension, key)
+        ) WITHOUT ROWID
+    ''')
+    
+    # Agrégats quotidiens des durées d'intervention (voir DURATION_KEYS)
+    buckets = ',\n            '.join(f'{column} INTEGER NOT NULL' for column in duration_bucket_columns())
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS duration_rollups (
+            day TEXT NOT NULL,
+            company TEXT NOT NULL,
+            action TEXT NOT NULL,
+            initial_state TEXT NOT NULL,
+            final_state TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            total_seconds INTEGER NOT NULL,
+            min_seconds INTEGER,
+            max_seconds INTEGER,
+            {buckets},
+            PRIMARY KEY (day, company, action, initial_state, final_state)
+        ) WITHOUT ROWID
+    ''')
+    
+    # État courant de chaque site (celui de sa dernière intervention)
+    create_site_status_table(cursor)
+    
+    # Index plein texte (tokenizer trigram : recherche de sous-chaînes)
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS interventions_fts USING fts5 (
+            ticket_number, t_number, site_name,
+            content='interventions', content_rowid='id', tokenize='trigram'
+        )
+    ''')
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS fme_fts USING fts5 (
+            fme_name, company_name, tokenize='trigram'
+        )
+    ''')
+    
+    migrate_db(conn)
+    create_triggers(cursor)
+    
+    conn.commit()
+    conn.close()
+
+def create_intervention_tables(cursor):
+    """Créer la table compacte des interventions et la table des libellés.
+    
+    Sites, actions, états et statuts y sont des entiers (sites.id,
+    labels.id) et les dates des secondes depuis l'epoch, l'heure affichée
+    étant conservée telle quelle (pas de conversion de fuseau). site_name
+    n'est renseigné que s'il diffère du nom du site.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS labels (
+            id INTEGER PRIMARY KEY,
+            name TEXT UNIQUE NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS intervention_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticket_number TEXT UNIQUE NOT NULL,
+            fme_id INTEGER NOT NULL,
+            site_id INTEGER NOT NULL,
+            site_name TEXT,
+            initial_state_id INTEGER NOT NULL,
+            action_id INTEGER NOT NULL,
+            arrival_epoch INTEGER NOT NULL,
+            departure_epoch INTEGER,
+            final_state_id INTEGER,
+            comment TEXT,
+            status_id INTEGER NOT NULL,
+            created_epoch INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+            row_version INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (fme_id) REFERENCES fme (id),
+            FOREIGN KEY (site_id) REFERENCES sites (id)
+        )
+    ''')
+
+# Vue exposant les interventions avec les noms de champs de l'API ; les
+# colonnes compactes restent accessibles pour les filtres et les tris
+# indexés. Les LEFT JOIN gardent intervention_records en tête de jointure.
+INTERVENTIONS_VIEW_SELECT = '''
+    SELECT
+        r.id, r.ticket_number, r.fme_id, s.t_number,
+        COALESCE(r.site_name, s.site_name) AS site_name,
+        li.name AS initial_state, la.name AS action,
+        datetime(r.arrival_epoch, 'unixepoch') AS arrival_time,
+        datetime(r.departure_epoch, 'unixepoch') AS departure_time,
+        lf.name AS final_state, r.comment, ls.name AS status,
+        datetime(r.created_epoch, 'unixepoch') AS created_at,
+        r.row_version, r.site_id, r.initial_state_id, r.action_id, r.final_state_id, r.status_id,
+        r.arrival_epoch, r.departure_epoch, r.created_epoch
+    FROM {source} r
+    LEFT JOIN sites s ON s.id = r.site_id
+    LEFT JOIN labels li ON li.id = r.initial_state_id
+    LEFT JOIN labels la ON la.id = r.action_id
+    LEFT JOIN labels lf ON lf.id = r.final_state_id
+    LEFT JOIN labels ls ON ls.id = r.status_id
+'''
+INTERVENTIONS_VIEW = (
+    'CREATE VIEW IF NOT EXISTS interventions AS'
+    + INTERVENTIONS_VIEW_SELECT.format(source='intervention_records')
+)
+
+# Interventions de la base principale et de la base d'archive
+INTERVENTION_RECORDS_HISTORY = (
+    '(SELECT * FROM main.intervention_records UNION ALL SELECT * FROM archive.intervention_records)'
+)
+
+# Même vue, archive comprise. Une vue de la base principale ne peut pas lire
+# une base attachée : celle-ci est temporaire, créée par connect_db. Les
+# filtres sur les colonnes compactes sont poussés dans chaque branche.
+HISTORY_VIEW = (
+    'CREATE TEMP VIEW IF NOT EXISTS interventions_history AS'
+    + INTERVENTIONS_VIEW_SELECT.format(source=INTERVENTION_RECORDS_HISTORY)
+)
+
+def create_site_status_table(cursor):
+    """Créer la table de l'état courant des sites, maintenue par triggers
+    (voir site_status_upsert_sql) : une ligne par site, l'état et la date
+    de sa dernière intervention, et le nombre de ses interventions en cours"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS site_status (
+            site_id INTEGER PRIMARY KEY,
+            state_id INTEGER NOT NULL,
+            last_intervention_id INTEGER NOT NULL,
+            last_arrival_epoch INTEGER NOT NULL,
+            last_change_epoch INTEGER NOT NULL,
+            open_count INTEGER NOT NULL,
+            FOREIGN KEY (site_id) REFERENCES sites (id)
+        )
+    ''')
+
+def create_archive_tables(cursor):
+    """Créer dans la base d'archive intervention_records (même définition
+    que dans la base principale), ses index et son index plein texte.
+    
+    L'archive n'a pas de triggers : seule archive_interventions y écrit.
+    """
+    cursor.execute("SELECT sql FROM main.sqlite_master WHERE name = 'intervention_records'")
+    definition = cursor.fetchone()['sql']
+    cursor.execute(definition.replace('CREATE TABLE ', 'CREATE TABLE IF NOT EXISTS archive.', 1))
+    for name, definition in INDEXES.items():
+        if definition.startswith('intervention_records '):
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS archive.{name} ON {definition}')
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS archive.interventions_fts USING fts5 (
+            ticket_number, t_number, site_name, tokenize='trigram'
+        )
+    ''')
+
+def epoch_sql(expression):
+    """Expression SQL convertissant une date texte en secondes depuis l'epoch"""
+    return f"CAST(strftime('%s', {expression}) AS INTEGER)"
+
+def label_sql(expression):
+    """Expression SQL du libellé dont l'id est expression"""
+    return f'(SELECT name FROM labels WHERE id = {expression})'
+
+# Index secondaires, recréés à chaque migration de schéma
+INDEXES = {
+    'idx_interventions_status': 'intervention_records (status_id)',
+    'idx_interventions_arrival_time': 'intervention_records (arrival_epoch)',
+    'idx_interventions_fme_id': 'intervention_records (fme_id)',
+    'idx_interventions_site_arrival': 'intervention_records (site_id, arrival_epoch)',
+    'idx_interventions_action_id': 'intervention_records (action_id)',
+    'idx_interventions_created_at': 'intervention_records (created_epoch)',
+    'idx_interventions_status_arrival': 'intervention_records (status_id, arrival_epoch)',
+    'idx_interventions_row_version': 'intervention_records (row_version)',
+    'idx_fme_company_id': 'fme (company_id)',
+    'idx_fme_row_version': 'fme (row_version)',
+    'idx_sites_row_version': 'sites (row_version)',
+    'idx_companies_row_version': 'companies (row_version)',
+    'idx_site_status_state': 'site_status (state_id, last_change_epoch)',
+}
+
+# Tables suivies par le flux de modifications (/api/changes)
+VERSIONED_TABLES = ['companies', 'fme', 'sites', 'intervention_records']
+
+def add_column_if_missing(cursor, table, column, definition):
+    """Ajouter une colonne à une table existante si elle n'y est pas encore"""
+    columns = [row['name'] for row in cursor.execute(f'PRAGMA table_info({table})')]
+    if column not in columns:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+def migrate_v2_row_versions(cursor):
+    """Version 2 : colonne row_version pour la synchronisation delta"""
+    for table in ['companies', 'fme', 'sites', 'interventions']:
+        add_column_if_missing(cursor, table, 'row_version', 'INTEGER NOT NULL DEFAULT 0')
+
+def migrate_v3_stats_counters(cursor):
+    """Version 3 : remplissage initial des compteurs statistiques"""
+    rebuild_stats_counters(cursor)
+
+def migrate_v4_search_index(cursor):
+    """Version 4 : remplissage initial de l'index plein texte"""
+    rebuild_search_index(cursor)
+
+def migrate_v5_ticket_sequences(cursor):
+    """Version 5 : séquences de tickets initialisées depuis les tickets existants"""
+    cursor.execute('''
+        INSERT INTO ticket_sequences (day, last_number)
+        SELECT substr(ticket_number, 5, 8), MAX(CAST(substr(ticket_number, 14) AS INTEGER))
+        FROM interventions
+        WHERE ticket_number LIKE 'TKT-________-%'
+        GROUP BY substr(ticket_number, 5, 8)
+        ON CONFLICT (day) DO UPDATE SET last_number = MAX(last_number, excluded.last_number)
+    ''')
+
+def migrate_v6_duration_rollups(cursor):
+    """Version 6 : remplissage initial des agrégats de durées"""
+    rebuild_duration_rollups(cursor)
+
+def is_legacy_interventions(cursor):
+    """Vrai si interventions est encore la table d'avant le schéma compact"""
+    cursor.execute("SELECT type FROM sqlite_master WHERE name = 'interventions'")
+    row = cursor.fetchone()
+    return row is not None and row['type'] == 'table'
+
+def copy_legacy_interventions(cursor, where, params=()):
+    """Copier dans intervention_records les lignes de l'ancienne table
+    interventions (alias i) qui vérifient where ; renvoie leur nombre"""
+    unreadable = cursor.execute(f'''
+        SELECT id FROM interventions i
+        WHERE ({where}) AND ({epoch_sql('i.arrival_time')} IS NULL
+            OR (i.departure_time IS NOT NULL AND {epoch_sql('i.departure_time')} IS NULL)
+            OR (i.created_at IS NOT NULL AND {epoch_sql('i.created_at')} IS NULL))
+        LIMIT 10
+    ''', params).fetchall()
+    if unreadable:
+        ids = ', '.join(str(row['id']) for row in unreadable)
+        raise ValueError(f'Dates illisibles dans les interventions {ids}')
+    
+    for column in ('i.initial_state', 'i.action', 'i.final_state', "COALESCE(i.status, 'en_cours')"):
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO labels (name)
+            SELECT DISTINCT {column} FROM interventions i
+            WHERE ({where}) AND {column} IS NOT NULL
+        ''', params)
+    cursor.execute(f'''
+        INSERT OR IGNORE INTO sites (t_number, site_name)
+        SELECT i.t_number, MIN(i.site_name) FROM interventions i
+        WHERE {where}
+        GROUP BY i.t_number
+    ''', params)
+    
+    cursor.execute(f'''
+        INSERT OR REPLACE INTO intervention_records
+        (id, ticket_number, fme_id, site_id, site_name, initial_state_id, action_id, arrival_epoch,
+         departure_epoch, final_state_id, comment, status_id, created_epoch, row_version)
+        SELECT
+            i.id, i.ticket_number, i.fme_id, s.id, NULLIF(i.site_name, s.site_name),
+            (SELECT id FROM labels WHERE name = i.initial_state),
+            (SELECT id FROM labels WHERE name = i.action),
+            {epoch_sql('i.arrival_time')},
+            {epoch_sql('i.departure_time')},
+            (SELECT id FROM labels WHERE name = i.final_state),
+            i.comment,
+            (SELECT id FROM labels WHERE name = COALESCE(i.status, 'en_cours')),
+            {epoch_sql("COALESCE(i.created_at, i.arrival_time)")},
+            i.row_version
+        FROM interventions i
+        JOIN sites s ON s.t_number = i.t_number
+        WHERE {where}
+    ''', params)
+    return cursor.rowcount
+
+def migrate_v7_compact_interventions(cursor):
+    """Version 7 : interventions au schéma compact (intervention_records + vue).
+    
+    Reprend les lignes absentes ou modifiées depuis une copie par lots
+    (commande compact-interventions), puis remplace l'ancienne table par
+    la vue. Les remplissages des versions 3 et 6 lisent déjà le schéma
+    compact : sur une base plus ancienne ils ont porté sur une table vide
+    et sont refaits ici.
+    """
+    if not is_legacy_interventions(cursor):
+        return
+    
+    copy_legacy_interventions(cursor, '''i.row_version != COALESCE(
+        (SELECT r.row_version FROM intervention_records r WHERE r.id = i.id), -1)''')
+    cursor.execute('DELETE FROM intervention_records WHERE id NOT IN (SELECT id FROM interventions)')
+    
+    cursor.execute('DROP TABLE interventions')
+    cursor.execute(INTERVENTIONS_VIEW)
+    
+    total = cursor.execute("SELECT count FROM stats_counters WHERE dimension = 'total'").fetchone()
+    if (total['count'] if total else 0) != cursor.execute('SELECT COUNT(*) FROM intervention_records').fetchone()[0]:
+        rebuild_stats_counters(cursor)
+        rebuild_duration_rollups(cursor)
+        rebuild_search_index(cursor)
+
+def migrate_v8_archive(cursor):
+    """Version 8 : indicateur d'archivage, lu par les triggers de
+    suppression recréés ensuite (tombstones, compteurs, durées)"""
+    add_column_if_missing(cursor, 'sync_state', 'archiving', 'INTEGER NOT NULL DEFAULT 0')
+    for trigger in ('interventions_tombstone', 'interventions_stats_delete', 'interventions_durations_delete'):
+        cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+
+def migrate_v9_site_status(cursor):
+    """Version 9 : état courant des sites, rempli depuis l'historique ;
+    l'index sur site_id devient (site_id, arrival_epoch), archive comprise"""
+    cursor.execute('DROP INDEX IF EXISTS archive.idx_interventions_site_id')
+    create_archive_tables(cursor)
+    create_site_status_table(cursor)
+    rebuild_site_status(cursor)
+
+# Migrations de schéma indexées par version cible (PRAGMA user_version).
+# La version 1 correspond au premier jeu d'index secondaires.
+MIGRATIONS = {
+    2: migrate_v2_row_versions,
+    3: migrate_v3_stats_counters,
+    4: migrate_v4_search_index,
+    5: migrate_v5_ticket_sequences,
+    6: migrate_v6_duration_rollups,
+    7: migrate_v7_compact_interventions,
+    8: migrate_v8_archive,
+    9: migrate_v9_site_status,
+}
+
+SCHEMA_VERSION = max(MIGRATIONS)
+
+def migrate_db(conn):
+    """Appliquer les migrations en attente et synchroniser les index"""
+    cursor = conn.cursor()
+    version = cursor.execute('PRAGMA user_version').fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+    
+    for target in sorted(MIGRATIONS):
+        if version < target:
+            MIGRATIONS[target](cursor)
+    
+    # Supprimer les index devenus obsolètes
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'")
+    for row in cursor.fetchall():
+        if row['name'] not in INDEXES:
+            cursor.execute(f'DROP INDEX IF EXISTS {row["name"]}')
+    
+    for name, definition in INDEXES.items():
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {definition}')
+    
+    cursor.execute('ANALYZE')
+    cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+# Condition des triggers de suppression : hors déplacement vers l'archive
+NOT_ARCHIVING = 'WHEN (SELECT archiving FROM sync_state WHERE id = 1) = 0'
+
+def create_triggers(cursor):
+    """Créer les triggers qui estampillent chaque écriture d'une version"""
+    for table in VERSIONED_TABLES:
+        # Côté UPDATE, la clause WHEN ignore l'estampillage lui-même
+        for event, when in (('INSERT', ''), ('UPDATE', 'WHEN NEW.row_version = OLD.row_version')):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()}
+                AFTER {event} ON {table} {when}
+                BEGIN
+                    UPDATE sync_state SET version = version + 1 WHERE id = 1;
+                    UPDATE {table} SET row_version = (SELECT version FROM sync_state WHERE id = 1)
+                    WHERE id = NEW.id;
+                END
+            ''')
+    
+    # Une intervention déplacée vers l'archive n'est pas une suppression :
+    # ni tombstone, ni décompte (voir archive_interventions)
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS interventions_tombstone
+        AFTER DELETE ON intervention_records {NOT_ARCHIVING}
+        BEGIN
+            UPDATE sync_state SET version = version + 1 WHERE id = 1;
+            INSERT INTO intervention_tombstones (id, row_version)
+            VALUES (OLD.id, (SELECT version FROM sync_state WHERE id = 1));
+        END
+    ''')
+    
+    # Index plein texte des interventions (contenu externe : la vue interventions)
+    fts_row = '''
+        SELECT {r}.id, {r}.ticket_number, s.t_number, COALESCE({r}.site_name, s.site_name)
+        FROM sites s WHERE s.id = {r}.site_id;
+    '''
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS interventions_fts_insert
+        AFTER INSERT ON intervention_records
+        BEGIN
+            INSERT INTO interventions_fts (rowid, ticket_number, t_number, site_name)
+            {fts_row.format(r='NEW')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS interventions_fts_update
+        AFTER UPDATE OF ticket_number, site_id, site_name ON intervention_records
+        BEGIN
+            INSERT INTO interventions_fts (interventions_fts, rowid, ticket_number, t_number, site_name)
+            SELECT 'delete', * FROM ({fts_row.format(r='OLD').rstrip().rstrip(';')});
+            INSERT INTO interventions_fts (rowid, ticket_number, t_number, site_name)
+            {fts_row.format(r='NEW')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS interventions_fts_delete
+        AFTER DELETE ON intervention_records
+        BEGIN
+            INSERT INTO interventions_fts (interventions_fts, rowid, ticket_number, t_number, site_name)
+            SELECT 'delete', * FROM ({fts_row.format(r='OLD').rstrip().rstrip(';')});
+        END
+    ''')
+    
+    # Index plein texte des FME (avec le nom de leur entreprise)
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS fme_fts_insert
+        AFTER INSERT ON fme
+        BEGIN
+            INSERT INTO fme_fts (rowid, fme_name, company_name)
+            VALUES (NEW.id, NEW.fme_name, (SELECT company_name FROM companies WHERE id = NEW.company_id));
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS fme_fts_update
+        AFTER UPDATE OF fme_name, company_id ON fme
+        BEGIN
+            DELETE FROM fme_fts WHERE rowid = OLD.id;
+            INSERT INTO fme_fts (rowid, fme_name, company_name)
+            VALUES (NEW.id, NEW.fme_name, (SELECT company_name FROM companies WHERE id = NEW.company_id));
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS fme_fts_delete
+        AFTER DELETE ON fme
+        BEGIN
+            DELETE FROM fme_fts WHERE rowid = OLD.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS companies_fts_update
+        AFTER UPDATE OF company_name ON companies
+        BEGIN
+            UPDATE fme_fts SET company_name = NEW.company_name
+            WHERE rowid IN (SELECT id FROM fme WHERE company_id = NEW.id);
+        END
+    ''')
+    
+    # Compteurs statistiques
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS interventions_stats_insert
+        AFTER INSERT ON intervention_records
+        BEGIN
+            {stats_upsert_sql('NEW', 1)}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS interventions_stats_update
+        AFTER UPDATE OF status_id, initial_state_id, final_state_id, action_id, fme_id
+        ON intervention_records
+        BEGIN
+            {stats_upsert_sql('OLD', -1)}
+            {stats_upsert_sql('NEW', 1)}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS interventions_stats_delete
+        AFTER DELETE ON intervention_records {NOT_ARCHIVING}
+        BEGIN
+            {stats_upsert_sql('OLD', -1)}
+        END
+    ''')
+    
+    # Agrégats de durées : seules les interventions terminées y figurent
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS interventions_durations_insert
+        AFTER INSERT ON intervention_records
+        BEGIN
+            {duration_add_sql('NEW')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS interventions_durations_update
+        AFTER UPDATE OF status_id, arrival_epoch, departure_epoch, initial_state_id, final_state_id,
+            action_id, fme_id
+        ON intervention_records
+        BEGIN
+            {duration_remove_sql('OLD')}
+            {duration_add_sql('NEW')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS interventions_durations_delete
+        AFTER DELETE ON intervention_records {NOT_ARCHIVING}
+        BEGIN
+            {duration_remove_sql('OLD')}
+        END
+    ''')
+    
+    # État courant des sites. Une intervention archivée reste la dernière
+    # de son site : le déplacement vers l'archive ne change rien.
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS interventions_site_status_insert
+        AFTER INSERT ON intervention_records
+        BEGIN
+            {site_status_upsert_sql('NEW')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS interventions_site_status_update
+        AFTER UPDATE OF site_id, status_id, initial_state_id, final_state_id, arrival_epoch, departure_epoch
+        ON intervention_records
+        BEGIN
+            UPDATE site_status SET open_count = open_count - {SITE_OPEN.format(r='OLD')}
+            WHERE site_id = OLD.site_id;
+            {site_status_upsert_sql('NEW')}
+            {site_status_refresh_sql('OLD', 'NEW.site_id != OLD.site_id OR NEW.arrival_epoch < OLD.arrival_epoch')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS interventions_site_status_delete
+        AFTER DELETE ON intervention_records {NOT_ARCHIVING}
+        BEGIN
+            UPDATE site_status SET open_count = open_count - {SITE_OPEN.format(r='OLD')}
+            WHERE site_id = OLD.site_id;
+            {site_status_refresh_sql('OLD')}
+        END
+    ''')
+
+# Dimensions des compteurs statistiques : expression SQL de la clé pour
+# une ligne {r} de intervention_records (NULL = ligne non comptée)
+STATS_DIMENSIONS = {
+    'total': "''",
+    'status': label_sql('{r}.status_id'),
+    'initial_state': label_sql('{r}.initial_state_id'),
+    'action': label_sql('{r}.action_id'),
+    'company': '''COALESCE((SELECT sc.company_name FROM fme sf
+        JOIN companies sc ON sf.company_id = sc.id WHERE sf.id = {r}.fme_id), '')''',
+    'closed': (
+        f"CASE WHEN {label_sql('{r}.status_id')} = 'termine' THEN {label_sql('{r}.initial_state_id')}"
+        f" || '|' || COALESCE({label_sql('{r}.final_state_id')}, '') END"
+    ),
+}
+
+def stats_upsert_sql(row, sign):
+    """Requête ajoutant sign à chaque compteur concerné par la ligne row"""
+    values = ', '.join(
+        f"('{dimension}', {expression.format(r=row)}, {sign})"
+        for dimension, expression in STATS_DIMENSIONS.items()
+    )
+    return f'''
+        INSERT INTO stats_counters (dimension, key, count)
+        SELECT column1, column2, column3 FROM (VALUES {values})
+        WHERE column2 IS NOT NULL
+        ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count;
+    '''
+
+# Bornes supérieures (secondes, exclues) des classes de l'histogramme des
+# durées ; une dernière classe reçoit les durées au-delà. Modifier cette
+# liste impose de recréer la table duration_rollups.
+DURATION_BUCKETS = [900, 1800, 3600, 7200, 14400, 28800, 86400]
+
+# Clés des agrégats de durées : expression SQL pour une ligne d'intervention {r}
+DURATION_KEYS = {
+    'day': "date({r}.arrival_epoch, 'unixepoch')",
+    'company': STATS_DIMENSIONS['company'],
+    'action': f"COALESCE({label_sql('{r}.action_id')}, '')",
+    'initial_state': f"COALESCE({label_sql('{r}.initial_state_id')}, '')",
+    'final_state': f"COALESCE({label_sql('{r}.final_state_id')}, '')",
+}
+
+# Durée sur site en secondes, et condition pour qu'une ligne soit agrégée
+DURATION_SECONDS = '({r}.departure_epoch - {r}.arrival_epoch)'
+DURATION_COUNTED = label_sql('{r}.status_id') + " = 'termine' AND " + DURATION_SECONDS + ' >= 0'
+
+def duration_bucket_columns():
+    return [f'bucket_{index}' for index in range(len(DURATION_BUCKETS) + 1)]
+
+def duration_bucket_sql(seconds):
+    """Expressions 0/1 indiquant la classe de l'histogramme de seconds"""
+    bounds = [0] + DURATION_BUCKETS
+    expressions = [f'({seconds} >= {low} AND {seconds} < {high})' for low, high in zip(bounds, bounds[1:])]
+    expressions.append(f'({seconds} >= {bounds[-1]})')
+    return expressions
+
+def duration_add_sql(row):
+    """Requête ajoutant la ligne row à son agrégat de durées"""
+    seconds = DURATION_SECONDS.format(r=row)
+    keys = ', '.join(expression.format(r=row) for expression in DURATION_KEYS.values())
+    buckets = ', '.join(duration_bucket_sql(seconds))
+    bucket_updates = ', '.join(f'{column} = {column} + excluded.{column}' for column in duration_bucket_columns())
+    return f'''
+        INSERT INTO duration_rollups ({', '.join(DURATION_KEYS)}, count, total_seconds,
+            min_seconds, max_seconds, {', '.join(duration_bucket_columns())})
+        SELECT {keys}, 1, {seconds}, {seconds}, {seconds}, {buckets}
+        WHERE {DURATION_COUNTED.format(r=row)}
+        ON CONFLICT ({', '.join(DURATION_KEYS)}) DO UPDATE SET
+            count = count + 1,
+            total_seconds = total_seconds + excluded.total_seconds,
+            min_seconds = MIN(COALESCE(min_seconds, excluded.min_seconds), excluded.min_seconds),
+            max_seconds = MAX(COALESCE(max_seconds, excluded.max_seconds), excluded.max_seconds),
+            {bucket_updates};
+    '''
+
+def duration_remove_sql(row):
+    """Requêtes retirant la ligne row de son agrégat de durées.
+    
+    Le minimum et le maximum ne se décrémentent pas : si row les portait,
+    ils sont recalculés sur les interventions restantes du même agrégat
+    (même jour d'arrivée, lu par l'index sur arrival_epoch). Seule la base
+    principale est lue : pour un jour en partie archivé, les routes de
+    modification appellent ensuite refresh_duration_rollups.
+    """
+    seconds = DURATION_SECONDS.format(r=row)
+    match = ' AND '.join(
+        f'{key} = {expression.format(r=row)}' for key, expression in DURATION_KEYS.items()
+    )
+    bucket_updates = ', '.join(
+        f'{column} = {column} - {expression}'
+        for column, expression in zip(duration_bucket_columns(), duration_bucket_sql(seconds))
+    )
+    group = ' AND '.join(
+        f"{expression.format(r='g')} = duration_rollups.{key}"
+        for key, expression in DURATION_KEYS.items() if key != 'day'
+    )
+    remaining = f'''
+        FROM intervention_records g
+        WHERE g.arrival_epoch >= {epoch_sql('duration_rollups.day')}
+          AND g.arrival_epoch < {epoch_sql("duration_rollups.day, '+1 day'")}
+          AND {DURATION_COUNTED.format(r='g')} AND {group}
+    '''
+    return f'''
+        UPDATE duration_rollups SET
+            count = count - 1,
+            total_seconds = total_seconds - {seconds},
+            {bucket_updates}
+        WHERE {match} AND {DURATION_COUNTED.format(r=row)};
+        UPDATE duration_rollups SET
+            min_seconds = (SELECT MIN({DURATION_SECONDS.format(r='g')}) {remaining}),
+            max_seconds = (SELECT MAX({DURATION_SECONDS.format(r='g')}) {remaining})
+        WHERE {match} AND {DURATION_COUNTED.format(r=row)}
+          AND (min_seconds >= {seconds} OR max_seconds <= {seconds});
+    '''
+
+# État d'un site après l'intervention {r} (état final une fois fermée),
+# date de ce changement, et 1 si {r} est en cours
+SITE_STATE = 'COALESCE({r}.final_state_id, {r}.initial_state_id)'
+SITE_CHANGE_EPOCH = 'COALESCE({r}.departure_epoch, {r}.arrival_epoch)'
+SITE_OPEN = f"({label_sql('{r}.status_id')} = 'en_cours')"
+
+def site_status_upsert_sql(row):
+    """Requête comptant la ligne row dans l'état de son site ; row en
+    devient la dernière intervention si elle n'est pas plus ancienne
+    (ordre arrival_epoch, id) que celle qui y figure"""
+    latest = '''(excluded.last_arrival_epoch > last_arrival_epoch
+        OR (excluded.last_arrival_epoch = last_arrival_epoch AND excluded.last_intervention_id >= last_intervention_id))'''
+    columns = ['state_id', 'last_intervention_id', 'last_arrival_epoch', 'last_change_epoch']
+    updates = ',\n            '.join(
+        f'{column} = CASE WHEN {latest} THEN excluded.{column} ELSE {column} END' for column in columns
+    )
+    return f'''
+        INSERT INTO site_status (site_id, {', '.join(columns)}, open_count)
+        VALUES ({row}.site_id, {SITE_STATE.format(r=row)}, {row}.id, {row}.arrival_epoch,
+            {SITE_CHANGE_EPOCH.format(r=row)}, {SITE_OPEN.format(r=row)})
+        ON CONFLICT (site_id) DO UPDATE SET
+            open_count = open_count + excluded.open_count,
+            {updates};
+    '''
+
+def site_status_refresh_sql(row, condition='1'):
+    """Requêtes recalculant l'état du site de row si row en était la
+    dernière intervention (et si condition) : depuis l'intervention
+    précédente, lue par l'index (site_id, arrival_epoch), ou en retirant
+    le site s'il n'en a plus. Seule la base principale est lue (les
+    triggers ne voient pas l'archive) : delete_intervention recalcule
+    ensuite le site avec l'archive (refresh_site_status).
+    """
+    target = f'site_id = {row}.site_id AND last_intervention_id = {row}.id AND ({condition})'
+    latest = '''
+        FROM intervention_records g WHERE g.site_id = site_status.site_id
+        ORDER BY g.arrival_epoch DESC, g.id DESC LIMIT 1
+    '''
+    return f'''
+        DELETE FROM site_status WHERE {target}
+          AND NOT EXISTS (SELECT 1 FROM intervention_records g WHERE g.site_id = {row}.site_id);
+        UPDATE site_status SET (state_id, last_intervention_id, last_arrival_epoch, last_change_epoch) = (
+            SELECT {SITE_STATE.format(r='g')}, g.id, g.arrival_epoch, {SITE_CHANGE_EPOCH.format(r='g')} {latest}
+        )
+        WHERE {target};
+    '''
+
+def compute_duration_rollups(cursor, day=None):
+    """Recalculer tous les agrégats de durées (ou ceux du seul jour day,
+    'YYYY-MM-DD'), interventions archivées comprises"""
+    where, params = '', ()
+    if day is not None:
+        where = 'AND i.arrival_epoch >= ' + epoch_sql('?') + ' AND i.arrival_epoch < ' + epoch_sql("?, '+1 day'")
+        params = (day, day)
+    seconds = DURATION_SECONDS.format(r='i')
+    keys = ', '.join(f"{expression.format(r='i')} AS {key}" for key, expression in DURATION_KEYS.items())
+    buckets = ', '.join(
+        f'SUM({expression}) AS {column}'
+        for column, expression in zip(duration_bucket_columns(), duration_bucket_sql(seconds))
+    )
+    cursor.execute(f'''
+        SELECT {keys}, COUNT(*) AS count, SUM({seconds}) AS total_seconds,
+            MIN({seconds}) AS min_seconds, MAX({seconds}) AS max_seconds, {buckets}
+        FROM {INTERVENTION_RECORDS_HISTORY} i
+        WHERE {DURATION_COUNTED.format(r='i')} {where}
+        GROUP BY {', '.join(DURATION_KEYS)}
+    ''', params)
+    return {tuple(row)[:len(DURATION_KEYS)]: tuple(row)[len(DURATION_KEYS):] for row in cursor.fetchall()}
+
+def rebuild_duration_rollups(cursor, day=None):
+    """Remplacer les agrégats de durées (ou ceux du jour day) par un recalcul complet"""
+    rollups = compute_duration_rollups(cursor, day)
+    columns = list(DURATION_KEYS) + ['count', 'total_seconds', 'min_seconds', 'max_seconds'] + duration_bucket_columns()
+    if day is None:
+        cursor.execute('DELETE FROM duration_rollups')
+    else:
+        cursor.execute('DELETE FROM duration_rollups WHERE day = ?', (day,))
+    cursor.executemany(
+        f"INSERT INTO duration_rollups ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        [key + values for key, values in rollups.items()]
+    )
+
+def refresh_duration_rollups(cursor, arrival_epoch):
+    """Recalculer les agrégats du jour d'arrival_epoch si une partie de ce
+    jour est archivée : les triggers ne recalculent minimum et maximum que
+    sur la base principale (voir duration_remove_sql)"""
+    start = arrival_epoch - arrival_epoch % 86400
+    cursor.execute(
+        'SELECT 1 FROM archive.intervention_records WHERE arrival_epoch >= ? AND arrival_epoch < ? LIMIT 1',
+        (start, start + 86400)
+    )
+    if cursor.fetchone():
+        rebuild_duration_rollups(cursor, time.strftime('%Y-%m-%d', time.gmtime(start)))
+
+def compute_stats_counters(cursor):
+    """Recalculer tous les compteurs, interventions archivées comprises"""
+    counters = {}
+    for dimension, expression in STATS_DIMENSIONS.items():
+        cursor.execute(f'''
+            SELECT {expression.format(r='i')} AS key, COUNT(*) AS count
+            FROM {INTERVENTION_RECORDS_HISTORY} i
+            GROUP BY key
+        ''')
+        for row in cursor.fetchall():
+            if row['key'] is not None:
+                counters[(dimension, row['key'])] = row['count']
+    return counters
+
+def rebuild_stats_counters(cursor):
+    """Remplacer les compteurs par un recalcul complet"""
+    counters = compute_stats_counters(cursor)
+    cursor.execute('DELETE FROM stats_counters')
+    cursor.executemany(
+        'INSERT INTO stats_counters (dimension, key, count) VALUES (?, ?, ?)',
+        [(dimension, key, count) for (dimension, key), count in counters.items()]
+    )
+
+def compute_site_status(cursor, site_id=None):
+    """Recalculer l'état courant de chaque site (ou du seul site_id),
+    interventions archivées comprises : {site_id: (state_id,
+    last_intervention_id, last_arrival_epoch, last_change_epoch, open_count)}"""
+    where, params = ('WHERE i.site_id = ?', (site_id,)) if site_id is not None else ('', ())
+    cursor.execute(f'''
+        SELECT site_id, {SITE_STATE.format(r='r')}, id, arrival_epoch, {SITE_CHANGE_EPOCH.format(r='r')}, open_count
+        FROM (
+            SELECT i.*,
+                ROW_NUMBER() OVER (PARTITION BY site_id ORDER BY arrival_epoch DESC, id DESC) AS position,
+                SUM({SITE_OPEN.format(r='i')}) OVER (PARTITION BY site_id) AS open_count
+            FROM {INTERVENTION_RECORDS_HISTORY} i
+            {where}
+        ) r
+        WHERE position = 1
+    ''', params)
+    return {row[0]: tuple(row)[1:] for row in cursor.fetchall()}
+
+def refresh_site_status(cursor, site_id):
+    """Recalculer l'état d'un site depuis la base principale et l'archive,
+    là où les triggers ne lisent que la première (dernière intervention
+    récente supprimée, interventions plus anciennes archivées)"""
+    status = compute_site_status(cursor, site_id).get(site_id)
+    if status is None:
+        cursor.execute('DELETE FROM site_status WHERE site_id = ?', (site_id,))
+    else:
+        cursor.execute(
+            '''INSERT OR REPLACE INTO site_status (site_id, state_id, last_intervention_id, last_arrival_epoch,
+                last_change_epoch, open_count) VALUES (?, ?, ?, ?, ?, ?)''',
+            (site_id,) + status
         )
+
+def rebuild_site_status(cursor):
+    """Remplacer l'état courant des sites par un recalcul complet"""
+    statuses = compute_site_status(cursor)
+    cursor.execute('DELETE FROM site_status')
+    cursor.executemany(
+        '''INSERT INTO site_status (site_id, state_id, last_intervention_id, last_arrival_epoch,
+            last_change_epoch, open_count) VALUES (?, ?, ?, ?, ?, ?)''',
+        [(site_id,) + values for site_id, values in statuses.items()]
+    )
+
+def rebuild_search_index(cursor):
+    """Reconstruire l'index plein texte depuis les tables sources (archive comprise)"""
+    cursor.execute("INSERT INTO interventions_fts (interventions_fts) VALUES ('rebuild')")
+    # Index de l'archive sans contenu externe : rempli depuis ses interventions
+    cursor.execute('DELETE FROM archive.interventions_fts')
+    cursor.execute('''
+        INSERT INTO archive.interventions_fts (rowid, ticket_number, t_number, site_name)
+        SELECT id, ticket_number, t_number, site_name FROM ('''
+        + INTERVENTIONS_VIEW_SELECT.format(source='archive.intervention_records') + ')'
+    )
+    cursor.execute('DELETE FROM fme_fts')
+    cursor.execute('''
+        INSERT INTO fme_fts (rowid, fme_name, company_name)
+        SELECT f.id, f.fme_name, c.company_name
+        FROM fme f
+        LEFT JOIN companies c ON f.company_id = c.id
     ''')
+
+def fts_phrase(text, column=None):
+    """Expression MATCH cherchant text comme sous-chaîne (éventuellement dans une seule colonne)"""
+    phrase = '"' + text.replace('"', '""') + '"'
+    return f'{column} : {phrase}' if column else phrase
+
+def intervention_search_clause(search, history=False):
+    """Clause de recherche (ticket, T-Number, site, FME) passant par l'index plein texte
+    (et par celui de l'archive si history).
     
-    # Table des FME
+    En dessous de FTS_MIN_QUERY_LENGTH caractères, le tokenizer trigram ne
+    peut pas servir de MATCH : on filtre alors les tables FTS avec LIKE.
+    """
+    tables = ['interventions_fts', 'archive.interventions_fts'] if history else ['interventions_fts']
+    if len(search) >= FTS_MIN_QUERY_LENGTH:
+        ids = ' UNION ALL '.join(f'SELECT rowid FROM {table} WHERE interventions_fts MATCH ?' for table in tables)
+        return f'''(i.id IN ({ids})
+            OR i.fme_id IN (SELECT rowid FROM fme_fts WHERE fme_fts MATCH ?))''', [
+            fts_phrase(search)
+        ] * len(tables) + [fts_phrase(search, 'fme_name')]
+    
+    like = f'%{search}%'
+    ids = ' UNION ALL '.join(
+        f'SELECT rowid FROM {table} WHERE ticket_number LIKE ? OR t_number LIKE ? OR site_name LIKE ?'
+        for table in tables
+    )
+    return f'''(i.id IN ({ids})
+            OR i.fme_id IN (SELECT rowid FROM fme_fts WHERE fme_name LIKE ?))''', [like] * (3 * len(tables) + 1)
+
+def next_ticket_number(cursor, now):
+    """Allouer le prochain numéro de ticket du jour (format: TKT-YYYYMMDD-XXXX).
+    
+    Doit être appelé dans la transaction d'écriture qui insère l'intervention.
+    """
+    day = now.strftime('%Y%m%d')
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS fme (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            fme_name TEXT NOT NULL,
-            company_id INTEGER NOT NULL,
-            phone_number TEXT NOT NULL,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(fme_name, company_id),
-            FOREIGN KEY (company_id) REFERENCES companies (id)
-        )
-    ''')
+        INSERT INTO ticket_sequences (day, last_number) VALUES (?, 1)
+        ON CONFLICT (day) DO UPDATE SET last_number = last_number + 1
+        RETURNING last_number
+    ''', (day,))
+    number = cursor.fetchone()['last_number']
+    return f'TKT-{day}-{str(number).zfill(4)}'
+
+def build_intervention_filters(args, history=False):
+    """Construire la clause WHERE des filtres d'interventions (recherche
+    étendue à l'archive si history).
     
-    # Table des sites
+    Les prédicats portent sur les colonnes compactes de la vue et restent
+    utilisables par les index : aucune fonction n'est appliquée aux
+    colonnes, et le filtre entreprise passe par une sous-requête sur fme
+    plutôt que par les LEFT JOIN.
+    """
+    status = args.get('status', '')
+    company = args.get('company', '')
+    site_down = args.get('site_down', '')
+    date_from = args.get('date_from', '')
+    date_to = args.get('date_to', '')
+    search = args.get('q', '').strip()
+    
+    clauses = []
+    params = []
+    
+    if status:
+        clauses.append('i.status_id = (SELECT id FROM labels WHERE name = ?)')
+        params.append(status)
+    
+    if company:
+        clauses.append('''i.fme_id IN (
+            SELECT fc.id FROM fme fc
+            JOIN companies cc ON fc.company_id = cc.id
+            WHERE cc.company_name = ?
+        )''')
+        params.append(company)
+    
+    # Dernière intervention de chaque site actuellement down
+    if site_down == 'true':
+        clauses.append('''i.id IN (
+            SELECT last_intervention_id FROM site_status
+            WHERE state_id = (SELECT id FROM labels WHERE name = 'down')
+        )''')
+    
+    # Bornes de jours converties en secondes, comme arrival_epoch
+    if date_from:
+        clauses.append('i.arrival_epoch >= ' + epoch_sql('DATE(?)'))
+        params.append(date_from)
+    
+    if date_to:
+        clauses.append('i.arrival_epoch < ' + epoch_sql("DATE(?, '+1 day')"))
+        params.append(date_to)
+    
+    if search:
+        clause, search_params = intervention_search_clause(search, history)
+        clauses.append(clause)
+        params.extend(search_params)
+    
+    where = ' AND '.join(clauses) if clauses else '1=1'
+    return where, params
+
+# Colonnes renvoyées pour une intervention (avec FME et entreprise), lues
+# dans {source} : interventions ou interventions_history
+INTERVENTION_SELECT = '''
+    SELECT 
+        i.id, i.ticket_number, i.t_number, i.site_name, i.initial_state, i.action,
+        i.arrival_time, i.departure_time, i.final_state, i.comment, i.status, i.created_at,
+        f.fme_name, c.company_name, f.phone_number
+    FROM {source} i
+    LEFT JOIN fme f ON i.fme_id = f.id
+    LEFT JOIN companies c ON f.company_id = c.id
+'''
+
+def encode_cursor(created_at, intervention_id):
+    """Encoder la position (created_at, id) en curseur opaque"""
+    raw = f'{created_at}|{intervention_id}'.encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(value):
+    """Décoder un curseur ; lève ValueError s'il est invalide"""
+    try:
+        raw = base64.urlsafe_b64decode(value.encode('ascii')).decode('utf-8')
+        created_at, intervention_id = raw.rsplit('|', 1)
+        return created_at, int(intervention_id)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError(f'Curseur invalide : {value}')
+
+def include_archive(cursor, args):
+    """Vrai si une liste d'interventions doit aussi lire l'archive : avec
+    archive=true, ou si date_from est antérieure à la dernière arrivée archivée"""
+    if args.get('archive') == 'true':
+        return True
+    date_from = args.get('date_from', '')
+    if not date_from:
+        return False
+    cursor.execute(f'''
+        SELECT MAX(arrival_epoch) >= {epoch_sql('DATE(?)')} AS reaches
+        FROM archive.intervention_records
+    ''', (date_from,))
+    return bool(cursor.fetchone()['reaches'])
+
+def intervention_page_query(args, history=False):
+    """Requête d'une page d'interventions : (query, params, limit).
+    
+    La requête lit une ligne de plus que limit pour savoir s'il reste une
+    page ; lève ValueError si limit ou le curseur sont invalides.
+    """
+    where, params = build_intervention_filters(args, history)
+    
+    try:
+        limit = min(max(int(args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        raise ValueError('Paramètre limit invalide')
+    
+    page_cursor = args.get('cursor', '')
+    if page_cursor:
+        try:
+            created_at, last_id = decode_cursor(page_cursor)
+        except ValueError:
+            raise ValueError('Curseur invalide')
+        where += f" AND (i.created_epoch, i.id) < ({epoch_sql('?')}, ?)"
+        params += [created_at, last_id]
+    
+    if not history:
+        query = INTERVENTION_SELECT.format(source='interventions') + '''
+            WHERE ''' + where + '''
+            ORDER BY i.created_epoch DESC, i.id DESC
+            LIMIT ?
+        '''
+        return query, params + [limit + 1], limit
+    
+    # Archive comprise : SQLite ne pousse dans la vue interventions_history
+    # (UNION ALL) ni le LIMIT ni les filtres contenant une sous-requête, et
+    # la lirait en entier. La page est choisie dans chaque base sur la
+    # table compacte (index), puis seules ses lignes sont lues en détail.
+    page = ' UNION ALL '.join(f'''
+        SELECT * FROM (
+            SELECT '{schema}' AS db, i.id, i.created_epoch FROM {schema}.intervention_records i
+            WHERE {where}
+            ORDER BY i.created_epoch DESC, i.id DESC
+            LIMIT ?
+        )''' for schema in ('main', 'archive'))
+    records = ' UNION ALL '.join(
+        f"SELECT r.* FROM page JOIN {schema}.intervention_records r ON r.id = page.id WHERE page.db = '{schema}'"
+        for schema in ('main', 'archive')
+    )
+    source = '(' + INTERVENTIONS_VIEW_SELECT.format(source=f'({records})') + ')'
+    query = f'''
+        WITH page AS ({page}
+            ORDER BY created_epoch DESC, id DESC
+            LIMIT ?
+        )''' + INTERVENTION_SELECT.format(source=source) + '''
+        ORDER BY i.created_epoch DESC, i.id DESC
+    '''
+    return query, (params + [limit + 1]) * 2 + [limit + 1], limit
+
+def next_page_cursor(cursor, rows, limit):
+    """Curseur de la page suivante, ou None si rows (lues par cursor) tient dans la page"""
+    if len(rows) <= limit:
+        return None
+    columns = [column[0] for column in cursor.description]
+    last = rows[limit - 1]
+    return encode_cursor(last[columns.index('created_at')], last[columns.index('id')])
+
+def query_companies(cursor):
+    """Lancer le SELECT de la liste des entreprises sur cursor"""
+    cursor.execute('SELECT id, company_name FROM companies ORDER BY company_name')
+    return cursor
+
+def query_fme(cursor):
+    """Lancer le SELECT de la liste des FME sur cursor"""
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sites (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            t_number TEXT UNIQUE NOT NULL,
-            site_name TEXT NOT NULL,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
+        SELECT f.id, f.fme_name, c.company_name, f.phone_number 
+        FROM fme f
+        LEFT JOIN companies c ON f.company_id = c.id
+        ORDER BY f.fme_name
     ''')
-    
-    # Table des interventions avec système de tickets
+    return cursor
+
+def query_sites(cursor):
+    """Lancer le SELECT de la liste des sites sur cursor"""
+    cursor.execute('SELECT t_number, site_name FROM sites ORDER BY t_number')
+    return cursor
+
+def query_action_suggestions(cursor):
+    """Lancer le SELECT de la liste des suggestions d'actions sur cursor"""
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS interventions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            ticket_number TEXT UNIQUE NOT NULL,
-            fme_id INTEGER NOT NULL,
-            t_number TEXT NOT NULL,
-            site_name TEXT NOT NULL,
-            initial_state TEXT NOT NULL,
-            action TEXT NOT NULL,
-            arrival_time TEXT NOT NULL,
-            departure_time TEXT,
-            final_state TEXT,
-            comment TEXT,
-            status TEXT DEFAULT 'en_cours',
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (fme_id) REFERENCES fme (id)
-        )
+        SELECT name AS action
+        FROM labels l
+        WHERE name != '' AND (EXISTS (SELECT 1 FROM main.intervention_records r WHERE r.action_id = l.id)
+            OR EXISTS (SELECT 1 FROM archive.intervention_records r WHERE r.action_id = l.id))
+        ORDER BY name
     ''')
+    return cursor
+
+def list_format(args):
+    """Format de liste demandé (None, ou l'un de LIST_FORMATS) ; lève ValueError s'il est inconnu"""
+    format = args.get('format') or None
+    if format is not None and format not in LIST_FORMATS:
+        raise ValueError(f"Paramètre format invalide (attendu : {', '.join(LIST_FORMATS)})")
+    return format
+
+def tuple_cursor(conn):
+    """Curseur dont les lignes sont des tuples plutôt que des sqlite3.Row"""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return cursor
+
+def encode_rows(cursor, rows=None, format=None):
+    """Lignes du dernier SELECT en liste d'objets, ou selon format en
+    {columns, rows} (une liste par ligne) ou {columns, values} (une liste
+    par colonne).
     
-    conn.commit()
-    conn.close()
+    Les formats compacts passent les tuples lus tels quels à l'encodeur
+    JSON : avec tuple_cursor, aucun objet n'est créé par ligne.
+    """
+    if rows is None:
+        rows = cursor.fetchall()
+    columns = [column[0] for column in cursor.description]
+    if format == 'rows':
+        if rows and not isinstance(rows[0], tuple):
+            rows = [tuple(row) for row in rows]
+        return {'columns': columns, 'rows': rows}
+    if format == 'columnar':
+        return {'columns': columns, 'values': list(zip(*rows)) if rows else [[] for _ in columns]}
+    return [dict(zip(columns, row)) for row in rows]
+
+def prune_tombstones(cursor):
+    """Purger les tombstones expirées et mémoriser la dernière version purgée"""
+    cursor.execute('''
+        SELECT MAX(row_version) AS version FROM intervention_tombstones
+        WHERE deleted_at < datetime('now', ?)
+    ''', (f'-{TOMBSTONE_RETENTION_DAYS} days',))
+    pruned = cursor.fetchone()['version']
+    if pruned is not None:
+        cursor.execute('DELETE FROM intervention_tombstones WHERE row_version <= ?', (pruned,))
+        cursor.execute('UPDATE sync_state SET pruned_version = ? WHERE id = 1', (pruned,))
+
+# Colonnes des exports (en-tête, clé de la ligne SQL)
+EXPORT_COLUMNS = [
+    ('ID', 'id'),
+    ('Ticket', 'ticket_number'),
+    ('FME', 'fme_name'),
+    ('Entreprise', 'company_name'),
+    ('Téléphone', 'phone_number'),
+    ('T-Number', 't_number'),
+    ('Site', 'site_name'),
+    ('État Initial', 'initial_state'),
+    ('Action', 'action'),
+    ('Arrivée', 'arrival_time'),
+    ('Départ', 'departure_time'),
+    ('État Final', 'final_state'),
+    ('Commentaire', 'comment'),
+    ('Statut', 'status'),
+    ('Date Création', 'created_at'),
+]
+
+def export_rows(cursor, args):
+    """Lignes d'un export (filtres de args), archive comprise, les plus
+    récentes d'abord.
+    
+    Chaque base est lue dans l'ordre de son index created_epoch et les deux
+    flux sont fusionnés au fil de la lecture : ni la vue interventions_history
+    (UNION ALL), ni un tri de tout l'historique avant la première ligne. Les
+    deux lectures partagent une transaction, donc un même instantané.
+    """
+    where, params = build_intervention_filters(args, history=True)
+    cursor.execute('BEGIN')
+    streams = []
+    for schema in ('main', 'archive'):
+        source = '(' + INTERVENTIONS_VIEW_SELECT.format(source=f'{schema}.intervention_records') + ')'
+        schema_cursor = cursor.connection.cursor()
+        schema_cursor.execute(INTERVENTION_SELECT.format(source=source) + '''
+            WHERE ''' + where + '''
+            ORDER BY i.created_epoch DESC, i.id DESC
+        ''', params)
+        streams.append(schema_cursor)
+    # created_at ('YYYY-MM-DD HH:MM:SS') se trie comme created_epoch
+    return heapq.merge(*streams, key=lambda row: (row['created_at'], row['id']), reverse=True)
+
+def iter_export_rows(rows):
+    """Parcourir les lignes d'un export par lots de EXPORT_BATCH_SIZE"""
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, EXPORT_BATCH_SIZE))
+        if not batch:
+            return
+        yield [[row[key] for _, key in EXPORT_COLUMNS] for row in batch]
+
+def generate_csv(rows):
+    """Produire le CSV (BOM UTF-8 pour Excel) lot par lot"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow([header for header, _ in EXPORT_COLUMNS])
+    yield '\ufeff'.encode('utf-8') + output.getvalue().encode('utf-8')
+    
+    for batch in iter_export_rows(rows):
+        output.seek(0)
+        output.truncate()
+        writer.writerows([['' if value is None else value for value in row] for row in batch])
+        yield output.getvalue().encode('utf-8')
+
+class _StreamBuffer:
+    """Tampon en écriture seule vidé par le générateur à chaque lot"""
+    
+    def __init__(self):
+        self.chunks = []
+    
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Interventions" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+# Caractères de contrôle interdits dans le XML
+_XML_INVALID_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+def _xlsx_column(index):
+    """Lettre(s) de colonne Excel pour un index commençant à 0"""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+def _xlsx_row(number, values):
+    cells = []
+    for index, value in enumerate(values):
+        ref = f'{_xlsx_column(index)}{number}'
+        if value is None or value == '':
+            continue
+        if isinstance(value, (int, float)):
+            cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+        else:
+            text = xml_escape(_XML_INVALID_CHARS.sub('', str(value)))
+            cells.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f'<row r="{number}">{"".join(cells)}</row>'
+
+def generate_xlsx(rows):
+    """Produire un classeur XLSX ligne par ligne, sans le construire en mémoire.
+    
+    Les chaînes sont écrites en ligne (inlineStr), ce qui évite la table
+    de chaînes partagées et permet d'émettre la feuille au fil de l'eau.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+    
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetData>' + _xlsx_row(1, [header for header, _ in EXPORT_COLUMNS])
+            ).encode('utf-8'))
+            yield buffer.drain()
+    
+            number = 1
+            for batch in iter_export_rows(rows):
+                lines = []
+                for values in batch:
+                    number += 1
+                    lines.append(_xlsx_row(number, values))
+                sheet.write(''.join(lines).encode('utf-8'))
+                yield buffer.drain()
+    
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+# Import en masse : champs acceptés et champs obligatoires
+BULK_FIELDS = [
+    'ticket_number', 'fme_name', 'company_name', 'phone_number', 't_number', 'site_name',
+    'initial_state', 'action', 'arrival_time', 'departure_time', 'final_state', 'comment',
+    'status', 'created_at'
+]
+BULK_REQUIRED_FIELDS = [
+    'fme_name', 'company_name', 'phone_number', 't_number', 'site_name', 'initial_state', 'action',
+    'arrival_time'
+]
+
+def iter_bulk_rows():
+    """Lignes brutes d'un import : tableau JSON ou CSV au format de l'export"""
+    if request.is_json:
+        data = request.get_json()
+        if not isinstance(data, list):
+            raise ValueError('Un tableau JSON d\'interventions est attendu')
+        return iter(data)
+    
+    if 'file' in request.files:
+        stream = request.files['file'].stream
+    elif request.mimetype == 'text/csv':
+        stream = request.stream
+    else:
+        raise ValueError('Envoyer un tableau JSON ou un fichier CSV')
+    
+    # Les en-têtes de l'export sont traduits en noms de champs de l'API
+    headers = {header: key for header, key in EXPORT_COLUMNS}
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    return ({headers.get(name, name): value for name, value in row.items()} for row in reader)
+
+def _bulk_timestamp(value, field):
+    """Normaliser un horodatage au format 'YYYY-MM-DD HH:MM:SS' ; une date
+    avec fuseau (+02:00, Z) est convertie en heure locale du serveur, celle
+    des interventions saisies dans l'application"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Le champ {field} n\'est pas une date valide')
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+def normalize_bulk_row(raw):
+    """Valider une ligne d'import ; lève ValueError avec le message d'erreur"""
+    if not isinstance(raw, dict):
+        raise ValueError('Ligne invalide')
+    row = {field: (str(raw.get(field) or '').strip() or None) for field in BULK_FIELDS}
+    
+    for field in BULK_REQUIRED_FIELDS:
+        if not row[field]:
+            raise ValueError(f'Le champ {field} est requis')
+    
+    for field in ('arrival_time', 'departure_time', 'created_at'):
+        if row[field]:
+            row[field] = _bulk_timestamp(row[field], field)
+    
+    if not row['status']:
+        row['status'] = 'termine' if row['final_state'] else 'en_cours'
+    if row['status'] not in ('en_cours', 'termine'):
+        raise ValueError(f'Statut inconnu : {row["status"]}')
+    if row['status'] == 'termine' and not row['final_state']:
+        raise ValueError('Le champ final_state est requis pour une intervention terminée')
+    
+    # Sans date de création, l'intervention est classée à sa date d'arrivée
+    row['created_at'] = row['created_at'] or row['arrival_time']
+    return row
+
+def _select_in(cursor, query, values):
+    """Exécuter query (contenant {marks}) par paquets pour une liste de valeurs"""
+    values = list(values)
+    results = []
+    for start in range(0, len(values), 500):
+        batch = values[start:start + 500]
+        cursor.execute(query.format(marks=', '.join('?' * len(batch))), batch)
+        results.extend(cursor.fetchall())
+    return results
+
+def import_bulk_chunk(conn, chunk, errors, usages):
+    """Insérer un lot de lignes validées dans une seule transaction ;
+    ajoute à usages (site, FME, action, arrivée) de chaque ligne insérée"""
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        # Tickets déjà présents en base ou en double dans le lot
+        provided = [row['ticket_number'] for _, row in chunk if row['ticket_number']]
+        existing = {r['ticket_number'] for r in _select_in(
+            cursor, f'SELECT ticket_number FROM {INTERVENTION_RECORDS_HISTORY} WHERE ticket_number IN ({{marks}})',
+            set(provided)
+        )}
+        accepted = []
+        for number, row in chunk:
+            ticket = row['ticket_number']
+            if ticket and ticket in existing:
+                errors.append({'row': number, 'error': f'Le ticket {ticket} existe déjà'})
+                continue
+            if ticket:
+                existing.add(ticket)
+            accepted.append(row)
+    
+        if not accepted:
+            conn.commit()
+            return 0
+    
+        # Entreprises, FME et sites résolus en une passe
+        cursor.executemany('INSERT OR IGNORE INTO companies (company_name) VALUES (?)',
+                           [(name,) for name in {row['company_name'] for row in accepted}])
+        company_ids = {r['company_name']: r['id'] for r in _select_in(
+            cursor, 'SELECT id, company_name FROM companies WHERE company_name IN ({marks})',
+            {row['company_name'] for row in accepted}
+        )}
+    
+        fme_rows = {(row['fme_name'], company_ids[row['company_name']]): row['phone_number'] for row in accepted}
+        cursor.executemany('INSERT OR IGNORE INTO fme (fme_name, company_id, phone_number) VALUES (?, ?, ?)',
+                           [(name, company_id, phone) for (name, company_id), phone in fme_rows.items()])
+        fme_ids = {}
+        for company_id in {company_id for _, company_id in fme_rows}:
+            names = {name for name, cid in fme_rows if cid == company_id}
+            for r in _select_in(cursor, f'SELECT id, fme_name FROM fme WHERE company_id = {int(company_id)} AND fme_name IN ({{marks}})', names):
+                fme_ids[(r['fme_name'], company_id)] = r['id']
+    
+        cursor.executemany('INSERT OR IGNORE INTO sites (t_number, site_name) VALUES (?, ?)',
+                           list({row['t_number']: row['site_name'] for row in accepted}.items()))
+        sites = {r['t_number']: (r['id'], r['site_name']) for r in _select_in(
+            cursor, 'SELECT id, t_number, site_name FROM sites WHERE t_number IN ({marks})',
+            {row['t_number'] for row in accepted}
+        )}
+    
+        # Actions, états et statuts internés dans labels
+        names = {row[field] for row in accepted for field in ('initial_state', 'action', 'final_state', 'status')}
+        names.discard(None)
+        cursor.executemany('INSERT OR IGNORE INTO labels (name) VALUES (?)', [(name,) for name in names])
+        labels = {r['name']: r['id'] for r in _select_in(
+            cursor, 'SELECT id, name FROM labels WHERE name IN ({marks})', names
+        )}
+    
+        # Les tickets fournis ne doivent pas être réattribués : la séquence de
+        # leur jour est avancée avant toute réservation
+        cursor.executemany('''
+            INSERT INTO ticket_sequences (day, last_number) VALUES (?, ?)
+            ON CONFLICT (day) DO UPDATE SET last_number = MAX(last_number, excluded.last_number)
+        ''', [
+            (ticket[4:12], int(ticket[13:]))
+            for ticket in provided
+            if re.fullmatch(r'TKT-\d{8}-\d+', ticket)
+        ])
+    
+        # Numéros de ticket : une réservation par jour d'arrivée, au-delà du
+        # plus grand ticket déjà en base pour ce jour (archive comprise)
+        missing_by_day = {}
+        for row in accepted:
+            if not row['ticket_number']:
+                missing_by_day.setdefault(row['arrival_time'][:10].replace('-', ''), []).append(row)
+        for day, day_rows in missing_by_day.items():
+            cursor.execute(f'''
+                INSERT INTO ticket_sequences (day, last_number)
+                SELECT ?, COALESCE(MAX(CAST(substr(ticket_number, 14) AS INTEGER)), 0)
+                FROM {INTERVENTION_RECORDS_HISTORY}
+                WHERE ticket_number >= ? AND ticket_number < ?
+                ON CONFLICT (day) DO UPDATE SET last_number = MAX(last_number, excluded.last_number)
+            ''', (day, f'TKT-{day}-', f'TKT-{day}.'))
+            cursor.execute('''
+                UPDATE ticket_sequences SET last_number = last_number + ? WHERE day = ?
+                RETURNING last_number
+            ''', (len(day_rows), day))
+            last_number = cursor.fetchone()['last_number']
+            for offset, row in enumerate(day_rows):
+                row['ticket_number'] = f'TKT-{day}-{str(last_number - len(day_rows) + offset + 1).zfill(4)}'
+    
+        cursor.executemany(f'''
+            INSERT INTO intervention_records 
+            (ticket_number, fme_id, site_id, site_name, initial_state_id, action_id, arrival_epoch,
+             departure_epoch, final_state_id, comment, status_id, created_epoch)
+            VALUES (?, ?, ?, ?, ?, ?, {epoch_sql('?')}, {epoch_sql('?')}, ?, ?, ?, {epoch_sql('?')})
+        ''', [(
+            row['ticket_number'],
+            fme_ids[(row['fme_name'], company_ids[row['company_name']])],
+            sites[row['t_number']][0],
+            row['site_name'] if row['site_name'] != sites[row['t_number']][1] else None,
+            labels[row['initial_state']],
+            labels[row['action']],
+            row['arrival_time'],
+            row['departure_time'],
+            labels.get(row['final_state']),
+            row['comment'],
+            labels[row['status']],
+            row['created_at']
+        ) for row in accepted])
+    
+        conn.commit()
+        usages.extend((
+            sites[row['t_number']][0],
+            fme_ids[(row['fme_name'], company_ids[row['company_name']])],
+            labels[row['action']],
+            text_epoch(row['arrival_time'])
+        ) for row in accepted)
+        return len(accepted)
+    except Exception:
+        conn.rollback()
+        raise
+
+def import_bulk_chunk_or_report(conn, chunk, errors, usages):
+    """import_bulk_chunk ; un lot refusé par une contrainte de la base est
+    annulé en entier et chacune de ses lignes listée dans errors, l'import
+    continuant avec le lot suivant"""
+    try:
+        return import_bulk_chunk(conn, chunk, errors, usages)
+    except sqlite3.IntegrityError as e:
+        reported = {error['row'] for error in errors}
+        errors.extend({'row': number, 'error': f'Lot non importé : {e}'}
+                      for number, _ in chunk if number not in reported)
+        return 0
+
+_index_page = {}
 
 @app.route('/')
 def index():
     """Page principale"""
-    # Lire et servir le fichier HTML React directement
-    with open('index.html', 'r', encoding='utf-8') as f:
-        return f.read()
+    # La page est rendue une fois avec les noms hachés du manifeste puis
+    # servie depuis la mémoire ; elle n'est refaite que si index.html ou
+    # le manifeste changent (nouvelle construction)
+    manifest_path = os.path.join(FRONTEND_DIST, 'manifest.json')
+    try:
+        key = (os.stat('index.html').st_mtime_ns, os.stat(manifest_path).st_mtime_ns)
+    except FileNotFoundError:
+        return Response('Tableau de bord non construit : exécuter python frontend/build.py\n',
+                        status=503, mimetype='text/plain')
+    if _index_page.get('key') != key:
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        with open('index.html', encoding='utf-8') as f:
+            template = app.jinja_env.from_string(f.read())
+        body = template.render(asset=lambda name: f'/assets/{manifest[name]}').encode('utf-8')
+        _index_page.update(
+            key=key,
+            tag=hashlib.sha1(body).hexdigest()[:16],
+            body=body,
+            gzipped=gzip.compress(body, 9)
+        )
+    page = dict(_index_page)
+    return conditional_response(page['tag'], lambda: (page['body'], page['gzipped']), 'text/html')
+
+@app.route('/assets/<path:filename>')
+def asset(filename):
+    """Fichiers du tableau de bord (JS, CSS), en version gzip précompressée
+    si le navigateur l'accepte"""
+    use_gzip = accepts_gzip() and os.path.isfile(os.path.join(FRONTEND_DIST, filename + '.gz'))
+    response = send_from_directory(
+        FRONTEND_DIST, filename + '.gz' if use_gzip else filename,
+        mimetype=mimetypes.guess_type(filename)[0], max_age=ASSET_MAX_AGE
+    )
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
 
 @app.route('/api/companies', methods=['GET'])
 def get_companies():
     """Récupérer toutes les entreprises"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT id, company_name FROM companies ORDER BY company_name')
-    companies = [dict(row) for row in cursor.fetchall()]
-    
-    conn.close()
-    return jsonify(companies)
+    return reference_rows_response('companies', ('companies',), query_companies)
 
 @app.route('/api/companies', methods=['POST'])
 def add_company():
@@ -105,40 +3172,30 @@ def add_company():
     if not company_name:
         return jsonify({'error': 'Le nom de l\'entreprise est requis'}), 400
     
-    conn = get_db()
-    cursor = conn.cursor()
+    def job(cursor):
+        try:
+            cursor.execute('INSERT INTO companies (company_name) VALUES (?)', (company_name,))
+            return cursor.lastrowid, True
+        except sqlite3.IntegrityError:
+            # Entreprise existe déjà
+            cursor.execute('SELECT id FROM companies WHERE company_name = ?', (company_name,))
+            return cursor.fetchone()['id'], False
     
-    try:
-        cursor.execute('INSERT INTO companies (company_name) VALUES (?)', (company_name,))
-        company_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return jsonify({'success': True, 'id': company_id, 'company_name': company_name})
-    except sqlite3.IntegrityError:
-        # Entreprise existe déjà
-        cursor.execute('SELECT id, company_name FROM companies WHERE company_name = ?', (company_name,))
-        existing = cursor.fetchone()
-        conn.close()
-        return jsonify({'success': True, 'id': existing['id'], 'company_name': existing['company_name']})
+    company_id, created = write_queue.submit(job).result()
+    if created:
+        lookup_cache.update({('company', company_name): company_id})
+        reference_cache.bump('companies')
+        result_cache.bump()
+        autocomplete.refresh(get_read_db(), companies=[company_id])
+    return jsonify({'success': True, 'id': company_id, 'company_name': company_name})
 
 @app.route('/api/fme', methods=['GET'])
 def get_fme_list():
     """Récupérer tous les FME"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT f.id, f.fme_name, c.company_name, f.phone_number 
-        FROM fme f
-        LEFT JOIN companies c ON f.company_id = c.id
-        ORDER BY f.fme_name
-    ''')
-    fme_list = [dict(row) for row in cursor.fetchall()]
-    
-    conn.close()
-    return jsonify(fme_list)
+    return reference_rows_response('fme', ('fme', 'companies'), query_fme)
 
 @app.route('/api/fme/search', methods=['GET'])
+@cached_result
 def search_fme():
     """Rechercher un FME par nom"""
     query = request.args.get('query', '').strip()
@@ -146,20 +3203,26 @@ def search_fme():
     if not query:
         return jsonify([])
     
-    conn = get_db()
+    conn = get_read_db()
     cursor = conn.cursor()
     
+    # Résultats classés par pertinence (bm25) via l'index plein texte
+    if len(query) >= FTS_MIN_QUERY_LENGTH:
+        match, order, params = 's.fme_fts MATCH ?', 's.rank, f.fme_name', (fts_phrase(query),)
+    else:
+        match, order, params = 's.fme_name LIKE ? OR s.company_name LIKE ?', 'f.fme_name', (f'%{query}%',) * 2
+    
     cursor.execute('''
         SELECT f.id, f.fme_name, c.company_name, f.phone_number 
-        FROM fme f
+        FROM fme_fts s
+        JOIN fme f ON f.id = s.rowid
         LEFT JOIN companies c ON f.company_id = c.id
-        WHERE f.fme_name LIKE ? OR c.company_name LIKE ?
-        ORDER BY f.fme_name
+        WHERE ''' + match + '''
+        ORDER BY ''' + order + '''
         LIMIT 10
-    ''', (f'%{query}%', f'%{query}%'))
+    ''', params)
     
     results = [dict(row) for row in cursor.fetchall()]
-    conn.close()
     
     return jsonify(results)
 
@@ -174,69 +3237,165 @@ def add_fme():
     if not fme_name or not company_name or not phone_number:
         return jsonify({'error': 'Tous les champs sont requis'}), 400
     
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    # Vérifier/créer l'entreprise
-    cursor.execute('SELECT id FROM companies WHERE company_name = ?', (company_name,))
-    company = cursor.fetchone()
+    def job(cursor):
+        # Vérifier/créer l'entreprise
+        pending = {}
+        company_id = resolve_company(cursor, company_name, pending)
     
-    if company:
-        company_id = company['id']
-    else:
-        cursor.execute('INSERT INTO companies (company_name) VALUES (?)', (company_name,))
-        company_id = cursor.lastrowid
+        try:
+            cursor.execute('''
+                INSERT INTO fme (fme_name, company_id, phone_number) 
+                VALUES (?, ?, ?)
+            ''', (fme_name, company_id, phone_number))
+        except sqlite3.IntegrityError:
+            # FME existe déjà, le récupérer
+            cursor.execute('''
+                SELECT f.id, f.fme_name, c.company_name, f.phone_number 
+                FROM fme f
+                LEFT JOIN companies c ON f.company_id = c.id
+                WHERE f.fme_name = ? AND f.company_id = ?
+            ''', (fme_name, company_id))
+            return dict(cursor.fetchone()), None
     
-    try:
-        cursor.execute('''
-            INSERT INTO fme (fme_name, company_id, phone_number) 
-            VALUES (?, ?, ?)
-        ''', (fme_name, company_id, phone_number))
         fme_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return jsonify({'success': True, 'id': fme_id, 'fme_name': fme_name, 'company_name': company_name, 'phone_number': phone_number})
-    except sqlite3.IntegrityError:
-        # FME existe déjà, le récupérer
-        cursor.execute('''
-            SELECT f.id, f.fme_name, c.company_name, f.phone_number 
-            FROM fme f
-            LEFT JOIN companies c ON f.company_id = c.id
-            WHERE f.fme_name = ? AND f.company_id = ?
-        ''', (fme_name, company_id))
-        existing_fme = cursor.fetchone()
-        conn.close()
-        return jsonify({'success': True, 'id': existing_fme['id'], 'fme_name': existing_fme['fme_name'], 'company_name': existing_fme['company_name'], 'phone_number': existing_fme['phone_number']})
+        pending[('fme', fme_name, company_id)] = (fme_id, phone_number)
+        return {'id': fme_id, 'fme_name': fme_name, 'company_name': company_name, 'phone_number': phone_number}, pending
+    
+    fme, pending = write_queue.submit(job).result()
+    if pending is not None:
+        lookup_cache.update(pending)
+        reference_cache.bump('companies', 'fme')
+        result_cache.bump()
+        autocomplete.refresh(get_read_db(), fme=[fme['id']],
+                             companies=[value for key, value in pending.items() if key[0] == 'company'])
+    return jsonify({'success': True, **fme})
 
 @app.route('/api/sites', methods=['GET'])
 def get_sites():
     """Récupérer tous les sites"""
-    conn = get_db()
+    return reference_rows_response('sites', ('sites',), query_sites)
+
+@app.route('/api/sites/<t_number>', methods=['GET'])
+def get_site_by_tnumber(t_number):
+    """Récupérer un site par son T-Number"""
+    conn = get_read_db()
     cursor = conn.cursor()
     
-    cursor.execute('SELECT t_number, site_name FROM sites ORDER BY t_number')
-    sites = [{'t_number': row['t_number'], 'site_name': row['site_name']} for row in cursor.fetchall()]
+    cursor.execute('SELECT t_number, site_name FROM sites WHERE t_number = ?', (t_number,))
+    site = cursor.fetchone()
+    
+    if site:
+        return jsonify({'t_number': site['t_number'], 'site_name': site['site_name']})
+    else:
+        return jsonify({'error': 'Site non trouvé'}), 404
+
+@app.route('/api/sites/down', methods=['GET'])
+@cached_result
+def get_down_sites():
+    """Sites actuellement down (état de leur dernière intervention), du
+    changement le plus récent au plus ancien ; lus dans site_status par
+    son index sur l'état, sans parcourir l'historique"""
+    try:
+        format = list_format(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    cursor = tuple_cursor(get_read_db())
+    cursor.execute('''
+        SELECT
+            s.t_number, s.site_name, l.name AS state,
+            datetime(ss.last_change_epoch, 'unixepoch') AS since,
+            ss.last_intervention_id, ss.open_count
+        FROM site_status ss
+        JOIN sites s ON s.id = ss.site_id
+        JOIN labels l ON l.id = ss.state_id
+        WHERE ss.state_id = (SELECT id FROM labels WHERE name = 'down')
+        ORDER BY ss.last_change_epoch DESC
+    ''')
+    return jsonify(encode_rows(cursor, format=format))
+
+@app.route('/api/sites/<t_number>/interventions', methods=['GET'])
+@cached_result
+def get_site_timeline(t_number):
+    """Interventions d'un site, de la plus récente à la plus ancienne
+    (archive comprise), avec l'état courant du site.
+    
+    Pagination par curseur sur (arrival_time, id), renvoyé dans l'en-tête
+    X-Next-Cursor. Chaque base ne lit que la page demandée dans l'index
+    (site_id, arrival_epoch) ; les interventions retenues sont ensuite lues
+    par leur id.
+    """
+    cursor = get_read_db().cursor()
+    
+    cursor.execute('''
+        SELECT s.id, s.t_number, s.site_name, l.name AS state,
+            datetime(ss.last_change_epoch, 'unixepoch') AS since, ss.open_count
+        FROM sites s
+        LEFT JOIN site_status ss ON ss.site_id = s.id
+        LEFT JOIN labels l ON l.id = ss.state_id
+        WHERE s.t_number = ?
+    ''', (t_number,))
+    site = cursor.fetchone()
+    if site is None:
+        return jsonify({'error': 'Site non trouvé'}), 404
+    
+    try:
+        limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'Paramètre limit invalide'}), 400
+    try:
+        format = list_format(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    conn.close()
-    return jsonify(sites)
-
-@app.route('/api/sites/<t_number>', methods=['GET'])
-def get_site_by_tnumber(t_number):
-    """Récupérer un site par son T-Number"""
-    conn = get_db()
-    cursor = conn.cursor()
+    where = 'site_id = ?'
+    params = [site['id']]
+    page_cursor = request.args.get('cursor', '')
+    if page_cursor:
+        try:
+            arrival_time, last_id = decode_cursor(page_cursor)
+        except ValueError:
+            return jsonify({'error': 'Curseur invalide'}), 400
+        where += f" AND (arrival_epoch, id) < ({epoch_sql('?')}, ?)"
+        params += [arrival_time, last_id]
     
-    cursor.execute('SELECT t_number, site_name FROM sites WHERE t_number = ?', (t_number,))
-    site = cursor.fetchone()
+    branches = ' UNION ALL '.join(
+        f'''SELECT * FROM (
+            SELECT id, arrival_epoch FROM {database}.intervention_records
+            WHERE {where}
+            ORDER BY arrival_epoch DESC, id DESC
+            LIMIT ?
+        )'''
+        for database in ('main', 'archive')
+    )
+    cursor.execute(f'{branches} ORDER BY arrival_epoch DESC, id DESC LIMIT ?',
+                   (params + [limit + 1]) * 2 + [limit + 1])
+    ids = [row['id'] for row in cursor.fetchall()]
     
-    conn.close()
+    rows = []
+    if ids:
+        cursor.execute(
+            INTERVENTION_SELECT.format(source='interventions_history')
+            + f"WHERE i.id IN ({', '.join('?' * len(ids))})",
+            ids
+        )
+        by_id = {row['id']: row for row in cursor.fetchall()}
+        rows = [by_id[intervention_id] for intervention_id in ids]
     
-    if site:
-        return jsonify({'t_number': site['t_number'], 'site_name': site['site_name']})
-    else:
-        return jsonify({'error': 'Site non trouvé'}), 404
+    response = jsonify({
+        't_number': site['t_number'],
+        'site_name': site['site_name'],
+        'state': site['state'],
+        'since': site['since'],
+        'open_count': site['open_count'] or 0,
+        'interventions': encode_rows(cursor, rows[:limit], format)
+    })
+    if len(rows) > limit:
+        response.headers['X-Next-Cursor'] = encode_cursor(rows[limit - 1]['arrival_time'], rows[limit - 1]['id'])
+    return response
 
 @app.route('/api/interventions/search', methods=['GET'])
+@cached_result
 def search_interventions():
     """Rechercher des interventions par T-Number ou ticket"""
     query = request.args.get('query', '').strip()
@@ -244,24 +3403,40 @@ def search_interventions():
     if not query:
         return jsonify([])
     
-    conn = get_db()
+    conn = get_read_db()
     cursor = conn.cursor()
     
+    # Résultats classés par pertinence (bm25) via les index plein texte,
+    # celui des interventions récentes et celui de l'archive. Les 20
+    # premiers sont choisis sur les seules tables compactes, puis lus par
+    # id : joindre interventions_history (UNION ALL) la parcourrait en entier.
+    if len(query) >= FTS_MIN_QUERY_LENGTH:
+        match, params = 's.interventions_fts MATCH ?', (fts_phrase(query),)
+    else:
+        match, params = 's.t_number LIKE ? OR s.ticket_number LIKE ? OR s.site_name LIKE ?', (f'%{query}%',) * 3
+    
     cursor.execute('''
-        SELECT 
-            i.id, i.ticket_number, i.t_number, i.site_name, i.initial_state, i.action,
-            i.arrival_time, i.departure_time, i.final_state, i.comment, i.status, i.created_at,
-            f.fme_name, c.company_name, f.phone_number
-        FROM interventions i
-        LEFT JOIN fme f ON i.fme_id = f.id
-        LEFT JOIN companies c ON f.company_id = c.id
-        WHERE i.t_number LIKE ? OR i.ticket_number LIKE ? OR i.site_name LIKE ?
-        ORDER BY i.created_at DESC
+        SELECT s.rowid AS id, s.rank, r.created_epoch
+        FROM main.interventions_fts s
+        JOIN main.intervention_records r ON r.id = s.rowid
+        WHERE ''' + match + '''
+        UNION ALL
+        SELECT s.rowid, s.rank, r.created_epoch
+        FROM archive.interventions_fts s
+        JOIN archive.intervention_records r ON r.id = s.rowid
+        WHERE ''' + match + '''
+        ORDER BY rank, created_epoch DESC
         LIMIT 20
-    ''', (f'%{query}%', f'%{query}%', f'%{query}%'))
+    ''', params * 2)
+    ids = [row['id'] for row in cursor.fetchall()]
+    if not ids:
+        return jsonify([])
     
-    interventions = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    cursor.execute(INTERVENTION_SELECT.format(source='interventions_history') + f'''
+        WHERE i.id IN ({', '.join('?' * len(ids))})
+    ''', ids)
+    found = {row['id']: dict(row) for row in cursor.fetchall()}
+    interventions = [found[intervention_id] for intervention_id in ids if intervention_id in found]
     
     return jsonify(interventions)
 
@@ -275,85 +3450,231 @@ def add_site():
     if not t_number or not site_name:
         return jsonify({'error': 'T-Number et nom du site requis'}), 400
     
-    conn = get_db()
-    cursor = conn.cursor()
+    def job(cursor):
+        cursor.execute('INSERT INTO sites (t_number, site_name) VALUES (?, ?)', (t_number, site_name))
+        return cursor.lastrowid
     
     try:
-        cursor.execute('INSERT INTO sites (t_number, site_name) VALUES (?, ?)', (t_number, site_name))
-        conn.commit()
-        conn.close()
-        return jsonify({'success': True, 't_number': t_number, 'site_name': site_name})
+        site_id = write_queue.submit(job).result()
     except sqlite3.IntegrityError:
-        conn.close()
         return jsonify({'error': 'Ce T-Number existe déjà'}), 400
+    
+    lookup_cache.update({('site', t_number): (site_id, site_name)})
+    reference_cache.bump('sites')
+    result_cache.bump()
+    autocomplete.refresh(get_read_db(), sites=[site_id])
+    return jsonify({'success': True, 't_number': t_number, 'site_name': site_name})
 
 @app.route('/api/suggestions/actions', methods=['GET'])
 def get_action_suggestions():
     """Récupérer les suggestions d'actions depuis les interventions passées"""
-    conn = get_db()
-    cursor = conn.cursor()
+    def build():
+        return [row['action'] for row in query_action_suggestions(get_read_db().cursor())]
     
-    cursor.execute('''
-        SELECT DISTINCT action 
-        FROM interventions 
-        WHERE action IS NOT NULL AND action != ''
-        ORDER BY action
-    ''')
-    actions = [row['action'] for row in cursor.fetchall()]
+    return reference_response('actions', ('actions',), build)
+
+@app.route('/api/autocomplete', methods=['GET'])
+def get_autocomplete():
+    """Meilleures suggestions pour une saisie en cours du formulaire.
     
-    conn.close()
-    return jsonify(actions)
+    Paramètres : kind (sites, fme, companies ou actions), q et limit. q est
+    le début du T-Number ou du nom du site, du nom du FME ou de son
+    entreprise, du nom de l'entreprise ou de l'action, ou de l'un de leurs
+    mots (sans tenir compte des accents ni des majuscules). Les éléments
+    les plus utilisés récemment viennent en premier ; sans q, ce sont
+    simplement les plus utilisés.
+    """
+    kind = request.args.get('kind', '')
+    if kind not in AUTOCOMPLETE_KINDS:
+        return jsonify({'error': f"Paramètre kind invalide (attendu : {', '.join(AUTOCOMPLETE_KINDS)})"}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', AUTOCOMPLETE_DEFAULT_LIMIT)), 1), AUTOCOMPLETE_MAX_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'Paramètre limit invalide'}), 400
+    
+    prefix = request.args.get('q', '')
+    results = autocomplete.search(kind, prefix, limit, AUTOCOMPLETE_READY_WAIT_MS / 1000)
+    if results is None:
+        results = autocomplete_fallback(kind, prefix, limit)
+    return jsonify(results)
+
+def autocomplete_fallback(kind, prefix, limit):
+    """Suggestions tant que l'index d'autocomplétion n'est pas prêt : listes
+    de référence lues en SQL et filtrées comme l'index (début d'un mot, sans
+    accents ni majuscules), mais dans l'ordre alphabétique"""
+    query, fields = {
+        'sites': (query_sites, ('t_number', 'site_name')),
+        'fme': (query_fme, ('fme_name', 'company_name')),
+        'companies': (query_companies, ('company_name',)),
+        'actions': (query_action_suggestions, ('action',)),
+    }[kind]
+    prefix = normalize_term(prefix.strip())
+    results = []
+    for row in query(get_read_db().cursor()):
+        if not prefix or any(term.startswith(prefix) for term in prefix_terms([row[field] for field in fields])):
+            results.append(dict(row))
+            if len(results) == limit:
+                break
+    return results
 
 @app.route('/api/interventions', methods=['GET'])
+@cached_result
 def get_interventions():
-    """Récupérer toutes les interventions avec filtres"""
-    status = request.args.get('status', '')
-    company = request.args.get('company', '')
-    site_down = request.args.get('site_down', '')
-    date_from = request.args.get('date_from', '')
-    date_to = request.args.get('date_to', '')
+    """Récupérer une page d'interventions avec filtres.
     
-    conn = get_db()
+    Pagination par curseur sur (created_at, id) : le curseur de la page
+    suivante est renvoyé dans l'en-tête X-Next-Cursor (absent sur la
+    dernière page). Les interventions archivées ne sont lues qu'avec
+    archive=true ou une date_from qui remonte jusqu'à l'archive. Avec
+    format=rows ou format=columnar, la page est encodée dans ce format
+    compact plutôt qu'en liste d'objets.
+    """
+    conn = get_read_db()
     cursor = conn.cursor()
     
-    query = '''
-        SELECT 
-            i.id, i.ticket_number, i.t_number, i.site_name, i.initial_state, i.action,
-            i.arrival_time, i.departure_time, i.final_state, i.comment, i.status, i.created_at,
-            f.fme_name, c.company_name, f.phone_number
-        FROM interventions i
-        LEFT JOIN fme f ON i.fme_id = f.id
-        LEFT JOIN companies c ON f.company_id = c.id
-        WHERE 1=1
-    '''
-    params = []
+    try:
+        format = list_format(request.args)
+        query, params, limit = intervention_page_query(request.args, include_archive(cursor, request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    if status:
-        query += ' AND i.status = ?'
-        params.append(status)
+    cursor = tuple_cursor(conn)
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
     
-    if company:
-        query += ' AND c.company_name = ?'
-        params.append(company)
+    response = jsonify(encode_rows(cursor, rows[:limit], format))
+    next_cursor = next_page_cursor(cursor, rows, limit)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+@app.route('/api/bootstrap', methods=['GET'])
+@cached_result
+def get_bootstrap():
+    """Données initiales du tableau de bord en une seule réponse.
     
-    if site_down == 'true':
-        query += ' AND i.final_state = "down"'
+    Première page d'interventions (mêmes paramètres que /api/interventions),
+    sites, entreprises, FME, suggestions d'actions et version de
+    synchronisation, lus dans une même transaction. Avec format (rows ou
+    columnar), chaque liste est encodée dans ce format compact. lists
+    restreint les listes de référence renvoyées (par exemple
+    lists=companies quand le formulaire passe par /api/autocomplete).
+    """
+    conn = get_read_db()
+    cursor = tuple_cursor(conn)
     
-    if date_from:
-        query += ' AND DATE(i.arrival_time) >= DATE(?)'
-        params.append(date_from)
+    lists = request.args.get('lists')
+    lists = set(filter(None, lists.split(','))) if lists is not None else set(BOOTSTRAP_LISTS)
+    if not lists <= set(BOOTSTRAP_LISTS):
+        return jsonify({'error': f"Paramètre lists invalide (valeurs possibles : {', '.join(BOOTSTRAP_LISTS)})"}), 400
     
-    if date_to:
-        query += ' AND DATE(i.arrival_time) <= DATE(?)'
-        params.append(date_to)
+    # Transaction de lecture : toutes les listes issues du même instantané
+    cursor.execute('BEGIN')
+    try:
+        format = list_format(request.args)
+        query, params, limit = intervention_page_query(request.args, include_archive(conn.cursor(), request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    query += ' ORDER BY i.created_at DESC'
+    cursor.execute('SELECT version FROM sync_state WHERE id = 1')
+    version = cursor.fetchone()[0]
     
     cursor.execute(query, params)
-    interventions = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    rows = cursor.fetchall()
+    interventions = encode_rows(cursor, rows[:limit], format)
+    next_cursor = next_page_cursor(cursor, rows, limit)
     
-    return jsonify(interventions)
+    data = {'version': version, 'interventions': interventions, 'next_cursor': next_cursor}
+    if 'sites' in lists:
+        data['sites'] = encode_rows(query_sites(cursor), format=format)
+    if 'companies' in lists:
+        data['companies'] = encode_rows(query_companies(cursor), format=format)
+    if 'fme' in lists:
+        data['fme'] = encode_rows(query_fme(cursor), format=format)
+    if 'suggestions' in lists:
+        data['suggestions'] = [row[0] for row in query_action_suggestions(cursor)]
+    return jsonify(data)
+
+@app.route('/api/changes', methods=['GET'])
+def get_changes():
+    """Modifications depuis une version donnée (synchronisation delta).
+    
+    Sans paramètre since, renvoie uniquement la version courante. Les
+    filtres de /api/interventions s'appliquent : une intervention modifiée
+    qui ne correspond plus aux filtres est listée dans removed, avec les
+    interventions supprimées. reset indique que le client doit tout
+    recharger (version trop ancienne ou trop de modifications). Avec
+    format (rows ou columnar), chaque liste est encodée dans ce format.
+    
+    Pas de result_cache : la réponse suit la version courante, y compris
+    après une écriture d'un autre processus (commandes flask).
+    """
+    conn = get_read_db()
+    cursor = tuple_cursor(conn)
+    
+    # Transaction de lecture : version et lignes issues du même instantané
+    cursor.execute('BEGIN')
+    cursor.execute('SELECT version, pruned_version FROM sync_state WHERE id = 1')
+    version, pruned_version = cursor.fetchone()
+    
+    since = request.args.get('since', '')
+    if not since:
+        return jsonify({'version': version})
+    
+    try:
+        since = int(since)
+    except ValueError:
+        return jsonify({'error': 'Paramètre since invalide'}), 400
+    
+    try:
+        format = list_format(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if since < pruned_version or since > version:
+        return jsonify({'version': version, 'reset': True})
+    
+    cursor.execute('SELECT id FROM intervention_records WHERE row_version > ? LIMIT ?',
+                   (since, CHANGES_MAX_ROWS + 1))
+    changed_ids = {row[0] for row in cursor.fetchall()}
+    if len(changed_ids) > CHANGES_MAX_ROWS:
+        return jsonify({'version': version, 'reset': True})
+    
+    where, params = build_intervention_filters(request.args)
+    cursor.execute(INTERVENTION_SELECT.format(source='interventions') + '''
+        WHERE i.row_version > ? AND ''' + where + '''
+        ORDER BY i.created_epoch DESC, i.id DESC
+    ''', [since] + params)
+    rows = cursor.fetchall()
+    id_index = [column[0] for column in cursor.description].index('id')
+    matching_ids = {row[id_index] for row in rows}
+    interventions = encode_rows(cursor, rows, format)
+    
+    cursor.execute('SELECT id FROM intervention_tombstones WHERE row_version > ?', (since,))
+    removed = sorted((changed_ids - matching_ids) | {row[0] for row in cursor.fetchall()})
+    
+    cursor.execute('SELECT id, company_name FROM companies WHERE row_version > ?', (since,))
+    companies = encode_rows(cursor, format=format)
+    
+    cursor.execute('''
+        SELECT f.id, f.fme_name, c.company_name, f.phone_number 
+        FROM fme f
+        LEFT JOIN companies c ON f.company_id = c.id
+        WHERE f.row_version > ?
+    ''', (since,))
+    fme_list = encode_rows(cursor, format=format)
+    
+    cursor.execute('SELECT t_number, site_name FROM sites WHERE row_version > ?', (since,))
+    sites = encode_rows(cursor, format=format)
+    
+    return jsonify({
+        'version': version,
+        'interventions': interventions,
+        'removed': removed,
+        'companies': companies,
+        'fme': fme_list,
+        'sites': sites
+    })
 
 @app.route('/api/interventions', methods=['POST'])
 def create_intervention():
@@ -365,67 +3686,89 @@ def create_intervention():
         if not data.get(field):
             return jsonify({'error': f'Le champ {field} est requis'}), 400
     
-    conn = get_db()
-    cursor = conn.cursor()
+    # Exécuté par le thread écrivain : les créations simultanées passent
+    # l'une après l'autre (entreprise, FME, site et ticket), dans un même lot
+    def job(cursor):
+        # Entrées du cache de référence, enregistrées seulement après le commit,
+        # et tables de référence modifiées
+        pending = {}
+        changed = {'actions'}
     
-    # Vérifier/créer l'entreprise
-    cursor.execute('SELECT id FROM companies WHERE company_name = ?', (data['company_name'],))
-    company = cursor.fetchone()
+        # Vérifier/créer l'entreprise
+        company_id = resolve_company(cursor, data['company_name'], pending)
+        if ('company', data['company_name']) in pending:
+            changed.add('companies')
     
-    if company:
-        company_id = company['id']
-    else:
-        cursor.execute('INSERT INTO companies (company_name) VALUES (?)', (data['company_name'],))
-        company_id = cursor.lastrowid
+        # Vérifier si le FME existe, sinon l'ajouter
+        fme_key = ('fme', data['fme_name'], company_id)
+        fme = lookup_cache.get(fme_key)
+        if fme is None:
+            cursor.execute('SELECT id, phone_number FROM fme WHERE fme_name = ? AND company_id = ?', 
+                           (data['fme_name'], company_id))
+            row = cursor.fetchone()
+            fme = (row['id'], row['phone_number']) if row else None
     
-    # Vérifier si le FME existe, sinon l'ajouter
-    cursor.execute('SELECT id FROM fme WHERE fme_name = ? AND company_id = ?', 
-                   (data['fme_name'], company_id))
-    fme = cursor.fetchone()
+        if fme:
+            fme_id = fme[0]
+            # Mettre à jour le numéro de téléphone si différent
+            if fme[1] != data['phone_number']:
+                cursor.execute('UPDATE fme SET phone_number = ? WHERE id = ?', 
+                              (data['phone_number'], fme_id))
+                changed.add('fme')
+        else:
+            cursor.execute('''
+                INSERT INTO fme (fme_name, company_id, phone_number) 
+                VALUES (?, ?, ?)
+            ''', (data['fme_name'], company_id, data['phone_number']))
+            fme_id = cursor.lastrowid
+            changed.add('fme')
+        pending[fme_key] = (fme_id, data['phone_number'])
     
-    if fme:
-        fme_id = fme['id']
-        # Mettre à jour le numéro de téléphone si différent
-        cursor.execute('UPDATE fme SET phone_number = ? WHERE id = ?', 
-                      (data['phone_number'], fme_id))
-    else:
-        cursor.execute('''
-            INSERT INTO fme (fme_name, company_id, phone_number) 
-            VALUES (?, ?, ?)
-        ''', (data['fme_name'], company_id, data['phone_number']))
-        fme_id = cursor.lastrowid
+        # Vérifier si le site existe, sinon l'ajouter
+        site_key = ('site', data['t_number'])
+        site = lookup_cache.get(site_key)
+        if site is None:
+            cursor.execute('SELECT id, site_name FROM sites WHERE t_number = ?', (data['t_number'],))
+            row = cursor.fetchone()
+            if row:
+                site = (row['id'], row['site_name'])
+            else:
+                cursor.execute('INSERT INTO sites (t_number, site_name) VALUES (?, ?)', 
+                              (data['t_number'], data['site_name']))
+                site = (cursor.lastrowid, data['site_name'])
+                changed.add('sites')
+            pending[site_key] = site
+        site_id, site_name = site
     
-    # Vérifier si le site existe, sinon l'ajouter
-    cursor.execute('SELECT id FROM sites WHERE t_number = ?', (data['t_number'],))
-    if not cursor.fetchone():
-        cursor.execute('INSERT INTO sites (t_number, site_name) VALUES (?, ?)', 
-                      (data['t_number'], data['site_name']))
+        now = datetime.now()
+        ticket_number = next_ticket_number(cursor, now)
+        arrival_time = now.strftime('%Y-%m-%d %H:%M:%S')
+        action_id = resolve_label(cursor, data['action'], pending)
     
-    # Générer le numéro de ticket (format: TKT-YYYYMMDD-XXXX)
-    today = datetime.now().strftime('%Y%m%d')
-    cursor.execute('SELECT COUNT(*) as count FROM interventions WHERE DATE(created_at) = DATE("now")')
-    count_today = cursor.fetchone()['count']
-    ticket_number = f'TKT-{today}-{str(count_today + 1).zfill(4)}'
+        cursor.execute(f'''
+            INSERT INTO intervention_records 
+            (ticket_number, fme_id, site_id, site_name, initial_state_id, action_id, arrival_epoch, status_id)
+            VALUES (?, ?, ?, ?, ?, ?, {epoch_sql('?')}, ?)
+        ''', (
+            ticket_number,
+            fme_id,
+            site_id,
+            data['site_name'] if data['site_name'] != site_name else None,
+            resolve_label(cursor, data['initial_state'], pending),
+            action_id,
+            arrival_time,
+            resolve_label(cursor, 'en_cours', pending)
+        ))
     
-    arrival_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        usage = (site_id, fme_id, action_id, text_epoch(arrival_time))
+        return cursor.lastrowid, ticket_number, arrival_time, usage, pending, changed
     
-    cursor.execute('''
-        INSERT INTO interventions 
-        (ticket_number, fme_id, t_number, site_name, initial_state, action, arrival_time, status)
-        VALUES (?, ?, ?, ?, ?, ?, ?, 'en_cours')
-    ''', (
-        ticket_number,
-        fme_id,
-        data['t_number'],
-        data['site_name'],
-        data['initial_state'],
-        data['action'],
-        arrival_time
-    ))
-    
-    intervention_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    intervention_id, ticket_number, arrival_time, usage, pending, changed = write_queue.submit(job).result()
+    lookup_cache.update(pending)
+    reference_cache.bump(*changed)
+    result_cache.bump()
+    autocomplete.record(get_read_db(), [usage])
+    events.publish('created', {'id': intervention_id, 'ticket_number': ticket_number})
     
     return jsonify({
         'success': True, 
@@ -434,6 +3777,49 @@ def create_intervention():
         'arrival_time': arrival_time
     })
 
+@app.route('/api/interventions/bulk', methods=['POST'])
+def bulk_import_interventions():
+    """Importer des interventions en masse (historique, saisies hors ligne).
+    
+    Accepte un tableau JSON (mêmes champs que l'API) ou un fichier CSV au
+    format de l'export (champ multipart "file" ou corps text/csv). Les
+    lignes sont insérées par lots de BULK_CHUNK_SIZE, une transaction par
+    lot ; les lignes invalides sont ignorées et listées dans errors.
+    """
+    try:
+        rows = iter_bulk_rows()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    conn = get_db()
+    imported = 0
+    errors = []
+    usages = []
+    chunk = []
+    
+    try:
+        for number, raw in enumerate(rows, start=1):
+            try:
+                chunk.append((number, normalize_bulk_row(raw)))
+            except ValueError as e:
+                errors.append({'row': number, 'error': str(e)})
+            if len(chunk) >= BULK_CHUNK_SIZE:
+                imported += run_blocking(import_bulk_chunk_or_report, conn, chunk, errors, usages)
+                chunk = []
+        if chunk:
+            imported += run_blocking(import_bulk_chunk_or_report, conn, chunk, errors, usages)
+    except (ValueError, csv.Error) as e:
+        return jsonify({'error': f'Fichier illisible : {e}', 'imported': imported, 'errors': errors}), 400
+    finally:
+        # Les lots déjà validés restent acquis même si la suite est illisible
+        if imported:
+            reference_cache.bump('companies', 'fme', 'sites', 'actions')
+            result_cache.bump()
+            autocomplete.record(conn, usages)
+            events.publish('imported', {'count': imported})
+    
+    return jsonify({'success': True, 'imported': imported, 'errors': errors})
+
 @app.route('/api/interventions/<int:intervention_id>/close', methods=['PUT'])
 def close_intervention(intervention_id):
     """Fermer une intervention (FME quitte le site)"""
@@ -444,83 +3830,84 @@ def close_intervention(intervention_id):
     if not final_state:
         return jsonify({'error': 'L\'état final est requis'}), 400
     
-    conn = get_db()
-    cursor = conn.cursor()
-    
     departure_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     
-    cursor.execute('''
-        UPDATE interventions 
-        SET final_state = ?, departure_time = ?, comment = ?, status = 'termine'
-        WHERE id = ?
-    ''', (final_state, departure_time, comment, intervention_id))
+    def job(cursor):
+        pending = {}
+        cursor.execute(f'''
+            UPDATE intervention_records 
+            SET final_state_id = ?, departure_epoch = {epoch_sql('?')}, comment = ?, status_id = ?
+            WHERE id = ?
+            RETURNING arrival_epoch
+        ''', (
+            resolve_label(cursor, final_state, pending),
+            departure_time,
+            comment,
+            resolve_label(cursor, 'termine', pending),
+            intervention_id
+        ))
+        row = cursor.fetchone()
+        # Intervention déjà fermée, fermée à nouveau : son ancienne durée est
+        # retirée d'un agrégat peut-être en partie archivé
+        if row:
+            refresh_duration_rollups(cursor, row['arrival_epoch'])
+        return pending
     
-    conn.commit()
-    conn.close()
+    lookup_cache.update(write_queue.submit(job).result())
+    result_cache.bump()
+    events.publish('closed', {'id': intervention_id})
     
     return jsonify({'success': True, 'departure_time': departure_time})
 
 @app.route('/api/stats', methods=['GET'])
+@cached_result
 def get_stats():
-    """Récupérer les statistiques"""
-    conn = get_db()
+    """Récupérer les statistiques (lues dans les compteurs maintenus par triggers)"""
+    conn = get_read_db()
     cursor = conn.cursor()
     
+    cursor.execute('SELECT dimension, key, count FROM stats_counters WHERE count != 0')
+    counters = {}
+    for row in cursor.fetchall():
+        counters.setdefault(row['dimension'], {})[row['key']] = row['count']
+    
     # Interventions en cours
-    cursor.execute('SELECT COUNT(*) as count FROM interventions WHERE status = "en_cours"')
-    ongoing = cursor.fetchone()['count']
+    ongoing = counters.get('status', {}).get('en_cours', 0)
     
     # Total des interventions
-    cursor.execute('SELECT COUNT(*) as count FROM interventions')
-    total = cursor.fetchone()['count']
+    total = counters.get('total', {}).get('', 0)
+    
+    # Interventions terminées, par couple "état initial|état final"
+    closed = [(key.split('|', 1), count) for key, count in counters.get('closed', {}).items()]
     
-    # Sites encore down après intervention
-    cursor.execute('SELECT COUNT(*) as count FROM interventions WHERE status = "termine" AND final_state = "down"')
-    still_down = cursor.fetchone()['count']
+    # Sites actuellement down (état de leur dernière intervention)
+    cursor.execute("""
+        SELECT COUNT(*) FROM site_status
+        WHERE state_id = (SELECT id FROM labels WHERE name = 'down')
+    """)
+    still_down = cursor.fetchone()[0]
     
     # Interventions par entreprise
-    cursor.execute('''
-        SELECT c.company_name, COUNT(*) as count 
-        FROM interventions i
-        LEFT JOIN fme f ON i.fme_id = f.id
-        LEFT JOIN companies c ON f.company_id = c.id
-        GROUP BY c.company_name 
-        ORDER BY count DESC
-    ''')
-    by_company = [dict(row) for row in cursor.fetchall()]
+    by_company = sorted(
+        ({'company_name': name or None, 'count': count} for name, count in counters.get('company', {}).items()),
+        key=lambda item: item['count'], reverse=True
+    )
     
     # Interventions par état initial
-    cursor.execute('''
-        SELECT initial_state, COUNT(*) as count 
-        FROM interventions 
-        GROUP BY initial_state
-    ''')
-    by_initial_state = [dict(row) for row in cursor.fetchall()]
+    by_initial_state = [
+        {'initial_state': state, 'count': count}
+        for state, count in sorted(counters.get('initial_state', {}).items())
+    ]
     
     # Interventions par action
-    cursor.execute('''
-        SELECT action, COUNT(*) as count 
-        FROM interventions 
-        GROUP BY action 
-        ORDER BY count DESC 
-        LIMIT 10
-    ''')
-    by_action = [dict(row) for row in cursor.fetchall()]
+    by_action = [
+        {'action': action, 'count': count}
+        for action, count in sorted(counters.get('action', {}).items(), key=lambda item: item[1], reverse=True)[:10]
+    ]
     
     # Taux de résolution (sites qui passent de down à up)
-    cursor.execute('''
-        SELECT COUNT(*) as count 
-        FROM interventions 
-        WHERE status = "termine" AND initial_state = "down" AND final_state = "up"
-    ''')
-    resolved = cursor.fetchone()['count']
-    
-    cursor.execute('''
-        SELECT COUNT(*) as count 
-        FROM interventions 
-        WHERE status = "termine" AND initial_state = "down"
-    ''')
-    total_down = cursor.fetchone()['count']
+    resolved = sum(count for (initial, final), count in closed if initial == 'down' and final == 'up')
+    total_down = sum(count for (initial, final), count in closed if initial == 'down')
     
     resolution_rate = (resolved / total_down * 100) if total_down > 0 else 0
     
@@ -528,8 +3915,6 @@ def get_stats():
     cursor.execute('SELECT company_name FROM companies ORDER BY company_name')
     companies = [row['company_name'] for row in cursor.fetchall()]
     
-    conn.close()
-    
     return jsonify({
         'ongoing': ongoing,
         'total': total,
@@ -541,107 +3926,611 @@ def get_stats():
         'companies': companies
     })
 
+# Regroupement des jours d'agrégat par période (/api/stats/timeseries)
+DURATION_INTERVALS = {
+    'day': 'day',
+    'week': "date(day, '-6 days', 'weekday 1')",
+    'month': 'substr(day, 1, 7)',
+}
+
+def duration_quantile(histogram, count, minimum, maximum, q):
+    """Estimer un quantile par interpolation linéaire dans l'histogramme"""
+    bounds = [0] + DURATION_BUCKETS + [maximum]
+    target = q * count
+    seen = 0
+    for index, bucket in enumerate(histogram):
+        if bucket and seen + bucket >= target:
+            low, high = bounds[index], max(bounds[index + 1], bounds[index])
+            estimate = low + (high - low) * (target - seen) / bucket
+            return round(min(max(estimate, minimum), maximum))
+        seen += bucket
+    return maximum
+
+def duration_summary(count, total_seconds, min_seconds, max_seconds, histogram):
+    """Indicateurs de durée d'un ensemble d'agrégats"""
+    return {
+        'count': count,
+        'avg_seconds': round(total_seconds / count) if count else None,
+        'min_seconds': min_seconds,
+        'max_seconds': max_seconds,
+        'p50_seconds': duration_quantile(histogram, count, min_seconds, max_seconds, 0.5) if count else None,
+        'p90_seconds': duration_quantile(histogram, count, min_seconds, max_seconds, 0.9) if count else None,
+        'histogram': histogram
+    }
+
+@app.route('/api/stats/timeseries', methods=['GET'])
+@cached_result
+def get_stats_timeseries():
+    """Durées sur site des interventions terminées, par période.
+    
+    Paramètres : date_from / date_to (jours d'arrivée inclus), interval
+    (day, week ou month), group_by (company, action, initial_state ou
+    final_state), company et action pour filtrer. Tout est lu dans
+    duration_rollups, sans parcourir les interventions ; les quantiles
+    sont estimés depuis l'histogramme (bornes dans buckets).
+    """
+    interval = request.args.get('interval', 'day')
+    if interval not in DURATION_INTERVALS:
+        return jsonify({'error': f'Intervalle inconnu : {interval}'}), 400
+    
+    group_by = request.args.get('group_by', '')
+    if group_by and (group_by not in DURATION_KEYS or group_by == 'day'):
+        return jsonify({'error': f'Regroupement inconnu : {group_by}'}), 400
+    
+    where = ['count > 0']
+    params = []
+    if request.args.get('date_from'):
+        where.append('day >= ?')
+        params.append(request.args['date_from'])
+    if request.args.get('date_to'):
+        where.append('day <= ?')
+        params.append(request.args['date_to'])
+    for key in ('company', 'action'):
+        if request.args.get(key):
+            where.append(f'{key} = ?')
+            params.append(request.args[key])
+    
+    group = f'{group_by} AS "group"' if group_by else 'NULL AS "group"'
+    buckets = ', '.join(f'SUM({column})' for column in duration_bucket_columns())
+    
+    conn = get_read_db()
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT {DURATION_INTERVALS[interval]} AS period, {group},
+            SUM(count), SUM(total_seconds), MIN(min_seconds), MAX(max_seconds), {buckets}
+        FROM duration_rollups
+        WHERE {' AND '.join(where)}
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+    ''', params)
+    
+    points = []
+    totals = [0, 0, None, None, [0] * (len(DURATION_BUCKETS) + 1)]
+    for row in cursor.fetchall():
+        period, key, count, total_seconds, min_seconds, max_seconds = tuple(row)[:6]
+        histogram = list(row)[6:]
+        point = {'period': period}
+        if group_by:
+            point[group_by] = key
+        point.update(duration_summary(count, total_seconds, min_seconds, max_seconds, histogram))
+        points.append(point)
+    
+        totals[0] += count
+        totals[1] += total_seconds
+        totals[2] = min_seconds if totals[2] is None else min(totals[2], min_seconds)
+        totals[3] = max_seconds if totals[3] is None else max(totals[3], max_seconds)
+        totals[4] = [a + b for a, b in zip(totals[4], histogram)]
+    
+    return jsonify({
+        'interval': interval,
+        'group_by': group_by or None,
+        'buckets': DURATION_BUCKETS,
+        'points': points,
+        'totals': duration_summary(*totals)
+    })
+
+def format_event(event, data):
+    """Encoder un événement au format text/event-stream"""
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+@app.route('/api/events', methods=['GET'])
+def stream_events():
+    """Flux Server-Sent Events des créations, clôtures et suppressions.
+    
+    Les événements ne portent que l'identifiant : le client récupère le
+    détail via /api/changes, qui applique ses filtres. Chaque abonné est
+    une file en mémoire ; voir le README pour servir de nombreux clients.
+    """
+    subscriber = events.subscribe()
+    
+    def generate():
+        try:
+            # Premier envoi immédiat pour que le client sache le flux ouvert
+            yield f'retry: {EVENT_HEARTBEAT_SECONDS * 1000}\n\n'
+            while True:
+                try:
+                    event, data = subscriber.get(timeout=EVENT_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    # Le commentaire détecte aussi les clients déconnectés
+                    yield ': ping\n\n'
+                    continue
+                yield format_event(event, data)
+        finally:
+            events.unsubscribe(subscriber)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/cache', methods=['GET'])
+def get_cache_stats():
+    """Compteurs des caches en mémoire"""
+    return jsonify({
+        'lookup': lookup_cache.stats(),
+        'reference': reference_cache.stats(),
+        'result': result_cache.stats(),
+        'autocomplete': autocomplete.stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Mesures au format texte Prometheus"""
+    queue_stats = write_queue.stats()
+    lookup = lookup_cache.stats()
+    result = result_cache.stats()
+    index = autocomplete.stats()
+    tasks = maintenance.stats()
+    gauges = [
+        ('fme_metrics_enabled', 'gauge', 'Instrumentation des requêtes et du SQL active', [({}, int(METRICS_ENABLED))]),
+        ('fme_write_queue_batches_total', 'counter', 'Lots validés par la file d\'écriture', [({}, queue_stats['batches'])]),
+        ('fme_write_queue_jobs_total', 'counter', 'Mutations validées par la file d\'écriture', [({}, queue_stats['jobs'])]),
+        ('fme_write_queue_pending', 'gauge', 'Mutations en attente d\'écriture', [({}, queue_stats['pending'])]),
+        ('fme_event_subscribers', 'gauge', 'Clients abonnés au flux d\'événements', [({}, events.count())]),
+        ('fme_lookup_cache_entries', 'gauge', 'Entrées du cache des tables de référence', [({}, lookup['entries'])]),
+        ('fme_lookup_cache_hits_total', 'counter', 'Lectures servies par le cache des tables de référence', [({}, lookup['hits'])]),
+        ('fme_lookup_cache_misses_total', 'counter', 'Lectures absentes du cache des tables de référence', [({}, lookup['misses'])]),
+        ('fme_result_cache_entries', 'gauge', 'Réponses conservées par le cache de résultats', [({}, result['entries'])]),
+        ('fme_result_cache_bytes', 'gauge', 'Taille des corps conservés par le cache de résultats', [({}, result['bytes'])]),
+        ('fme_result_cache_hits_total', 'counter', 'Requêtes servies par le cache de résultats', [({}, result['hits'])]),
+        ('fme_result_cache_misses_total', 'counter', 'Requêtes absentes du cache de résultats', [({}, result['misses'])]),
+        ('fme_result_cache_hit_ratio', 'gauge', 'Part des requêtes servies par le cache de résultats', [({}, result['hit_ratio'])]),
+        ('fme_result_cache_evictions_total', 'counter', 'Réponses évincées du cache de résultats (taille)', [({}, result['evictions'])]),
+        ('fme_autocomplete_items', 'gauge', 'Éléments de l\'index d\'autocomplétion',
+         [({'kind': kind}, count) for kind, count in index['items'].items()]),
+        ('fme_maintenance_runs_total', 'counter', 'Exécutions des tâches de maintenance',
+         [({'task': name}, run['runs']) for name, run in tasks.items()]),
+        ('fme_maintenance_failures_total', 'counter', 'Tâches de maintenance en échec',
+         [({'task': name}, run['failures']) for name, run in tasks.items()]),
+        ('fme_maintenance_last_run_timestamp_seconds', 'gauge', 'Début de la dernière exécution de chaque tâche',
+         [({'task': name}, run['last_run']) for name, run in tasks.items() if run['last_run']]),
+        ('fme_maintenance_duration_seconds', 'gauge', 'Durée de la dernière exécution de chaque tâche',
+         [({'task': name}, run['duration_ms'] / 1000) for name, run in tasks.items() if run['last_run']]),
+    ]
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/maintenance', methods=['GET'])
+def get_maintenance():
+    """Dernière exécution de chaque tâche de maintenance (résultat ou erreur)"""
+    return jsonify({'enabled': MAINTENANCE_ENABLED, 'tasks': maintenance.stats()})
+
+@app.route('/api/metrics/slow-queries', methods=['GET'])
+def get_slow_queries():
+    """Dernières instructions SQL lentes (la plus récente en tête), avec paramètres et plan"""
+    with metrics.lock:
+        entries = list(metrics.slow_queries)
+    return jsonify({'threshold_ms': SLOW_QUERY_MS, 'total': metrics.slow_total, 'queries': entries[::-1]})
+
+@app.route('/api/metrics/statements', methods=['GET'])
+def get_metrics_statements():
+    """Instructions SQL mesurées (la plus coûteuse en tête) : texte normalisé
+    de chaque étiquette statement de /metrics"""
+    with metrics.lock:
+        statements = [
+            {'statement': statement, 'sql': metrics.statement_texts.get(statement),
+             'count': totals[0], 'seconds': round(totals[1], 6), 'rows': totals[2]}
+            for statement, totals in metrics.statements.items()
+        ]
+    statements.sort(key=lambda entry: entry['seconds'], reverse=True)
+    return jsonify({'max_statements': METRICS_MAX_STATEMENTS, 'statements': statements})
+
 @app.route('/api/interventions/<int:intervention_id>', methods=['DELETE'])
 def delete_intervention(intervention_id):
-    """Supprimer une intervention"""
-    conn = get_db()
-    cursor = conn.cursor()
+    """Supprimer une intervention (les interventions archivées sont en lecture seule)"""
+    def job(cursor):
+        cursor.execute('''
+            DELETE FROM intervention_records WHERE id = ?
+            RETURNING site_id, fme_id, action_id, arrival_epoch
+        ''', (intervention_id,))
+        usage = cursor.fetchone()
+        if usage:
+            # Copie éventuelle laissée par un archivage en cours
+            cursor.execute('DELETE FROM archive.intervention_records WHERE id = ?', (intervention_id,))
+            cursor.execute('DELETE FROM archive.interventions_fts WHERE rowid = ?', (intervention_id,))
+            refresh_site_status(cursor, usage['site_id'])
+            refresh_duration_rollups(cursor, usage['arrival_epoch'])
+        else:
+            cursor.execute('SELECT 1 FROM archive.intervention_records WHERE id = ?', (intervention_id,))
+            if cursor.fetchone():
+                return False, None
+        prune_tombstones(cursor)
+        return True, usage and tuple(usage)
     
-    cursor.execute('DELETE FROM interventions WHERE id = ?', (intervention_id,))
-    conn.commit()
-    conn.close()
+    deleted, usage = write_queue.submit(job).result()
+    if not deleted:
+        return jsonify({'error': 'Intervention archivée : suppression impossible'}), 409
+    reference_cache.bump('actions')
+    result_cache.bump()
+    if usage:
+        autocomplete.record(get_read_db(), [usage], sign=-1)
+    events.publish('deleted', {'id': intervention_id})
     
     return jsonify({'success': True})
 
 @app.route('/api/export/excel', methods=['GET'])
 def export_excel():
-    """Exporter les interventions en Excel (CSV)"""
-    status = request.args.get('status', '')
-    company = request.args.get('company', '')
-    site_down = request.args.get('site_down', '')
-    date_from = request.args.get('date_from', '')
-    date_to = request.args.get('date_to', '')
+    """Exporter les interventions en Excel (CSV par défaut, XLSX avec format=xlsx).
     
-    conn = get_db()
+    Le fichier est envoyé au fil de l'eau : les lignes sont lues par lots
+    (voir export_rows) et chaque lot est transmis dès qu'il est encodé. Les
+    interventions archivées sont comprises.
+    """
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'xlsx'):
+        return jsonify({'error': 'Format d\'export inconnu'}), 400
+    
+    rows = export_rows(get_read_db().cursor(), request.args)
+    
+    filename = f'interventions_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{export_format}'
+    if export_format == 'xlsx':
+        body = generate_xlsx(rows)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    else:
+        body = generate_csv(rows)
+        mimetype = 'text/csv'
+    
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@app.cli.command('rebuild-stats')
+@click.option('--check', is_flag=True, help='Vérifier les compteurs sans les modifier')
+def rebuild_stats_command(check):
+    """Recalculer les compteurs statistiques (ou les vérifier avec --check)"""
+    conn = connect_db()
     cursor = conn.cursor()
     
-    query = '''
-        SELECT 
-            i.id, i.ticket_number, f.fme_name, c.company_name, f.phone_number,
-            i.t_number, i.site_name, i.initial_state, i.action,
-            i.arrival_time, i.departure_time, i.final_state, i.comment, i.status, i.created_at
-        FROM interventions i
-        LEFT JOIN fme f ON i.fme_id = f.id
-        LEFT JOIN companies c ON f.company_id = c.id
-        WHERE 1=1
-    '''
-    params = []
+    expected = compute_stats_counters(cursor)
+    cursor.execute('SELECT dimension, key, count FROM stats_counters WHERE count != 0')
+    actual = {(row['dimension'], row['key']): row['count'] for row in cursor.fetchall()}
     
-    if status:
-        query += ' AND i.status = ?'
-        params.append(status)
+    mismatches = sorted(
+        (dimension, key, actual.get((dimension, key), 0), expected.get((dimension, key), 0))
+        for dimension, key in set(expected) | set(actual)
+        if actual.get((dimension, key), 0) != expected.get((dimension, key), 0)
+    )
+    for dimension, key, found, wanted in mismatches:
+        click.echo(f'{dimension} [{key}] : {found} au lieu de {wanted}')
     
-    if company:
-        query += ' AND c.company_name = ?'
-        params.append(company)
+    if check:
+        conn.close()
+        click.echo(f'{len(mismatches)} compteur(s) incorrect(s)')
+        if mismatches:
+            sys.exit(1)
+        return
     
-    if site_down == 'true':
-        query += ' AND i.final_state = "down"'
+    rebuild_stats_counters(cursor)
+    conn.commit()
+    conn.close()
+    click.echo(f'Compteurs reconstruits ({len(mismatches)} corrigé(s))')
+
+@app.cli.command('rebuild-rollups')
+@click.option('--check', is_flag=True, help='Vérifier les agrégats sans les modifier')
+def rebuild_rollups_command(check):
+    """Recalculer les agrégats de durées (ou les vérifier avec --check)"""
+    conn = connect_db()
+    cursor = conn.cursor()
     
-    if date_from:
-        query += ' AND DATE(i.arrival_time) >= DATE(?)'
-        params.append(date_from)
+    expected = compute_duration_rollups(cursor)
+    cursor.execute('SELECT * FROM duration_rollups WHERE count != 0')
+    actual = {tuple(row)[:len(DURATION_KEYS)]: tuple(row)[len(DURATION_KEYS):] for row in cursor.fetchall()}
     
-    if date_to:
-        query += ' AND DATE(i.arrival_time) <= DATE(?)'
-        params.append(date_to)
+    mismatches = sorted(key for key in set(expected) | set(actual) if expected.get(key) != actual.get(key))
+    for key in mismatches:
+        click.echo(f"{' / '.join(key)} : {actual.get(key)} au lieu de {expected.get(key)}")
     
-    query += ' ORDER BY i.created_at DESC'
+    if check:
+        conn.close()
+        click.echo(f'{len(mismatches)} agrégat(s) incorrect(s)')
+        if mismatches:
+            sys.exit(1)
+        return
     
-    cursor.execute(query, params)
-    interventions = cursor.fetchall()
+    rebuild_duration_rollups(cursor)
+    conn.commit()
     conn.close()
+    click.echo(f'Agrégats reconstruits ({len(mismatches)} corrigé(s))')
+
+# Requêtes chronométrées par compact-interventions : (ancien schéma, schéma compact)
+COMPACT_BENCHMARKS = {
+    'Première page': (
+        'SELECT * FROM interventions ORDER BY created_at DESC, id DESC LIMIT 50',
+        'SELECT * FROM interventions ORDER BY created_epoch DESC, id DESC LIMIT 50'
+    ),
+    'Terminées sur 90 jours': (
+        "SELECT COUNT(*) FROM interventions WHERE status = 'termine' AND arrival_time >= DATE('now', '-90 days')",
+        f"""SELECT COUNT(*) FROM intervention_records
+            WHERE status_id = (SELECT id FROM labels WHERE name = 'termine')
+            AND arrival_epoch >= {epoch_sql("DATE('now', '-90 days')")}"""
+    ),
+    'Regroupement par action': (
+        'SELECT action, COUNT(*) FROM interventions GROUP BY action',
+        'SELECT action_id, COUNT(*) FROM intervention_records GROUP BY action_id'
+    ),
+    'Lecture complète': (
+        'SELECT * FROM interventions',
+        'SELECT * FROM interventions'
+    ),
+}
+
+def _interventions_bytes(cursor):
+    """Taille (octets) des interventions et de leurs index, ou de toute la base sans dbstat"""
+    try:
+        cursor.execute('''
+            SELECT SUM(d.pgsize) FROM dbstat d
+            JOIN sqlite_master m ON m.name = d.name
+            WHERE m.tbl_name IN ('interventions', 'intervention_records', 'labels')
+        ''')
+        return cursor.fetchone()[0]
+    except sqlite3.OperationalError:
+        page_size = cursor.execute('PRAGMA page_size').fetchone()[0]
+        pages = cursor.execute('PRAGMA page_count').fetchone()[0] - cursor.execute('PRAGMA freelist_count').fetchone()[0]
+        return pages * page_size
+
+def _time_benchmarks(cursor, variant):
+    """Meilleur temps (ms) sur 5 exécutions de chaque requête de COMPACT_BENCHMARKS"""
+    timings = {}
+    for name, queries in COMPACT_BENCHMARKS.items():
+        best = None
+        for _ in range(5):
+            start = time.perf_counter()
+            cursor.execute(queries[variant]).fetchall()
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = best
+    return timings
+
+@app.cli.command('rebuild-site-status')
+@click.option('--check', is_flag=True, help='Vérifier l\'état des sites sans le modifier')
+def rebuild_site_status_command(check):
+    """Recalculer l'état courant des sites (ou le vérifier avec --check)"""
+    conn = connect_db()
+    cursor = conn.cursor()
     
-    # Créer le CSV en mémoire
-    output = io.StringIO()
-    writer = csv.writer(output)
+    expected = compute_site_status(cursor)
+    cursor.execute('''SELECT site_id, state_id, last_intervention_id, last_arrival_epoch,
+        last_change_epoch, open_count FROM site_status''')
+    actual = {row[0]: tuple(row)[1:] for row in cursor.fetchall()}
     
-    # En-têtes
-    writer.writerow([
-        'ID', 'Ticket', 'FME', 'Entreprise', 'Téléphone', 'T-Number', 'Site', 
-        'État Initial', 'Action', 'Arrivée', 'Départ', 'État Final', 
-        'Commentaire', 'Statut', 'Date Création'
-    ])
-    
-    # Données
-    for intervention in interventions:
-        writer.writerow([
-            intervention['id'],
-            intervention['ticket_number'],
-            intervention['fme_name'],
-            intervention['company_name'],
-            intervention['phone_number'],
-            intervention['t_number'],
-            intervention['site_name'],
-            intervention['initial_state'],
-            intervention['action'],
-            intervention['arrival_time'],
-            intervention['departure_time'] or '',
-            intervention['final_state'] or '',
-            intervention['comment'] or '',
-            intervention['status'],
-            intervention['created_at']
-        ])
+    mismatches = sorted(site_id for site_id in set(expected) | set(actual) if expected.get(site_id) != actual.get(site_id))
+    for site_id in mismatches:
+        click.echo(f'site {site_id} : {actual.get(site_id)} au lieu de {expected.get(site_id)}')
     
-    # Préparer le fichier pour téléchargement
-    output.seek(0)
+    if check:
+        conn.close()
+        click.echo(f'{len(mismatches)} site(s) incorrect(s)')
+        if mismatches:
+            sys.exit(1)
+        return
     
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8-sig')),  # utf-8-sig pour Excel
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'interventions_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-    )
+    rebuild_site_status(cursor)
+    conn.commit()
+    conn.close()
+    click.echo(f'État des sites reconstruit ({len(mismatches)} corrigé(s))')
+
+@app.cli.command('compact-interventions')
+@click.option('--batch-size', default=COMPACT_BATCH_SIZE, show_default=True, help='Interventions copiées par transaction')
+@click.option('--vacuum', is_flag=True, help='Récupérer la place libérée (VACUUM) après la conversion')
+def compact_interventions_command(batch_size, vacuum):
+    """Convertir les interventions au schéma compact, par lots, base en service.
+    
+    L'application précédente peut continuer d'écrire pendant la copie :
+    chaque lot est une courte transaction. La bascule finale (migration 7)
+    reprend les lignes créées, modifiées ou supprimées entre-temps, puis
+    remplace la table par la vue ; redémarrer ensuite l'application.
+    """
+    conn = connect_db()
+    cursor = conn.cursor()
+    
+    if not is_legacy_interventions(cursor):
+        conn.close()
+        click.echo('Les interventions sont déjà au schéma compact')
+        return
+    if cursor.execute('PRAGMA user_version').fetchone()[0] < 6:
+        conn.close()
+        click.echo('Base antérieure à la version 6 : la migrer d\'abord en démarrant l\'application')
+        sys.exit(1)
+    
+    size_before = _interventions_bytes(cursor)
+    timings_before = _time_benchmarks(cursor, 0)
+    
+    create_intervention_tables(cursor)
+    create_archive_tables(cursor)
+    conn.commit()
+    
+    last_id = cursor.execute('SELECT COALESCE(MAX(id), 0) FROM intervention_records').fetchone()[0]
+    copied = 0
+    try:
+        while True:
+            cursor.execute('BEGIN IMMEDIATE')
+            bound = cursor.execute(
+                'SELECT MAX(id) FROM (SELECT id FROM interventions WHERE id > ? ORDER BY id LIMIT ?)',
+                (last_id, batch_size)
+            ).fetchone()[0]
+            if bound is None:
+                conn.commit()
+                break
+            copied += copy_legacy_interventions(cursor, 'i.id > ? AND i.id <= ?', (last_id, bound))
+            conn.commit()
+            last_id = bound
+            click.echo(f'{copied} intervention(s) copiée(s)')
+    
+        # Bascule : rattrapage des écritures concurrentes et remplacement par la vue
+        cursor.execute('BEGIN IMMEDIATE')
+        migrate_db(conn)
+        create_triggers(cursor)
+        conn.commit()
+    except BaseException:
+        # Lot en cours annulé et verrou d'écriture rendu : une nouvelle
+        # exécution reprend après le dernier lot validé
+        conn.close()
+        raise
+    if vacuum:
+        conn.execute('VACUUM')
+    
+    size_after = _interventions_bytes(cursor)
+    timings_after = _time_benchmarks(cursor, 1)
+    conn.close()
+    
+    click.echo(f'Taille : {size_before / 1024:.0f} Kio -> {size_after / 1024:.0f} Kio')
+    for name in COMPACT_BENCHMARKS:
+        click.echo(f'{name} : {timings_before[name]:.2f} ms -> {timings_after[name]:.2f} ms')
+
+def archive_interventions(conn, ids):
+    """Déplacer les interventions ids vers la base d'archive ; renvoie le
+    nombre de lignes retirées de la base principale.
+    
+    Une transaction sur deux fichiers en mode WAL n'est pas atomique : la
+    copie (rejouable) est validée avant la suppression, une interruption
+    laisse au pire des doublons, déplacés au passage suivant. Pendant la
+    suppression, l'indicateur archiving neutralise les triggers de
+    tombstones, de compteurs et de durées : les interventions archivées
+    restent comptées. Les clients de /api/changes sont invités à tout
+    recharger.
+    """
+    cursor = conn.cursor()
+    marks = ', '.join('?' * len(ids))
+    
+    cursor.execute('BEGIN IMMEDIATE')
+    cursor.execute(f'''
+        INSERT OR REPLACE INTO archive.intervention_records
+        SELECT * FROM main.intervention_records WHERE id IN ({marks})
+    ''', ids)
+    cursor.execute(f'DELETE FROM archive.interventions_fts WHERE rowid IN ({marks})', ids)
+    cursor.execute(f'''
+        INSERT INTO archive.interventions_fts (rowid, ticket_number, t_number, site_name)
+        SELECT id, ticket_number, t_number, site_name FROM interventions WHERE id IN ({marks})
+    ''', ids)
+    conn.commit()
+    
+    cursor.execute('BEGIN IMMEDIATE')
+    cursor.execute('UPDATE sync_state SET archiving = 1 WHERE id = 1')
+    cursor.execute(f'''
+        DELETE FROM intervention_records
+        WHERE id IN ({marks}) AND id IN (SELECT id FROM archive.intervention_records)
+    ''', ids)
+    moved = cursor.rowcount
+    cursor.execute('''
+        UPDATE sync_state SET archiving = 0, version = version + 1, pruned_version = version + 1
+        WHERE id = 1
+    ''')
+    conn.commit()
+    return moved
+
+def _database_bytes(cursor):
+    """Taille de la base principale et place libre qu'elle contient (octets)"""
+    page_size = cursor.execute('PRAGMA page_size').fetchone()[0]
+    return (cursor.execute('PRAGMA page_count').fetchone()[0] * page_size,
+            cursor.execute('PRAGMA freelist_count').fetchone()[0] * page_size)
+
+@app.cli.command('archive-interventions')
+@click.option('--days', default=ARCHIVE_AFTER_DAYS, show_default=True,
+              help='Âge minimal (jours depuis l\'arrivée) des interventions terminées à archiver')
+@click.option('--batch-size', default=ARCHIVE_BATCH_SIZE, show_default=True, help='Interventions déplacées par transaction')
+@click.option('--vacuum', is_flag=True, help='Réduire le fichier de la base principale (VACUUM) après le déplacement')
+def archive_interventions_command(days, batch_size, vacuum):
+    """Déplacer les interventions terminées anciennes vers la base d'archive.
+    
+    Peut tourner base en service : chaque lot est une courte transaction.
+    Le tableau de bord ne lit ensuite que les interventions récentes ;
+    recherche, exports, statistiques et filtres de dates remontant avant
+    la limite couvrent aussi l'archive.
+    """
+    conn = connect_db()
+    cursor = conn.cursor()
+    cutoff = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+    
+    size_before = _interventions_bytes(cursor)
+    database_before, _ = _database_bytes(cursor)
+    
+    moved = 0
+    while True:
+        cursor.execute(f'''
+            SELECT id FROM intervention_records
+            WHERE status_id = (SELECT id FROM labels WHERE name = 'termine')
+              AND arrival_epoch < {epoch_sql('?')}
+            ORDER BY arrival_epoch
+            LIMIT ?
+        ''', (cutoff, batch_size))
+        ids = [row['id'] for row in cursor.fetchall()]
+        if not ids:
+            break
+        batch_moved = archive_interventions(conn, ids)
+        if not batch_moved:
+            break
+        moved += batch_moved
+        result_cache.bump()
+        click.echo(f'{moved} intervention(s) archivée(s)')
+    
+    if vacuum:
+        conn.execute('VACUUM')
+    
+    size_after = _interventions_bytes(cursor)
+    database_after, free_after = _database_bytes(cursor)
+    conn.close()
+    
+    click.echo(f'{moved} intervention(s) arrivée(s) avant le {cutoff} déplacée(s) vers {archive_database()}')
+    click.echo(f'Interventions (base principale) : {size_before / 1024:.0f} Kio -> {size_after / 1024:.0f} Kio')
+    click.echo(f'Base principale : {database_before / 1024:.0f} Kio -> {database_after / 1024:.0f} Kio'
+               f' (dont {free_after / 1024:.0f} Kio libres, réutilisés par les prochaines écritures)')
+
+@app.cli.command('backup-db')
+def backup_db_command():
+    """Sauvegarder la base et l'archive dans BACKUP_DIR, base en service"""
+    for schema, backup in backup_database().items():
+        click.echo(f"{backup['path']} : {backup['bytes'] / 1024:.0f} Kio en {backup['steps']} pas"
+                   f" (le plus long : {backup['longest_step_ms']} ms)")
+
+@app.cli.command('vacuum-db')
+def vacuum_db_command():
+    """Reconstruire la base et l'archive (VACUUM) en activant auto_vacuum =
+    INCREMENTAL, pour que le thread de maintenance récupère ensuite l'espace
+    libéré par petits pas. Bloque les écritures pendant la reconstruction.
+    """
+    conn = connect_db()
+    cursor = conn.cursor()
+    for schema in ('main', 'archive'):
+        before = _schema_bytes(cursor, schema)
+        cursor.execute(f'PRAGMA {schema}.auto_vacuum = INCREMENTAL')
+        cursor.execute(f'VACUUM {schema}')
+        click.echo(f'{schema} : {before / 1024:.0f} Kio -> {_schema_bytes(cursor, schema) / 1024:.0f} Kio')
+    conn.close()
+
+def _schema_bytes(cursor, schema):
+    """Taille de la base schema (main, archive) en octets"""
+    return (cursor.execute(f'PRAGMA {schema}.page_count').fetchone()[0]
+            * cursor.execute(f'PRAGMA {schema}.page_size').fetchone()[0])
+
+@app.cli.command('rebuild-search')
+def rebuild_search_command():
+    """Reconstruire l'index plein texte des interventions (archive comprise) et des FME"""
+    conn = connect_db()
+    rebuild_search_index(conn.cursor())
+    conn.commit()
+    conn.close()
+    click.echo('Index de recherche reconstruit')
 
 if __name__ == '__main__':
     init_db()
@@ -0,0 +1,9 @@
+"""Banc d'essai de l'application : génération de bases synthétiques
+(datagen), mesure de chaque route (runner) et comparaison de résultats.
+
+Utilisation depuis la racine du dépôt :
+
+    python -m bench generate --scale 1m --output bench/data/1m.db
+    python -m bench run --db bench/data/1m.db --output resultats.json
+    python -m bench compare avant.json apres.json
+"""
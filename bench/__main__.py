@@ -0,0 +1,91 @@
+"""Ligne de commande du banc d'essai (python -m bench --help)"""
+import json
+import sys
+
+import click
+
+from bench import datagen, runner
+
+@click.group()
+def cli():
+    """Banc d'essai : bases synthétiques, mesures et comparaisons"""
+
+@cli.command()
+@click.option('--output', required=True, help='Fichier de la base à créer (remplacé s\'il existe)')
+@click.option('--scale', type=click.Choice(list(datagen.SCALES)), default='10k', show_default=True,
+              help='Taille prédéfinie')
+@click.option('--interventions', type=int, help='Nombre d\'interventions (remplace la taille prédéfinie)')
+@click.option('--sites', type=int, help='Nombre de sites')
+@click.option('--fmes', type=int, help='Nombre de FME')
+@click.option('--companies', type=int, help='Nombre d\'entreprises')
+@click.option('--days', type=int, help='Jours d\'historique')
+@click.option('--archive-days', type=int, help='Archiver ensuite les interventions terminées de plus de N jours')
+@click.option('--seed', default=0, show_default=True, help='Graine du générateur (bases reproductibles)')
+def generate(output, scale, interventions, sites, fmes, companies, days, archive_days, seed):
+    """Créer une base synthétique"""
+    defaults = datagen.SCALES[scale]
+    sizes = [value if value is not None else default
+             for value, default in zip((interventions, sites, fmes, companies, days), defaults)]
+    count = datagen.generate(output, *sizes, seed=seed, progress=click.echo)
+    click.echo(f'{count} intervention(s) générée(s) dans {output}')
+    if archive_days is not None:
+        from app import app
+        result = app.test_cli_runner().invoke(args=['archive-interventions', '--days', str(archive_days)])
+        click.echo(result.output.rstrip())
+
+@cli.command()
+@click.option('--db', required=True, help='Base de référence (générée par generate)')
+@click.option('--url', help='Serveur à mesurer (mode HTTP) ; sinon client de test, sur une copie de --db')
+@click.option('--server-pid', type=int, help='Processus du serveur (mode HTTP), pour sa mémoire résidente')
+@click.option('--requests', default=200, show_default=True, help='Requêtes par scénario')
+@click.option('--concurrency', default=1, show_default=True, help='Threads envoyant les requêtes')
+@click.option('--warmup', default=5, show_default=True, help='Requêtes de chauffe par scénario (non mesurées)')
+@click.option('--only', help='Expression régulière : scénarios à exécuter')
+@click.option('--gzip', is_flag=True, help='Accepter les réponses compressées, comme un navigateur')
+@click.option('--in-place', is_flag=True, help='Mode client : écrire dans --db au lieu d\'une copie')
+@click.option('--output', help='Fichier JSON du rapport (sinon sortie standard)')
+def run(db, url, server_pid, requests, concurrency, warmup, only, gzip, in_place, output):
+    """Mesurer chaque route"""
+    report = runner.run(db, url, server_pid, requests, concurrency, warmup, only, gzip, in_place,
+                        progress=lambda line: click.echo(line, err=True))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        click.echo(text)
+
+@cli.command()
+@click.option('--db', required=True, help='Base de référence (générée par generate), copiée pour chaque mesure')
+@click.option('--threads', default='1,8,32,64', show_default=True, help='Nombres de threads, séparés par des virgules')
+@click.option('--pairs', default=640, show_default=True, help='Créations (chacune suivie d\'une clôture) par mesure')
+@click.option('--output', help='Fichier JSON du rapport (sinon sortie standard)')
+def writes(db, threads, pairs, output):
+    """Débit d'écriture avec et sans file d'écriture (group commit)"""
+    results = runner.run_writes(db, [int(count) for count in threads.split(',')], pairs,
+                                progress=lambda line: click.echo(line, err=True))
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        click.echo(text)
+
+@cli.command()
+@click.argument('baseline', type=click.File(encoding='utf-8'))
+@click.argument('current', type=click.File(encoding='utf-8'))
+@click.option('--metric', default='p95_ms', show_default=True, help='Mesure comparée (p50_ms, p99_ms, throughput_rps...)')
+@click.option('--threshold', default=0.2, show_default=True, help='Variation tolérée (0.2 = 20 %)')
+def compare(baseline, current, metric, threshold):
+    """Comparer deux rapports ; code de sortie 1 en cas de régression"""
+    rows = runner.compare(json.load(baseline), json.load(current), metric, threshold)
+    for name, before, after, change, regression in rows:
+        flag = '  RÉGRESSION' if regression else ''
+        click.echo(f'{name:<26} {before:>10} -> {after:>10}  {change:+.0%}{flag}')
+    regressions = sum(1 for row in rows if row[4])
+    click.echo(f'{regressions} régression(s) sur {metric} (seuil {threshold:.0%})')
+    if regressions:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,201 @@
+"""Génération de bases synthétiques au schéma de l'application.
+
+Les interventions sont écrites directement dans intervention_records, par
+lots, triggers et index suspendus ; compteurs, agrégats de durées et index
+plein texte sont ensuite reconstruits en une fois, comme après
+compact-interventions. La répartition est volontairement inégale : quelques
+entreprises, FME, sites et actions concentrent la plupart des interventions
+(loi de Zipf), l'activité suit les heures ouvrées et baisse le week-end.
+"""
+import calendar
+import itertools
+import math
+import os
+import random
+from datetime import datetime, timedelta
+
+import app
+
+# Tailles prédéfinies : interventions, sites, FME, entreprises, jours d'historique
+SCALES = {
+    '10k': (10_000, 500, 200, 15, 365),
+    '1m': (1_000_000, 5_000, 2_000, 40, 3 * 365),
+    '10m': (10_000_000, 20_000, 8_000, 80, 5 * 365),
+}
+
+# Interventions insérées par transaction
+INSERT_BATCH_SIZE = 50_000
+
+# Exposant de la loi de Zipf (1 : le premier élément pèse deux fois le second)
+ZIPF_EXPONENT = 1.1
+
+ACTIONS = [
+    'Remplacement batterie', 'Redémarrage équipement', 'Remplacement redresseur',
+    'Maintenance préventive', 'Réparation climatisation', 'Remplacement carte BBU',
+    'Réalignement antenne', 'Remplacement câble RF', 'Intervention groupe électrogène',
+    'Remplacement RRU', 'Contrôle alarme', 'Remplacement module transmission',
+    'Nettoyage site', 'Réparation fibre', 'Mise à jour logicielle',
+]
+INITIAL_STATES = {'down': 60, 'sector_failure': 25, 'up': 15}
+FINAL_STATES = {'up': 80, 'sector_failure': 10, 'down': 10}
+COMMENTS = ['RAS', 'Pièce commandée', 'Accès difficile', 'Site alimenté par groupe', 'Alarme persistante']
+
+# Poids de chaque heure d'arrivée (activité de jour) et de chaque jour de la semaine
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 4, 8, 12, 12, 11, 10, 8, 9, 10, 10, 9, 7, 5, 4, 3, 2, 2, 1]
+WEEKDAY_WEIGHTS = [1.0, 1.0, 1.0, 1.0, 1.0, 0.6, 0.4]
+
+# Durée sur site : loi log-normale autour de 2 h, bornée à 3 jours
+DURATION_MEDIAN_SECONDS = 2 * 3600
+DURATION_SIGMA = 0.8
+DURATION_MAX_SECONDS = 3 * 86400
+
+# Part des interventions du dernier jour encore en cours
+OPEN_RATIO = 0.5
+
+def zipf_weights(count, exponent=ZIPF_EXPONENT):
+    """Poids cumulés de count éléments suivant une loi de Zipf"""
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+def epoch(moment):
+    """Secondes depuis l'epoch d'une heure locale, sans conversion de fuseau
+    (comme strftime('%s', ...) dans SQLite)"""
+    return calendar.timegm(moment.timetuple())
+
+def daily_counts(rng, total, days, end):
+    """Nombre d'interventions de chaque jour (du plus ancien au plus récent)"""
+    start = end - timedelta(days=days - 1)
+    weights = [WEEKDAY_WEIGHTS[(start + timedelta(days=n)).weekday()] * rng.uniform(0.7, 1.3) for n in range(days)]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    # Le reste de l'arrondi est réparti sur les jours les plus récents
+    for n in range(total - sum(counts)):
+        counts[-1 - n % days] += 1
+    return start, counts
+
+def reset_files(path):
+    """Supprimer une base existante (fichiers WAL et archive compris)"""
+    root, extension = os.path.splitext(path)
+    for base in (path, f'{root}_archive{extension}'):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(base + suffix):
+                os.remove(base + suffix)
+
+def generate(path, interventions, sites, fmes, companies, days, seed=0, progress=print):
+    """Créer la base path (interventions synthétiques) ; renvoie le nombre d'interventions"""
+    rng = random.Random(seed)
+    reset_files(path)
+    app.DATABASE = path
+    app.init_db()
+    
+    conn = app.connect_db()
+    cursor = conn.cursor()
+    
+    # Triggers et index des interventions suspendus pendant le chargement
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+    for row in cursor.fetchall():
+        cursor.execute(f'DROP TRIGGER {row["name"]}')
+    for name, definition in app.INDEXES.items():
+        if definition.startswith('intervention_records '):
+            cursor.execute(f'DROP INDEX IF EXISTS {name}')
+    
+    version = itertools.count(1)
+    
+    cursor.executemany(
+        'INSERT INTO companies (id, company_name, row_version) VALUES (?, ?, ?)',
+        [(n, f'Entreprise {n:03d}', next(version)) for n in range(1, companies + 1)]
+    )
+    company_weights = zipf_weights(companies)
+    cursor.executemany(
+        'INSERT INTO fme (id, fme_name, company_id, phone_number, row_version) VALUES (?, ?, ?, ?, ?)',
+        [(n, f'Technicien {n:05d}', rng.choices(range(1, companies + 1), cum_weights=company_weights)[0],
+          f'06{rng.randrange(10 ** 8):08d}', next(version))
+         for n in range(1, fmes + 1)]
+    )
+    cursor.executemany(
+        'INSERT INTO sites (id, t_number, site_name, row_version) VALUES (?, ?, ?, ?)',
+        [(n, f'T{n:06d}', f'Site {n:05d}', next(version)) for n in range(1, sites + 1)]
+    )
+    
+    labels = ACTIONS + list(INITIAL_STATES) + ['en_cours', 'termine']
+    cursor.executemany('INSERT OR IGNORE INTO labels (name) VALUES (?)', [(name,) for name in labels])
+    cursor.execute('SELECT id, name FROM labels')
+    label_ids = {row['name']: row['id'] for row in cursor.fetchall()}
+    conn.commit()
+    
+    # FME tirés par popularité : les FME des grandes entreprises sont aussi les plus actifs
+    fme_weights = zipf_weights(fmes, 0.8)
+    site_weights = zipf_weights(sites, 0.6)
+    action_ids = [label_ids[name] for name in ACTIONS]
+    action_weights = zipf_weights(len(ACTIONS))
+    initial_ids = [label_ids[name] for name in INITIAL_STATES]
+    initial_weights = list(itertools.accumulate(INITIAL_STATES.values()))
+    final_ids = [label_ids[name] for name in FINAL_STATES]
+    final_weights = list(itertools.accumulate(FINAL_STATES.values()))
+    hour_weights = list(itertools.accumulate(HOUR_WEIGHTS))
+    open_id, closed_id = label_ids['en_cours'], label_ids['termine']
+    
+    end = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    start, counts = daily_counts(rng, interventions, days, end)
+    now = epoch(datetime.now())
+    mu = math.log(DURATION_MEDIAN_SECONDS)
+    
+    batch = []
+    sequences = []
+    record_id = 0
+    for offset, count in enumerate(counts):
+        day = start + timedelta(days=offset)
+        day_epoch = epoch(day)
+        last_day = offset == len(counts) - 1
+        hours = rng.choices(range(24), cum_weights=hour_weights, k=count)
+        arrivals = sorted(day_epoch + hour * 3600 + rng.randrange(3600) for hour in hours)
+        draws = zip(
+            rng.choices(range(1, fmes + 1), cum_weights=fme_weights, k=count),
+            rng.choices(range(1, sites + 1), cum_weights=site_weights, k=count),
+            rng.choices(initial_ids, cum_weights=initial_weights, k=count),
+            rng.choices(action_ids, cum_weights=action_weights, k=count),
+        )
+        for number, (arrival, (fme_id, site_id, initial_id, action_id)) in enumerate(zip(arrivals, draws), start=1):
+            record_id += 1
+            ticket = f'TKT-{day:%Y%m%d}-{number:04d}'
+            departure = arrival + min(int(rng.lognormvariate(mu, DURATION_SIGMA)), DURATION_MAX_SECONDS)
+            if (last_day and rng.random() < OPEN_RATIO) or departure > now:
+                departure, final_id, status_id, comment = None, None, open_id, None
+            else:
+                final_id = rng.choices(final_ids, cum_weights=final_weights)[0]
+                status_id = closed_id
+                comment = rng.choice(COMMENTS) if rng.random() < 0.2 else ''
+            batch.append((record_id, ticket, fme_id, site_id, initial_id, action_id, arrival,
+                          departure, final_id, comment, status_id, arrival, next(version)))
+            if len(batch) >= INSERT_BATCH_SIZE:
+                insert_records(conn, batch)
+                batch = []
+                progress(f'{record_id} intervention(s) insérée(s)')
+        if count:
+            sequences.append((f'{day:%Y%m%d}', count))
+    insert_records(conn, batch)
+    cursor.executemany('INSERT INTO ticket_sequences (day, last_number) VALUES (?, ?)', sequences)
+    cursor.execute('UPDATE sync_state SET version = ? WHERE id = 1', (next(version) - 1,))
+    conn.commit()
+    
+    progress('Reconstruction des index, compteurs, agrégats et de la recherche')
+    for name, definition in app.INDEXES.items():
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {definition}')
+    app.rebuild_stats_counters(cursor)
+    app.rebuild_duration_rollups(cursor)
+    app.rebuild_site_status(cursor)
+    app.rebuild_search_index(cursor)
+    app.create_triggers(cursor)
+    cursor.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+    return record_id
+
+def insert_records(conn, batch):
+    """Insérer un lot d'interventions dans une transaction"""
+    conn.executemany('''
+        INSERT INTO intervention_records (
+            id, ticket_number, fme_id, site_id, initial_state_id, action_id, arrival_epoch,
+            departure_epoch, final_state_id, comment, status_id, created_epoch, row_version
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', batch)
+    conn.commit()
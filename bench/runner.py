@@ -0,0 +1,492 @@
+"""Mesure de chaque route de l'application.
+
+Deux modes : client de test Flask (application chargée dans ce processus,
+sur une copie de la base) et HTTP (serveur déjà lancé, --url). Dans les
+deux cas, concurrency threads envoient les requêtes d'un scénario ; on
+relève latences (p50, p95, p99), débit, octets reçus et pic de mémoire
+résidente du processus qui sert les requêtes.
+"""
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import resource
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import quote, urlsplit
+
+import app
+
+# Scénarios coûteux (exports, gros imports) : part du nombre de requêtes demandé
+HEAVY_RATIO = 0.05
+
+# Intervalle d'échantillonnage de la mémoire résidente (secondes)
+RSS_SAMPLE_SECONDS = 0.005
+
+class Scenario:
+    """Une requête type : build(context, i) renvoie (méthode, chemin, corps
+    JSON) ; after(context, status, body) exploite la réponse (ids créés)."""
+    
+    def __init__(self, name, method, build, after=None, heavy=False):
+        self.name = name
+        self.method = method
+        self.build = build
+        self.after = after
+        self.heavy = heavy
+
+def _created(context, status, body):
+    if status == 200:
+        with context['lock']:
+            context['created'].append(json.loads(body)['id'])
+
+def _take(context, source, destination=None):
+    """Id retiré de context[source] (0 s'il n'en reste plus), ajouté à context[destination]"""
+    with context['lock']:
+        intervention_id = context[source].pop() if context[source] else 0
+        if destination and intervention_id:
+            context[destination].append(intervention_id)
+        return intervention_id
+
+def _bulk_rows(context, i, count=100):
+    day = datetime.now() - timedelta(days=400 + i % 300)
+    fme_name, company_name = random.choice(context['fme'])
+    return [{
+        'fme_name': fme_name,
+        'company_name': company_name,
+        'phone_number': '0600000000',
+        't_number': random.choice(context['sites']),
+        'site_name': 'Site importé',
+        'initial_state': 'down',
+        'action': random.choice(context['actions']),
+        'arrival_time': (day + timedelta(minutes=n)).strftime('%Y-%m-%d %H:%M:%S'),
+        'departure_time': (day + timedelta(minutes=n + 90)).strftime('%Y-%m-%d %H:%M:%S'),
+        'final_state': 'up',
+    } for n in range(count)]
+
+def _new_intervention(context, i):
+    fme_name, company_name = random.choice(context['fme'])
+    return {
+        'fme_name': fme_name, 'company_name': company_name, 'phone_number': '0600000000',
+        't_number': random.choice(context['sites']), 'site_name': 'Site banc',
+        'initial_state': 'down', 'action': random.choice(context['actions']),
+    }
+
+# Lectures d'abord, puis écritures : close et delete consomment les ids créés
+SCENARIOS = [
+    Scenario('index', 'GET', lambda c, i: '/'),
+    Scenario('companies', 'GET', lambda c, i: '/api/companies'),
+    Scenario('fme', 'GET', lambda c, i: '/api/fme'),
+    Scenario('fme_search', 'GET', lambda c, i: f'/api/fme/search?query={random.choice(c["fme"])[0][-4:]}'),
+    Scenario('sites', 'GET', lambda c, i: '/api/sites'),
+    Scenario('site', 'GET', lambda c, i: f'/api/sites/{random.choice(c["sites"])}'),
+    Scenario('sites_down', 'GET', lambda c, i: '/api/sites/down'),
+    Scenario('site_timeline', 'GET', lambda c, i: f'/api/sites/{random.choice(c["sites"])}/interventions'),
+    Scenario('interventions_search', 'GET', lambda c, i: f'/api/interventions/search?query={random.choice(c["sites"])}'),
+    Scenario('ticket_search', 'GET', lambda c, i: f'/api/interventions/search?query={random.choice(c["tickets"])}'),
+    Scenario('suggestions', 'GET', lambda c, i: '/api/suggestions/actions'),
+    Scenario('autocomplete_sites', 'GET', lambda c, i: f'/api/autocomplete?kind=sites&q={random.choice(c["sites"])[:i % 4 + 1]}'),
+    Scenario('autocomplete_fme', 'GET', lambda c, i: f'/api/autocomplete?kind=fme&q={random.choice(c["fme"])[0][:i % 6 + 1]}'),
+    Scenario('interventions', 'GET', lambda c, i: '/api/interventions'),
+    Scenario('interventions_500', 'GET', lambda c, i: '/api/interventions?limit=500'),
+    Scenario('interventions_500_rows', 'GET', lambda c, i: '/api/interventions?limit=500&format=rows'),
+    Scenario('interventions_500_columnar', 'GET', lambda c, i: '/api/interventions?limit=500&format=columnar'),
+    Scenario('interventions_filtered', 'GET',
+             lambda c, i: f'/api/interventions?status=termine&company={quote(c["company"])}&date_from={c["month_ago"]}'),
+    Scenario('interventions_site_down', 'GET', lambda c, i: '/api/interventions?site_down=true'),
+    Scenario('interventions_archive', 'GET', lambda c, i: f'/api/interventions?archive=true&date_from={c["year_ago"]}'),
+    Scenario('bootstrap', 'GET', lambda c, i: '/api/bootstrap'),
+    Scenario('bootstrap_rows', 'GET', lambda c, i: '/api/bootstrap?format=rows'),
+    Scenario('bootstrap_columnar', 'GET', lambda c, i: '/api/bootstrap?format=columnar'),
+    Scenario('changes', 'GET', lambda c, i: f'/api/changes?since={c["since"]}'),
+    Scenario('stats', 'GET', lambda c, i: '/api/stats'),
+    Scenario('timeseries', 'GET', lambda c, i: f'/api/stats/timeseries?date_from={c["month_ago"]}'),
+    Scenario('timeseries_grouped', 'GET', lambda c, i: '/api/stats/timeseries?interval=month&group_by=company'),
+    Scenario('cache', 'GET', lambda c, i: '/api/cache'),
+    Scenario('export_csv', 'GET', lambda c, i: f'/api/export/excel?date_from={c["month_ago"]}', heavy=True),
+    Scenario('export_xlsx', 'GET', lambda c, i: f'/api/export/excel?format=xlsx&date_from={c["month_ago"]}', heavy=True),
+    Scenario('add_company', 'POST', lambda c, i: ('/api/companies', {'company_name': f'Banc {c["run"]} {i}'})),
+    Scenario('add_fme', 'POST', lambda c, i: ('/api/fme', {
+        'fme_name': f'Banc {c["run"]} {i}', 'company_name': c['company'], 'phone_number': '0600000000'})),
+    Scenario('add_site', 'POST', lambda c, i: ('/api/sites', {'t_number': f'B{c["run"]}-{i}', 'site_name': 'Site banc'})),
+    Scenario('create', 'POST', lambda c, i: ('/api/interventions', _new_intervention(c, i)), after=_created),
+    Scenario('close', 'PUT', lambda c, i: (f'/api/interventions/{_take(c, "created", "closed")}/close',
+                                           {'final_state': 'up', 'comment': 'banc'})),
+    Scenario('bulk', 'POST', lambda c, i: ('/api/interventions/bulk', _bulk_rows(c, i)), heavy=True),
+    Scenario('delete', 'DELETE', lambda c, i: f'/api/interventions/{_take(c, "closed")}'),
+]
+
+def sample_context(path):
+    """Valeurs réelles de la base tirées au hasard pour paramétrer les requêtes"""
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    sample = lambda query: [row[0] for row in conn.execute(query)]
+    top = conn.execute('''
+        SELECT c.company_name FROM intervention_records r
+        JOIN fme f ON f.id = r.fme_id JOIN companies c ON c.id = f.company_id
+        WHERE r.id > (SELECT MAX(id) FROM intervention_records) - 10000
+        GROUP BY c.id ORDER BY COUNT(*) DESC LIMIT 1
+    ''').fetchone()
+    context = {
+        'sites': sample('SELECT t_number FROM sites ORDER BY random() LIMIT 500'),
+        'fme': [tuple(row) for row in conn.execute('''
+            SELECT f.fme_name, c.company_name FROM fme f JOIN companies c ON c.id = f.company_id
+            ORDER BY random() LIMIT 500
+        ''')],
+        'actions': sample('''
+            SELECT name FROM labels WHERE id IN (
+                SELECT action_id FROM intervention_records
+                WHERE id > (SELECT MAX(id) FROM intervention_records) - 10000
+            )
+        ''') or ['Contrôle alarme'],
+        'tickets': sample('''
+            SELECT ticket_number FROM intervention_records
+            WHERE id IN (SELECT abs(random()) % (SELECT MAX(id) FROM intervention_records) + 1
+                         FROM intervention_records LIMIT 500)
+        ''') or ['TKT'],
+        'company': top[0] if top else '',
+        'since': max(conn.execute('SELECT version - 100, pruned_version FROM sync_state').fetchone()),
+        'month_ago': (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d'),
+        'year_ago': (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d'),
+        'run': datetime.now().strftime('%H%M%S'),
+        'created': [],
+        'closed': [],
+        'lock': threading.Lock(),
+    }
+    conn.close()
+    return context
+
+def copy_database(path, directory):
+    """Copier la base et son archive (API de sauvegarde : base WAL comprise)"""
+    target = os.path.join(directory, os.path.basename(path))
+    for source, destination in ((path, target), (_archive_path(path), _archive_path(target))):
+        if os.path.exists(source):
+            src, dst = sqlite3.connect(source), sqlite3.connect(destination)
+            src.backup(dst)
+            src.close()
+            dst.close()
+    return target
+
+def _archive_path(path):
+    root, extension = os.path.splitext(path)
+    return f'{root}_archive{extension}'
+
+class ClientTarget:
+    """Requêtes envoyées au client de test Flask (un client par thread)"""
+    
+    def __init__(self, headers):
+        self.headers = headers
+        self.local = threading.local()
+        self.pid = os.getpid()
+    
+    def request(self, method, path, body):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = app.app.test_client()
+        response = client.open(path, method=method, json=body, headers=self.headers)
+        data = response.get_data()
+        response.close()
+        return response.status_code, data
+
+class HttpTarget:
+    """Requêtes HTTP vers un serveur lancé (une connexion par thread,
+    rouverte automatiquement si le serveur la ferme)"""
+    
+    def __init__(self, url, headers, pid=None):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.headers = headers
+        self.local = threading.local()
+        self.pid = pid
+    
+    def request(self, method, path, body):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = http.client.HTTPConnection(self.host, self.port, timeout=300)
+        headers = dict(self.headers)
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        try:
+            conn.request(method, self.prefix + path, payload, headers)
+            response = conn.getresponse()
+            return response.status, response.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            raise
+
+def read_rss(pid):
+    """Mémoire résidente (octets) du processus pid, None hors Linux"""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+def read_cpu(pid):
+    """Temps CPU consommé (secondes) par le processus pid, None s'il est illisible"""
+    if pid == os.getpid():
+        return time.process_time()
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # utime et stime, après le nom du processus (entre parenthèses)
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, TypeError):
+        return None
+
+class RssSampler:
+    """Pic de mémoire résidente pendant un scénario (échantillonnage)"""
+    
+    def __init__(self, pid):
+        self.pid = pid
+        self.peak = None
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+    
+    def _run(self):
+        while True:
+            rss = read_rss(self.pid)
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+            if self.stop.wait(RSS_SAMPLE_SECONDS):
+                return
+    
+    def __enter__(self):
+        if self.pid is not None:
+            self.thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self.stop.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        if self.peak is None and self.pid == os.getpid():
+            # Sans /proc : pic du processus depuis son démarrage (Kio sous Linux, octets sous macOS)
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.peak = maxrss if platform.system() == 'Darwin' else maxrss * 1024
+
+def percentile(values, q):
+    """Percentile (rang le plus proche) d'une liste triée"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, int(round(q / 100 * len(values))) - 1))]
+
+def run_scenario(target, context, scenario, requests, concurrency, warmup):
+    """Exécuter requests requêtes d'un scénario ; renvoie ses mesures"""
+    def call(i):
+        request = scenario.build(context, i)
+        if isinstance(request, str):
+            request = (request, None)
+        path, body = request
+        start = time.perf_counter()
+        try:
+            status, data = target.request(scenario.method, path, body)
+        except Exception as e:
+            return None, time.perf_counter() - start, 0, type(e).__name__
+        elapsed = time.perf_counter() - start
+        if scenario.after:
+            scenario.after(context, status, data)
+        return status, elapsed, len(data), None
+    
+    for i in range(warmup):
+        call(-1 - i)
+    
+    counter = itertools.count()
+    latencies = []
+    statuses = {}
+    sizes = []
+    lock = threading.Lock()
+    
+    def worker():
+        while True:
+            i = next(counter)
+            if i >= requests:
+                return
+            status, elapsed, size, error = call(i)
+            key = str(status) if error is None else error
+            with lock:
+                latencies.append(elapsed)
+                sizes.append(size)
+                statuses[key] = statuses.get(key, 0) + 1
+    
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    with RssSampler(target.pid) as sampler:
+        cpu_start = read_cpu(target.pid)
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+        cpu_end = read_cpu(target.pid)
+    
+    latencies.sort()
+    ms = lambda seconds: round(seconds * 1000, 3) if seconds is not None else None
+    errors = sum(count for key, count in statuses.items() if not key.isdigit() or int(key) >= 500)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'statuses': statuses,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+        'max_ms': ms(latencies[-1]) if latencies else None,
+        'throughput_rps': round(len(latencies) / wall, 1) if wall else None,
+        'bytes_mean': round(sum(sizes) / len(sizes)) if sizes else 0,
+        'cpu_ms_per_request': (round((cpu_end - cpu_start) * 1000 / len(latencies), 3)
+                               if latencies and cpu_start is not None and cpu_end is not None else None),
+        'peak_rss_mb': round(sampler.peak / 2 ** 20, 1) if sampler.peak else None,
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def dataset_summary(path):
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    summary = {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+               for table in ('intervention_records', 'sites', 'fme', 'companies')}
+    archive = _archive_path(path)
+    if os.path.exists(archive):
+        conn.execute('ATTACH DATABASE ? AS archive', (archive,))
+        summary['archived'] = conn.execute('SELECT COUNT(*) FROM archive.intervention_records').fetchone()[0]
+    conn.close()
+    return summary
+
+def run(db, url=None, server_pid=None, requests=200, concurrency=1, warmup=5, only=None,
+        gzip=False, in_place=False, progress=print):
+    """Mesurer les scénarios retenus (expression only) ; renvoie le rapport"""
+    headers = {'Accept-Encoding': 'gzip'} if gzip else {}
+    context = sample_context(db)
+    meta = {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'mode': 'http' if url else 'client',
+        'url': url,
+        'concurrency': concurrency,
+        'requests': requests,
+        'gzip': gzip,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'dataset': dataset_summary(db),
+    }
+    
+    directory = None
+    if url:
+        target = HttpTarget(url, headers, server_pid)
+    else:
+        # Les écritures du banc ne touchent pas la base de référence
+        if not in_place:
+            directory = tempfile.mkdtemp(prefix='bench-')
+            db = copy_database(db, directory)
+        app.DATABASE = db
+        app.init_db()
+        target = ClientTarget(headers)
+    
+    results = {}
+    try:
+        for scenario in SCENARIOS:
+            if only and not re.search(only, scenario.name):
+                continue
+            count = max(int(requests * HEAVY_RATIO), 3) if scenario.heavy else requests
+            results[scenario.name] = run_scenario(target, context, scenario, count, concurrency, warmup)
+            result = results[scenario.name]
+            progress(f'{scenario.name:<26} p50 {result["p50_ms"]:>9} ms  p99 {result["p99_ms"]:>9} ms  '
+                     f'{result["throughput_rps"]:>8} req/s  {result["errors"]} erreur(s)')
+    finally:
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
+    
+    if not url:
+        meta['write_queue'] = app.write_queue.stats()
+    return {'meta': meta, 'results': results}
+
+def run_writes(db, threads=(1, 8, 32, 64), pairs=640, progress=print):
+    """Débit d'écriture avec et sans file d'écriture (app.WRITE_QUEUE_ENABLED) :
+    pairs créations suivies chacune d'une clôture, envoyées par chaque
+    nombre de threads, sur une copie neuve de db par mesure"""
+    context = sample_context(db)
+    results = []
+    for enabled in (False, True):
+        for count in threads:
+            directory = tempfile.mkdtemp(prefix='bench-')
+            try:
+                app.DATABASE = copy_database(db, directory)
+                app.WRITE_QUEUE_ENABLED = enabled
+                app.init_db()
+                counter = itertools.count()
+                latencies = []
+                errors = []
+                lock = threading.Lock()
+    
+                def worker():
+                    client = app.app.test_client()
+                    while next(counter) < pairs:
+                        start = time.perf_counter()
+                        response = client.post('/api/interventions', json=_new_intervention(context, 0))
+                        created = time.perf_counter()
+                        closed = None
+                        if response.status_code == 200:
+                            closed = client.put(f'/api/interventions/{response.get_json()["id"]}/close',
+                                                json={'final_state': 'up', 'comment': 'banc'})
+                        end = time.perf_counter()
+                        with lock:
+                            latencies.extend((created - start, end - created))
+                            if response.status_code != 200 or closed.status_code != 200:
+                                errors.append(response.status_code)
+    
+                workers = [threading.Thread(target=worker) for _ in range(count)]
+                start = time.perf_counter()
+                for worker_thread in workers:
+                    worker_thread.start()
+                for worker_thread in workers:
+                    worker_thread.join()
+                wall = time.perf_counter() - start
+            finally:
+                app.WRITE_QUEUE_ENABLED = True
+                shutil.rmtree(directory, ignore_errors=True)
+    
+            latencies.sort()
+            result = {
+                'write_queue': enabled,
+                'threads': count,
+                'writes': len(latencies),
+                'errors': len(errors),
+                'writes_per_second': round(len(latencies) / wall, 1),
+                'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+                'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+            }
+            results.append(result)
+            progress(f'file {"activée" if enabled else "désactivée":<11} {count:>3} thread(s)  '
+                     f'{result["writes_per_second"]:>8} écritures/s  p99 {result["p99_ms"]:>9} ms  '
+                     f'{result["errors"]} erreur(s)')
+    return results
+
+def compare(baseline, current, metric='p95_ms', threshold=0.2):
+    """Lignes (scénario, avant, après, variation, régression) entre deux rapports"""
+    rows = []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name, {}).get(metric)
+        after = result.get(metric)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before if before else 0.0
+        # Le débit régresse quand il baisse, les latences quand elles montent
+        regression = -change > threshold if metric == 'throughput_rps' else change > threshold
+        rows.append((name, before, after, change, regression))
+    return rows
@@ -0,0 +1,371 @@
+const { useState, useEffect, useCallback, useRef } = React;
+const API_URL = "http://localhost:5000/api";
+const PAGE_SIZE = 50;
+const MAX_PAGE_SIZE = 500;
+const AUTOCOMPLETE_LIMIT = 10;
+const AUTOCOMPLETE_DELAY_MS = 80;
+function App() {
+  const [interventions, setInterventions] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [summary, setSummary] = useState({ ongoing: 0, total: 0, still_down: 0 });
+  const [companies, setCompanies] = useState([]);
+  const [loading, setLoading] = useState(false);
+  const [showNewModal, setShowNewModal] = useState(false);
+  const [showCloseModal, setShowCloseModal] = useState(false);
+  const [showDeleteModal, setShowDeleteModal] = useState(false);
+  const [selectedIntervention, setSelectedIntervention] = useState(null);
+  const [interventionToDelete, setInterventionToDelete] = useState(null);
+  const [searchQuery, setSearchQuery] = useState("");
+  const [debouncedSearch, setDebouncedSearch] = useState("");
+  const [filters, setFilters] = useState({ status: "", company: "", dateFrom: "", dateTo: "" });
+  const [toast, setToast] = useState({ show: false, message: "", type: "success" });
+  const loadedCount = useRef(0);
+  const sentinelRef = useRef(null);
+  const buildListParams = useCallback((extra = {}) => {
+    const params = new URLSearchParams();
+    if (filters.status)
+      params.append("status", filters.status);
+    if (filters.company)
+      params.append("company", filters.company);
+    if (filters.dateFrom)
+      params.append("date_from", filters.dateFrom);
+    if (filters.dateTo)
+      params.append("date_to", filters.dateTo);
+    if (debouncedSearch.trim())
+      params.append("q", debouncedSearch.trim());
+    Object.entries(extra).forEach(([k, v]) => params.append(k, v));
+    return params;
+  }, [filters, debouncedSearch]);
+  const loadInterventions = useCallback(async (keepLoaded = false) => {
+    const limit = keepLoaded ? Math.min(Math.max(PAGE_SIZE, loadedCount.current), MAX_PAGE_SIZE) : PAGE_SIZE;
+    const res = await fetch(`${API_URL}/interventions?${buildListParams({ limit, format: "columnar" })}`);
+    const data = fromColumns(await res.json());
+    loadedCount.current = data.length;
+    setInterventions(data);
+    setNextCursor(res.headers.get("X-Next-Cursor"));
+  }, [buildListParams]);
+  const loadMore = useCallback(async () => {
+    if (!nextCursor || loadingMore)
+      return;
+    setLoadingMore(true);
+    try {
+      const res = await fetch(`${API_URL}/interventions?${buildListParams({ limit: PAGE_SIZE, cursor: nextCursor, format: "columnar" })}`);
+      const data = fromColumns(await res.json());
+      setInterventions((prev) => {
+        const merged = [...prev, ...data];
+        loadedCount.current = merged.length;
+        return merged;
+      });
+      setNextCursor(res.headers.get("X-Next-Cursor"));
+    } catch (error) {
+      showToast("Erreur de connexion", "error");
+    } finally {
+      setLoadingMore(false);
+    }
+  }, [nextCursor, loadingMore, buildListParams]);
+  const buildListParamsRef = useRef(buildListParams);
+  const nextCursorRef = useRef(nextCursor);
+  const versionRef = useRef(null);
+  useEffect(() => {
+    buildListParamsRef.current = buildListParams;
+  }, [buildListParams]);
+  useEffect(() => {
+    nextCursorRef.current = nextCursor;
+  }, [nextCursor]);
+  const loadSummary = useCallback(async () => {
+    const res = await fetch(`${API_URL}/stats`);
+    setSummary(await res.json());
+  }, []);
+  const loadData = useCallback(async () => {
+    setLoading(true);
+    try {
+      const limit = Math.min(Math.max(PAGE_SIZE, loadedCount.current), MAX_PAGE_SIZE);
+      const [res] = await Promise.all([
+        fetch(`${API_URL}/bootstrap?${buildListParamsRef.current({ limit, lists: "companies", format: "columnar" })}`),
+        loadSummary()
+      ]);
+      const data = await res.json();
+      const loaded = fromColumns(data.interventions);
+      loadedCount.current = loaded.length;
+      setInterventions(loaded);
+      setNextCursor(data.next_cursor);
+      setCompanies(fromColumns(data.companies));
+      versionRef.current = data.version;
+    } catch (error) {
+      showToast("Erreur de connexion", "error");
+    } finally {
+      setLoading(false);
+    }
+  }, [loadSummary]);
+  const syncChanges = useCallback(async () => {
+    if (versionRef.current === null)
+      return loadData();
+    try {
+      const res = await fetch(`${API_URL}/changes?${buildListParamsRef.current({ since: versionRef.current, format: "columnar" })}`);
+      const changes = await res.json();
+      if (changes.reset)
+        return loadData();
+      for (const list of ["interventions", "companies"])
+        changes[list] = fromColumns(changes[list]);
+      const changed = changes.interventions.length + changes.removed.length + changes.companies.length;
+      if (changed > 0) {
+        setInterventions((prev) => {
+          const merged = mergeInterventions(prev, changes.interventions, changes.removed, nextCursorRef.current !== null);
+          loadedCount.current = merged.length;
+          return merged;
+        });
+        setCompanies((prev) => upsertBy(prev, changes.companies, "id", "company_name"));
+        await loadSummary();
+      }
+      versionRef.current = changes.version;
+    } catch (error) {
+      showToast("Erreur de connexion", "error");
+    }
+  }, [loadData, loadSummary]);
+  useEffect(() => {
+    const timeout = setTimeout(() => setDebouncedSearch(searchQuery), 300);
+    return () => clearTimeout(timeout);
+  }, [searchQuery]);
+  const filtersApplied = useRef(false);
+  useEffect(() => {
+    if (!filtersApplied.current) {
+      filtersApplied.current = true;
+      return;
+    }
+    loadInterventions().catch(() => showToast("Erreur de connexion", "error"));
+  }, [loadInterventions]);
+  const syncChangesRef = useRef(syncChanges);
+  useEffect(() => {
+    syncChangesRef.current = syncChanges;
+  }, [syncChanges]);
+  useEffect(() => {
+    loadData();
+    let pending = null;
+    const scheduleSync = () => {
+      if (pending)
+        return;
+      pending = setTimeout(() => {
+        pending = null;
+        syncChangesRef.current();
+      }, 200);
+    };
+    const source = new EventSource(`${API_URL}/events`);
+    let opened = false;
+    source.onopen = () => {
+      if (opened)
+        scheduleSync();
+      opened = true;
+    };
+    ["created", "closed", "deleted", "imported", "resync"].forEach((type) => source.addEventListener(type, scheduleSync));
+    return () => {
+      source.close();
+      clearTimeout(pending);
+    };
+  }, [loadData]);
+  useEffect(() => {
+    if (!sentinelRef.current)
+      return;
+    const observer = new IntersectionObserver((entries) => {
+      if (entries[0].isIntersecting)
+        loadMore();
+    }, { rootMargin: "200px" });
+    observer.observe(sentinelRef.current);
+    return () => observer.disconnect();
+  }, [loadMore]);
+  const showToast = (message, type = "success") => {
+    setToast({ show: true, message, type });
+    setTimeout(() => setToast({ show: false, message: "", type: "success" }), 3e3);
+  };
+  const handleNewIntervention = async (data) => {
+    try {
+      const res = await fetch(`${API_URL}/interventions`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify(data)
+      });
+      if (res.ok) {
+        const result = await res.json();
+        showToast(`\u2713 Ticket cr\xE9\xE9: ${result.ticket_number}`);
+        setShowNewModal(false);
+        syncChanges();
+      } else {
+        const error = await res.json();
+        showToast(error.error || "Erreur", "error");
+      }
+    } catch (error) {
+      showToast("Erreur de connexion", "error");
+    }
+  };
+  const handleCloseIntervention = async (e) => {
+    e.preventDefault();
+    const formData = new FormData(e.target);
+    try {
+      const res = await fetch(`${API_URL}/interventions/${selectedIntervention}/close`, {
+        method: "PUT",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+          final_state: formData.get("final_state"),
+          comment: formData.get("comment")
+        })
+      });
+      if (res.ok) {
+        showToast("\u2713 Intervention ferm\xE9e");
+        setShowCloseModal(false);
+        syncChanges();
+      }
+    } catch (error) {
+      showToast("Erreur", "error");
+    }
+  };
+  const confirmDelete = (id) => {
+    setInterventionToDelete(id);
+    setShowDeleteModal(true);
+  };
+  const deleteIntervention = async () => {
+    try {
+      const res = await fetch(`${API_URL}/interventions/${interventionToDelete}`, { method: "DELETE" });
+      if (res.ok) {
+        showToast("\u2713 Supprim\xE9");
+        setShowDeleteModal(false);
+        syncChanges();
+      }
+    } catch (error) {
+      showToast("Erreur", "error");
+    }
+  };
+  const exportToExcel = () => {
+    const params = buildListParams({ format: "xlsx" });
+    window.open(`${API_URL}/export/excel?${params}`, "_blank");
+    showToast("\u{1F4CA} Export en cours...");
+  };
+  const formatState = (state) => ({ "down": "Down", "up": "Up", "sector_failure": "Sector Failure" })[state] || state;
+  const formatDateTime = (dateStr) => {
+    if (!dateStr)
+      return "-";
+    return new Date(dateStr).toLocaleString("fr-FR", { day: "2-digit", month: "2-digit", year: "numeric", hour: "2-digit", minute: "2-digit" });
+  };
+  const getStatusColor = (status) => status === "en_cours" ? "bg-blue-100 text-blue-700" : "bg-green-100 text-green-700";
+  const getStateColor = (state) => ({ "down": "bg-red-100 text-red-700", "up": "bg-green-100 text-green-700", "sector_failure": "bg-yellow-100 text-yellow-700" })[state] || "bg-gray-100 text-gray-700";
+  const companies_list = companies.map((c) => c.company_name);
+  return /* @__PURE__ */ React.createElement("div", { className: "min-h-screen bg-gray-50" }, /* @__PURE__ */ React.createElement("header", { className: "bg-white border-b border-gray-200 sticky top-0 z-30 shadow-xs" }, /* @__PURE__ */ React.createElement("div", { className: "px-6 py-4" }, /* @__PURE__ */ React.createElement("div", { className: "flex items-center justify-between" }, /* @__PURE__ */ React.createElement("div", { className: "flex items-center gap-3" }, /* @__PURE__ */ React.createElement("div", { className: "w-10 h-10 rounded-xl bg-gradient-to-br from-blue-600 to-blue-700 flex items-center justify-center text-white font-bold text-lg shadow-lg" }, "F"), /* @__PURE__ */ React.createElement("div", null, /* @__PURE__ */ React.createElement("h1", { className: "text-xl font-bold text-gray-900" }, "FME Tracker"), /* @__PURE__ */ React.createElement("p", { className: "text-xs text-gray-500" }, "Gestion des interventions"))), /* @__PURE__ */ React.createElement("div", { className: "flex items-center gap-3" }, /* @__PURE__ */ React.createElement("button", { onClick: loadData, disabled: loading, className: "px-4 py-2 bg-gray-100 hover:bg-gray-200 rounded-lg text-sm font-medium text-gray-700 flex items-center gap-2" }, /* @__PURE__ */ React.createElement("span", { className: loading ? "animate-spin" : "" }, "\u{1F504}"), /* @__PURE__ */ React.createElement("span", { className: "hidden sm:inline" }, "Actualiser")), /* @__PURE__ */ React.createElement("button", { onClick: () => setShowNewModal(true), className: "px-6 py-2 bg-gradient-to-r from-blue-600 to-blue-700 hover:from-blue-700 hover:to-blue-800 text-white rounded-lg font-semibold shadow-lg shadow-blue-500/30 flex items-center gap-2" }, /* @__PURE__ */ React.createElement("span", { className: "text-lg" }, "+"), /* @__PURE__ */ React.createElement("span", null, "Nouvelle Intervention")))))), /* @__PURE__ */ React.createElement("div", { className: "px-6 py-6" }, /* @__PURE__ */ React.createElement("div", { className: "grid grid-cols-2 sm:grid-cols-4 gap-4 mb-6" }, /* @__PURE__ */ React.createElement("div", { className: "bg-white rounded-xl p-4 border border-gray-200 shadow-xs" }, /* @__PURE__ */ React.createElement("div", { className: "text-3xl font-bold text-blue-600" }, summary.ongoing), /* @__PURE__ */ React.createElement("div", { className: "text-sm text-gray-600 mt-1" }, "En cours")), /* @__PURE__ */ React.createElement("div", { className: "bg-white rounded-xl p-4 border border-gray-200 shadow-xs" }, /* @__PURE__ */ React.createElement("div", { className: "text-3xl font-bold text-gray-900" }, summary.total), /* @__PURE__ */ React.createElement("div", { className: "text-sm text-gray-600 mt-1" }, "Total")), /* @__PURE__ */ React.createElement("div", { className: "bg-white rounded-xl p-4 border border-gray-200 shadow-xs" }, /* @__PURE__ */ React.createElement("div", { className: "text-3xl font-bold text-red-600" }, summary.still_down), /* @__PURE__ */ React.createElement("div", { className: "text-sm text-gray-600 mt-1" }, "Sites Down")), /* @__PURE__ */ React.createElement("div", { className: "bg-white rounded-xl p-4 border border-gray-200 shadow-xs" }, /* @__PURE__ */ React.createElement("div", { className: "text-3xl font-bold text-green-600" }, interventions.length), /* @__PURE__ */ React.createElement("div", { className: "text-sm text-gray-600 mt-1" }, "Affich\xE9s"))), /* @__PURE__ */ React.createElement("div", { className: "bg-white rounded-xl shadow-xs border border-gray-200 p-6 mb-6" }, /* @__PURE__ */ React.createElement("div", { className: "space-y-4" }, /* @__PURE__ */ React.createElement("div", { className: "relative" }, /* @__PURE__ */ React.createElement(
+    "input",
+    {
+      type: "text",
+      value: searchQuery,
+      onChange: (e) => setSearchQuery(e.target.value),
+      placeholder: "\u{1F50D} Rechercher par Ticket, T-Number, Site ou FME...",
+      className: "w-full border-2 border-gray-300 rounded-xl px-4 py-3 focus:outline-hidden focus:border-blue-500 pl-4 text-base"
+    }
+  ), searchQuery && /* @__PURE__ */ React.createElement("button", { onClick: () => setSearchQuery(""), className: "absolute right-3 top-1/2 -translate-y-1/2 px-3 py-1 bg-gray-100 hover:bg-gray-200 rounded-lg text-sm font-medium" }, "\u2715 Effacer")), /* @__PURE__ */ React.createElement("div", { className: "grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-4 gap-3" }, /* @__PURE__ */ React.createElement("select", { value: filters.status, onChange: (e) => setFilters({ ...filters, status: e.target.value }), className: "border border-gray-300 rounded-lg px-3 py-2 focus:ring-2 focus:ring-blue-500 text-sm" }, /* @__PURE__ */ React.createElement("option", { value: "" }, "\u{1F4CA} Tous statuts"), /* @__PURE__ */ React.createElement("option", { value: "en_cours" }, "\u{1F504} En cours"), /* @__PURE__ */ React.createElement("option", { value: "termine" }, "\u2705 Termin\xE9")), /* @__PURE__ */ React.createElement("select", { value: filters.company, onChange: (e) => setFilters({ ...filters, company: e.target.value }), className: "border border-gray-300 rounded-lg px-3 py-2 focus:ring-2 focus:ring-blue-500 text-sm" }, /* @__PURE__ */ React.createElement("option", { value: "" }, "\u{1F3E2} Toutes entreprises"), companies_list.map((c) => /* @__PURE__ */ React.createElement("option", { key: c, value: c }, c))), /* @__PURE__ */ React.createElement("input", { type: "date", value: filters.dateFrom, onChange: (e) => setFilters({ ...filters, dateFrom: e.target.value }), className: "border border-gray-300 rounded-lg px-3 py-2 focus:ring-2 focus:ring-blue-500 text-sm" }), /* @__PURE__ */ React.createElement("input", { type: "date", value: filters.dateTo, onChange: (e) => setFilters({ ...filters, dateTo: e.target.value }), className: "border border-gray-300 rounded-lg px-3 py-2 focus:ring-2 focus:ring-blue-500 text-sm" })), /* @__PURE__ */ React.createElement("div", { className: "flex items-center justify-between pt-2" }, /* @__PURE__ */ React.createElement("button", { onClick: () => {
+    setFilters({ status: "", company: "", dateFrom: "", dateTo: "" });
+    setSearchQuery("");
+  }, className: "px-4 py-2 bg-gray-100 hover:bg-gray-200 rounded-lg text-sm font-medium text-gray-700" }, "\u{1F504} R\xE9initialiser"), /* @__PURE__ */ React.createElement("button", { onClick: exportToExcel, className: "px-4 py-2 bg-green-600 hover:bg-green-700 text-white rounded-lg text-sm font-semibold flex items-center gap-2 shadow-xs" }, /* @__PURE__ */ React.createElement("span", null, "\u{1F4CA}"), /* @__PURE__ */ React.createElement("span", null, "Exporter Excel"))))), /* @__PURE__ */ React.createElement("div", { className: "bg-white rounded-xl shadow-xs border border-gray-200 overflow-hidden" }, /* @__PURE__ */ React.createElement("div", { className: "overflow-x-auto" }, /* @__PURE__ */ React.createElement("table", { className: "w-full" }, /* @__PURE__ */ React.createElement("thead", { className: "bg-gray-50 border-b-2 border-gray-200" }, /* @__PURE__ */ React.createElement("tr", null, /* @__PURE__ */ React.createElement("th", { className: "text-left py-4 px-4 font-semibold text-xs text-gray-600 uppercase" }, "Ticket"), /* @__PURE__ */ React.createElement("th", { className: "text-left py-4 px-4 font-semibold text-xs text-gray-600 uppercase" }, "FME"), /* @__PURE__ */ React.createElement("th", { className: "text-left py-4 px-4 font-semibold text-xs text-gray-600 uppercase" }, "Entreprise"), /* @__PURE__ */ React.createElement("th", { className: "text-left py-4 px-4 font-semibold text-xs text-gray-600 uppercase" }, "Site"), /* @__PURE__ */ React.createElement("th", { className: "text-left py-4 px-4 font-semibold text-xs text-gray-600 uppercase" }, "\xC9tat Initial"), /* @__PURE__ */ React.createElement("th", { className: "text-left py-4 px-4 font-semibold text-xs text-gray-600 uppercase" }, "Action"), /* @__PURE__ */ React.createElement("th", { className: "text-left py-4 px-4 font-semibold text-xs text-gray-600 uppercase" }, "Arriv\xE9e"), /* @__PURE__ */ React.createElement("th", { className: "text-left py-4 px-4 font-semibold text-xs text-gray-600 uppercase" }, "\xC9tat Final"), /* @__PURE__ */ React.createElement("th", { className: "text-left py-4 px-4 font-semibold text-xs text-gray-600 uppercase" }, "Statut"), /* @__PURE__ */ React.createElement("th", { className: "text-left py-4 px-4 font-semibold text-xs text-gray-600 uppercase" }, "Actions"))), /* @__PURE__ */ React.createElement("tbody", { className: "divide-y divide-gray-100" }, interventions.length === 0 ? /* @__PURE__ */ React.createElement("tr", null, /* @__PURE__ */ React.createElement("td", { colSpan: "10", className: "text-center py-12 text-gray-400" }, /* @__PURE__ */ React.createElement("div", { className: "text-4xl mb-2" }, "\u{1F4ED}"), /* @__PURE__ */ React.createElement("div", null, "Aucune intervention"))) : interventions.map((intervention) => /* @__PURE__ */ React.createElement("tr", { key: intervention.id, className: "hover:bg-gray-50" }, /* @__PURE__ */ React.createElement("td", { className: "py-4 px-4" }, /* @__PURE__ */ React.createElement("div", { className: "font-mono text-xs font-semibold text-blue-600" }, intervention.ticket_number)), /* @__PURE__ */ React.createElement("td", { className: "py-4 px-4" }, /* @__PURE__ */ React.createElement("div", { className: "font-medium text-gray-900" }, intervention.fme_name), /* @__PURE__ */ React.createElement("div", { className: "text-xs text-gray-500" }, intervention.phone_number)), /* @__PURE__ */ React.createElement("td", { className: "py-4 px-4 text-sm text-gray-700" }, intervention.company_name), /* @__PURE__ */ React.createElement("td", { className: "py-4 px-4" }, /* @__PURE__ */ React.createElement("div", { className: "font-medium text-gray-900" }, intervention.site_name), /* @__PURE__ */ React.createElement("div", { className: "text-xs text-gray-500" }, intervention.t_number)), /* @__PURE__ */ React.createElement("td", { className: "py-4 px-4" }, /* @__PURE__ */ React.createElement("span", { className: `px-2.5 py-1 rounded-full text-xs font-semibold ${getStateColor(intervention.initial_state)}` }, formatState(intervention.initial_state))), /* @__PURE__ */ React.createElement("td", { className: "py-4 px-4 text-sm text-gray-700 max-w-xs truncate" }, intervention.action), /* @__PURE__ */ React.createElement("td", { className: "py-4 px-4 text-xs text-gray-500" }, formatDateTime(intervention.arrival_time)), /* @__PURE__ */ React.createElement("td", { className: "py-4 px-4" }, intervention.final_state ? /* @__PURE__ */ React.createElement("span", { className: `px-2.5 py-1 rounded-full text-xs font-semibold ${getStateColor(intervention.final_state)}` }, formatState(intervention.final_state)) : "-"), /* @__PURE__ */ React.createElement("td", { className: "py-4 px-4" }, /* @__PURE__ */ React.createElement("span", { className: `px-2.5 py-1 rounded-full text-xs font-semibold ${getStatusColor(intervention.status)}` }, intervention.status === "en_cours" ? "En cours" : "Termin\xE9")), /* @__PURE__ */ React.createElement("td", { className: "py-4 px-4" }, /* @__PURE__ */ React.createElement("div", { className: "flex gap-2" }, intervention.status === "en_cours" && /* @__PURE__ */ React.createElement("button", { onClick: () => {
+    setSelectedIntervention(intervention.id);
+    setShowCloseModal(true);
+  }, className: "px-3 py-1.5 rounded-lg bg-blue-600 hover:bg-blue-700 text-white text-xs font-semibold" }, "Fermer"), /* @__PURE__ */ React.createElement("button", { onClick: () => confirmDelete(intervention.id), className: "px-3 py-1.5 rounded-lg bg-red-50 hover:bg-red-100 text-red-700 text-xs font-semibold" }, "Suppr.")))))))), /* @__PURE__ */ React.createElement("div", { ref: sentinelRef }), nextCursor && /* @__PURE__ */ React.createElement("div", { className: "border-t border-gray-100 p-4 text-center" }, /* @__PURE__ */ React.createElement("button", { onClick: loadMore, disabled: loadingMore, className: "px-4 py-2 bg-gray-100 hover:bg-gray-200 rounded-lg text-sm font-medium text-gray-700" }, loadingMore ? "Chargement..." : "Charger plus")))), showNewModal && /* @__PURE__ */ React.createElement(NewInterventionModal, { onClose: () => setShowNewModal(false), onSubmit: handleNewIntervention }), /* @__PURE__ */ React.createElement(Modal, { show: showCloseModal, onClose: () => setShowCloseModal(false), title: "Fermer l'Intervention" }, /* @__PURE__ */ React.createElement("form", { onSubmit: handleCloseIntervention, className: "space-y-4" }, /* @__PURE__ */ React.createElement("div", null, /* @__PURE__ */ React.createElement("label", { className: "block text-sm font-medium text-gray-700 mb-2" }, "\xC9tat Final *"), /* @__PURE__ */ React.createElement("select", { name: "final_state", required: true, className: "w-full border border-gray-300 rounded-lg px-3 py-2 focus:ring-2 focus:ring-blue-500" }, /* @__PURE__ */ React.createElement("option", { value: "" }, "S\xE9lectionner..."), /* @__PURE__ */ React.createElement("option", { value: "down" }, "Down"), /* @__PURE__ */ React.createElement("option", { value: "up" }, "Up"), /* @__PURE__ */ React.createElement("option", { value: "sector_failure" }, "Sector Failure"))), /* @__PURE__ */ React.createElement("div", null, /* @__PURE__ */ React.createElement("label", { className: "block text-sm font-medium text-gray-700 mb-2" }, "Commentaire"), /* @__PURE__ */ React.createElement("textarea", { name: "comment", rows: "3", placeholder: "Facultatif...", className: "w-full border border-gray-300 rounded-lg px-3 py-2 focus:ring-2 focus:ring-blue-500 resize-none" })), /* @__PURE__ */ React.createElement("div", { className: "flex gap-3 pt-2" }, /* @__PURE__ */ React.createElement("button", { type: "submit", className: "flex-1 px-4 py-2.5 bg-blue-600 hover:bg-blue-700 text-white rounded-lg font-semibold" }, "Fermer"), /* @__PURE__ */ React.createElement("button", { type: "button", onClick: () => setShowCloseModal(false), className: "px-4 py-2.5 bg-gray-100 hover:bg-gray-200 text-gray-700 rounded-lg font-semibold" }, "Annuler")))), /* @__PURE__ */ React.createElement(Modal, { show: showDeleteModal, onClose: () => setShowDeleteModal(false), title: "Confirmer la Suppression" }, /* @__PURE__ */ React.createElement("div", { className: "space-y-4" }, /* @__PURE__ */ React.createElement("p", { className: "text-gray-600" }, "\xCAtes-vous s\xFBr ? Cette action est irr\xE9versible."), /* @__PURE__ */ React.createElement("div", { className: "flex gap-3" }, /* @__PURE__ */ React.createElement("button", { onClick: deleteIntervention, className: "flex-1 px-4 py-2.5 bg-red-600 hover:bg-red-700 text-white rounded-lg font-semibold" }, "Oui, Supprimer"), /* @__PURE__ */ React.createElement("button", { onClick: () => setShowDeleteModal(false), className: "px-4 py-2.5 bg-gray-100 hover:bg-gray-200 text-gray-700 rounded-lg font-semibold" }, "Annuler")))), toast.show && /* @__PURE__ */ React.createElement("div", { className: `fixed bottom-8 right-8 px-6 py-4 rounded-xl shadow-2xl animate-slide-in ${toast.type === "success" ? "bg-green-600 text-white" : "bg-red-600 text-white"}` }, /* @__PURE__ */ React.createElement("div", { className: "font-semibold" }, toast.message)));
+}
+function fromColumns({ columns, values }) {
+  const count = values.length ? values[0].length : 0;
+  const objects = new Array(count);
+  for (let row = 0; row < count; row++) {
+    const object = {};
+    for (let i = 0; i < columns.length; i++)
+      object[columns[i]] = values[i][row];
+    objects[row] = object;
+  }
+  return objects;
+}
+function compareInterventions(a, b) {
+  if (a.created_at !== b.created_at)
+    return a.created_at < b.created_at ? 1 : -1;
+  return b.id - a.id;
+}
+function mergeInterventions(rows, changed, removed, hasMore) {
+  const removedIds = new Set(removed);
+  const changedById = new Map(changed.map((i) => [i.id, i]));
+  const merged = rows.filter((i) => !removedIds.has(i.id)).map((i) => changedById.get(i.id) || i);
+  const known = new Set(merged.map((i) => i.id));
+  const last = merged[merged.length - 1];
+  changed.forEach((i) => {
+    if (!known.has(i.id) && (!hasMore || !last || compareInterventions(i, last) < 0))
+      merged.push(i);
+  });
+  return merged.sort(compareInterventions);
+}
+function upsertBy(list, items, key, sortKey) {
+  if (items.length === 0)
+    return list;
+  const byKey = new Map(list.map((item) => [item[key], item]));
+  items.forEach((item) => byKey.set(item[key], item));
+  return [...byKey.values()].sort((a, b) => String(a[sortKey]).localeCompare(String(b[sortKey])));
+}
+function Modal({ show, onClose, title, children }) {
+  if (!show)
+    return null;
+  return /* @__PURE__ */ React.createElement("div", { className: "fixed inset-0 bg-black/50 flex items-center justify-center z-50 p-4 animate-fade-in", onClick: onClose }, /* @__PURE__ */ React.createElement("div", { className: "bg-white rounded-2xl p-8 max-w-md w-full shadow-2xl animate-slide-up", onClick: (e) => e.stopPropagation() }, /* @__PURE__ */ React.createElement("h3", { className: "text-2xl font-bold text-gray-900 mb-6" }, title), children));
+}
+function useAutocomplete(kind, query, active) {
+  const [items, setItems] = useState([]);
+  useEffect(() => {
+    if (!active)
+      return;
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const res = await fetch(`${API_URL}/autocomplete?${new URLSearchParams({ kind, q: query, limit: AUTOCOMPLETE_LIMIT })}`);
+        const data = await res.json();
+        if (!cancelled && res.ok)
+          setItems(data);
+      } catch (error) {
+      }
+    }, AUTOCOMPLETE_DELAY_MS);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [kind, query, active]);
+  return active ? items : [];
+}
+function NewInterventionModal({ onClose, onSubmit }) {
+  const [fmeName, setFmeName] = useState("");
+  const [companyName, setCompanyName] = useState("");
+  const [phoneNumber, setPhoneNumber] = useState("");
+  const [tNumber, setTNumber] = useState("");
+  const [siteName, setSiteName] = useState("");
+  const [action, setAction] = useState("");
+  const [showFmeSuggestions, setShowFmeSuggestions] = useState(false);
+  const [showCompanySuggestions, setShowCompanySuggestions] = useState(false);
+  const [showActionSuggestions, setShowActionSuggestions] = useState(false);
+  const [showSiteSuggestions, setShowSiteSuggestions] = useState(false);
+  const filteredFme = useAutocomplete("fme", fmeName, showFmeSuggestions && fmeName.length > 0);
+  const filteredCompanies = useAutocomplete("companies", companyName, showCompanySuggestions && companyName.length > 0);
+  const filteredActions = useAutocomplete("actions", action, showActionSuggestions).map((item) => item.action);
+  const filteredSites = useAutocomplete("sites", tNumber, tNumber.length > 0);
+  useEffect(() => {
+    const site = filteredSites.find((s) => s.t_number === tNumber);
+    if (site)
+      setSiteName(site.site_name);
+  }, [tNumber, filteredSites]);
+  const handleSubmit = (e) => {
+    e.preventDefault();
+    onSubmit({ fme_name: fmeName, company_name: companyName, phone_number: phoneNumber, t_number: tNumber, site_name: siteName, action, initial_state: e.target.initial_state.value });
+  };
+  return /* @__PURE__ */ React.createElement("div", { className: "fixed inset-0 bg-black/50 flex items-center justify-center z-50 p-4 animate-fade-in overflow-y-auto", onClick: onClose }, /* @__PURE__ */ React.createElement("div", { className: "bg-white rounded-2xl p-8 max-w-4xl w-full shadow-2xl animate-slide-up my-8", onClick: (e) => e.stopPropagation() }, /* @__PURE__ */ React.createElement("h2", { className: "text-2xl font-bold text-gray-900 mb-6" }, "Nouvelle Intervention"), /* @__PURE__ */ React.createElement("form", { onSubmit: handleSubmit, className: "space-y-6" }, /* @__PURE__ */ React.createElement("div", { className: "grid grid-cols-1 md:grid-cols-2 gap-6" }, /* @__PURE__ */ React.createElement("div", { className: "relative" }, /* @__PURE__ */ React.createElement("label", { className: "block text-sm font-medium text-gray-700 mb-2" }, "Nom du FME *"), /* @__PURE__ */ React.createElement("input", { type: "text", value: fmeName, onChange: (e) => setFmeName(e.target.value), onFocus: () => setShowFmeSuggestions(true), onBlur: () => setTimeout(() => setShowFmeSuggestions(false), 200), required: true, placeholder: "Nom complet...", className: "w-full border border-gray-300 rounded-lg px-3 py-2 focus:ring-2 focus:ring-blue-500" }), showFmeSuggestions && filteredFme.length > 0 && /* @__PURE__ */ React.createElement("div", { className: "autocomplete-list" }, filteredFme.map((fme) => /* @__PURE__ */ React.createElement("div", { key: fme.id, className: "autocomplete-item", onClick: () => {
+    setFmeName(fme.fme_name);
+    setCompanyName(fme.company_name);
+    setPhoneNumber(fme.phone_number);
+    setShowFmeSuggestions(false);
+  } }, /* @__PURE__ */ React.createElement("div", { className: "font-medium" }, fme.fme_name), /* @__PURE__ */ React.createElement("div", { className: "text-xs text-gray-500" }, fme.company_name, " - ", fme.phone_number))))), /* @__PURE__ */ React.createElement("div", { className: "relative" }, /* @__PURE__ */ React.createElement("label", { className: "block text-sm font-medium text-gray-700 mb-2" }, "Entreprise *"), /* @__PURE__ */ React.createElement("input", { type: "text", value: companyName, onChange: (e) => setCompanyName(e.target.value), onFocus: () => setShowCompanySuggestions(true), onBlur: () => setTimeout(() => setShowCompanySuggestions(false), 200), required: true, placeholder: "Nom de l'entreprise...", className: "w-full border border-gray-300 rounded-lg px-3 py-2 focus:ring-2 focus:ring-blue-500" }), showCompanySuggestions && filteredCompanies.length > 0 && /* @__PURE__ */ React.createElement("div", { className: "autocomplete-list" }, filteredCompanies.map((company) => /* @__PURE__ */ React.createElement("div", { key: company.id, className: "autocomplete-item", onClick: () => {
+    setCompanyName(company.company_name);
+    setShowCompanySuggestions(false);
+  } }, company.company_name)))), /* @__PURE__ */ React.createElement("div", null, /* @__PURE__ */ React.createElement("label", { className: "block text-sm font-medium text-gray-700 mb-2" }, "T\xE9l\xE9phone *"), /* @__PURE__ */ React.createElement("input", { type: "tel", value: phoneNumber, onChange: (e) => setPhoneNumber(e.target.value), required: true, placeholder: "+237 6XX XX XX XX", className: "w-full border border-gray-300 rounded-lg px-3 py-2 focus:ring-2 focus:ring-blue-500" })), /* @__PURE__ */ React.createElement("div", { className: "relative" }, /* @__PURE__ */ React.createElement("label", { className: "block text-sm font-medium text-gray-700 mb-2" }, "T-Number *"), /* @__PURE__ */ React.createElement("input", { type: "text", value: tNumber, onChange: (e) => setTNumber(e.target.value), onFocus: () => setShowSiteSuggestions(true), onBlur: () => setTimeout(() => setShowSiteSuggestions(false), 200), required: true, placeholder: "Ex: T-001", className: "w-full border border-gray-300 rounded-lg px-3 py-2 focus:ring-2 focus:ring-blue-500" }), showSiteSuggestions && filteredSites.length > 0 && /* @__PURE__ */ React.createElement("div", { className: "autocomplete-list" }, filteredSites.map((site) => /* @__PURE__ */ React.createElement("div", { key: site.t_number, className: "autocomplete-item", onClick: () => {
+    setTNumber(site.t_number);
+    setSiteName(site.site_name);
+    setShowSiteSuggestions(false);
+  } }, /* @__PURE__ */ React.createElement("div", { className: "font-medium" }, site.t_number), /* @__PURE__ */ React.createElement("div", { className: "text-xs text-gray-500" }, site.site_name))))), /* @__PURE__ */ React.createElement("div", null, /* @__PURE__ */ React.createElement("label", { className: "block text-sm font-medium text-gray-700 mb-2" }, "Nom du Site *"), /* @__PURE__ */ React.createElement("input", { type: "text", value: siteName, onChange: (e) => setSiteName(e.target.value), required: true, placeholder: "Nom du site...", className: "w-full border border-gray-300 rounded-lg px-3 py-2 focus:ring-2 focus:ring-blue-500" })), /* @__PURE__ */ React.createElement("div", null, /* @__PURE__ */ React.createElement("label", { className: "block text-sm font-medium text-gray-700 mb-2" }, "\xC9tat Initial *"), /* @__PURE__ */ React.createElement("select", { name: "initial_state", required: true, className: "w-full border border-gray-300 rounded-lg px-3 py-2 focus:ring-2 focus:ring-blue-500" }, /* @__PURE__ */ React.createElement("option", { value: "" }, "S\xE9lectionner..."), /* @__PURE__ */ React.createElement("option", { value: "down" }, "Down"), /* @__PURE__ */ React.createElement("option", { value: "up" }, "Up"), /* @__PURE__ */ React.createElement("option", { value: "sector_failure" }, "Sector Failure")))), /* @__PURE__ */ React.createElement("div", { className: "relative" }, /* @__PURE__ */ React.createElement("label", { className: "block text-sm font-medium text-gray-700 mb-2" }, "Action \xE0 Mener *"), /* @__PURE__ */ React.createElement("input", { type: "text", value: action, onChange: (e) => setAction(e.target.value), onFocus: () => setShowActionSuggestions(true), onBlur: () => setTimeout(() => setShowActionSuggestions(false), 200), required: true, placeholder: "Description de l'action...", className: "w-full border border-gray-300 rounded-lg px-3 py-2 focus:ring-2 focus:ring-blue-500" }), showActionSuggestions && filteredActions.length > 0 && /* @__PURE__ */ React.createElement("div", { className: "autocomplete-list" }, filteredActions.map((suggestion, i) => /* @__PURE__ */ React.createElement("div", { key: i, className: "autocomplete-item", onClick: () => {
+    setAction(suggestion);
+    setShowActionSuggestions(false);
+  } }, suggestion)))), /* @__PURE__ */ React.createElement("div", { className: "flex gap-3 pt-4" }, /* @__PURE__ */ React.createElement("button", { type: "submit", className: "flex-1 px-6 py-3 bg-gradient-to-r from-blue-600 to-blue-700 hover:from-blue-700 hover:to-blue-800 text-white rounded-lg font-semibold shadow-lg" }, "Cr\xE9er l'Intervention"), /* @__PURE__ */ React.createElement("button", { type: "button", onClick: onClose, className: "px-6 py-3 bg-gray-100 hover:bg-gray-200 text-gray-700 rounded-lg font-semibold" }, "Annuler")))));
+}
+ReactDOM.render(/* @__PURE__ */ React.createElement(App, null), document.getElementById("root"));
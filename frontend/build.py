@@ -0,0 +1,76 @@
+"""Construction du tableau de bord : JSX précompilé, CSS Tailwind purgé.
+
+    pip install -r frontend/requirements.txt
+    python frontend/build.py
+
+Les fichiers produits dans dist/ portent l'empreinte de leur contenu
+(app.3f2a9c81d0e4.js), avec une copie gzip à côté ; dist/manifest.json
+associe chaque nom logique à son fichier. Flask les sert sous /assets/.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+from esbuild_py import transform
+
+FRONTEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DIST_DIR = os.path.join(os.path.dirname(FRONTEND_DIR), 'dist')
+
+# Bibliothèques déjà minifiées, copiées telles quelles (licence MIT en en-tête)
+VENDOR_FILES = {
+    'react.js': 'vendor/react.production.min.js',
+    'react-dom.js': 'vendor/react-dom.production.min.js',
+}
+
+def build_js():
+    """app.jsx -> JavaScript (React.createElement, React global)"""
+    with open(os.path.join(FRONTEND_DIR, 'app.jsx'), encoding='utf-8') as f:
+        source = f.read()
+    code = transform(source)
+    # esbuild_py renvoie une chaîne vide en cas d'erreur de syntaxe
+    if not code:
+        sys.exit('Erreur : app.jsx ne se compile pas (vérifier la syntaxe JSX)')
+    return code.encode('utf-8')
+
+def build_css():
+    """app.css -> CSS minifié ne contenant que les classes utilisées"""
+    result = subprocess.run(
+        ['tailwindcss', '--input', 'app.css', '--minify'],
+        cwd=FRONTEND_DIR, capture_output=True, check=True
+    )
+    return result.stdout
+
+def write_asset(name, body):
+    """Écrire body sous un nom haché (et sa version gzip) ; renvoie ce nom"""
+    stem, ext = os.path.splitext(name)
+    hashed = f'{stem}.{hashlib.sha256(body).hexdigest()[:12]}{ext}'
+    with open(os.path.join(DIST_DIR, hashed), 'wb') as f:
+        f.write(body)
+    with open(os.path.join(DIST_DIR, hashed + '.gz'), 'wb') as f:
+        f.write(gzip.compress(body, 9, mtime=0))
+    return hashed
+
+def main():
+    assets = {'app.js': build_js(), 'app.css': build_css()}
+    for name, path in VENDOR_FILES.items():
+        with open(os.path.join(FRONTEND_DIR, path), 'rb') as f:
+            assets[name] = f.read()
+    
+    # Les anciens fichiers hachés sont retirés : dist/ ne contient que la version courante
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+    os.makedirs(DIST_DIR)
+    manifest = {name: write_asset(name, body) for name, body in sorted(assets.items())}
+    with open(os.path.join(DIST_DIR, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
+    
+    for name, hashed in manifest.items():
+        size = os.path.getsize(os.path.join(DIST_DIR, hashed))
+        print(f'{name:<14} -> dist/{hashed} ({size} octets)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+"""Configuration gunicorn, lue automatiquement depuis le répertoire courant :
+
+    pip install -r requirements-server.txt
+    gunicorn
+
+Un seul worker gevent : chaque requête, et chaque flux /api/events ouvert,
+est un greenlet et non un thread. Les événements sont diffusés en mémoire,
+d'où un processus unique. Le travail SQLite long (lots d'écriture, imports,
+maintenance, index d'autocomplétion) passe par run_blocking, dans le pool de
+threads système du hub.
+"""
+import subprocess
+import sys
+
+wsgi_app = 'app:app'
+bind = '0.0.0.0:5000'
+worker_class = 'gevent'
+workers = 1
+# Connexions simultanées du worker, flux d'événements compris
+worker_connections = 2000
+# Worker relancé s'il cesse de se signaler au maître pendant ce délai
+# (boucle d'événements bloquée)
+timeout = 30
+# Arrêt : les flux /api/events ne se terminent jamais d'eux-mêmes, inutile
+# d'attendre plus longtemps les requêtes en cours
+graceful_timeout = 5
+
+def on_starting(server):
+    # Base créée ou migrée avant le lancement du worker, dans un processus à
+    # part : importer app dans le maître précéderait le monkey-patching gevent
+    subprocess.run([sys.executable, '-c', 'import app; app.init_db()'], check=True)
@@ -0,0 +1,47 @@
+"""Fixtures communes : application sur une base temporaire"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """Module app sur une base neuve (et son archive) dans tmp_path"""
+    monkeypatch.setattr(app_module, 'DATABASE', str(tmp_path / 'fme_tracker.db'))
+    monkeypatch.setattr(app_module, 'MAINTENANCE_ENABLED', False)
+    app_module.init_db()
+    return app_module
+
+@pytest.fixture
+def client(app):
+    return app.app.test_client()
+
+@pytest.fixture
+def cli(app):
+    """Lancer une commande flask : cli('rebuild-stats', '--check')"""
+    runner = app.app.test_cli_runner()
+    
+    def invoke(*args):
+        result = runner.invoke(args=list(args))
+        assert result.exit_code == 0, result.output
+        return result.output
+    
+    return invoke
+
+def intervention(**fields):
+    """Champs d'une intervention valide, complétés ou remplacés par fields"""
+    data = {
+        'fme_name': 'Jean Dupont',
+        'company_name': 'Telco Services',
+        'phone_number': '0600000000',
+        't_number': 'T1',
+        'site_name': 'Site 1',
+        'initial_state': 'Down',
+        'action': 'Remplacement batterie',
+    }
+    data.update(fields)
+    return data
@@ -0,0 +1,50 @@
+"""Interventions archivées : listes, agrégats de durées"""
+from conftest import intervention
+
+def closed(arrival_time, departure_time, **fields):
+    return intervention(arrival_time=arrival_time, departure_time=departure_time,
+                        final_state='up', status='termine', **fields)
+
+def all_pages(client, query):
+    ids, cursor = [], ''
+    while True:
+        response = client.get(f'/api/interventions?{query}&limit=2&cursor={cursor}')
+        ids.extend(row['id'] for row in response.get_json())
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return ids
+
+def test_archive_pages_merge_both_databases(client, cli):
+    client.post('/api/interventions/bulk', json=[
+        closed('2024-01-01 08:00:00', '2024-01-01 09:00:00'),
+        intervention(arrival_time='2024-01-02 08:00:00'),
+        closed('2024-01-03 08:00:00', '2024-01-03 09:00:00', t_number='T2'),
+        intervention(arrival_time='2024-01-04 08:00:00', t_number='T2'),
+        closed('2024-01-05 08:00:00', '2024-01-05 09:00:00'),
+    ])
+    cli('archive-interventions', '--days', '90')
+    
+    assert all_pages(client, 'archive=true') == [5, 4, 3, 2, 1]
+    assert all_pages(client, 'archive=true&status=termine') == [5, 3, 1]
+    assert all_pages(client, 'archive=true&q=T2') == [4, 3]
+    assert all_pages(client, '') == [4, 2]
+
+def test_delete_in_partly_archived_day_keeps_rollup_extremes(client, cli):
+    client.post('/api/interventions/bulk', json=[
+        closed('2024-01-01 08:00:00', '2024-01-01 09:00:00'),
+        closed('2024-01-01 10:00:00', '2024-01-01 15:00:00'),
+        intervention(arrival_time='2024-01-01 11:00:00'),
+    ])
+    cli('archive-interventions', '--days', '90')
+    # Fermée aujourd'hui : la plus longue durée du jour, seule dans la base principale
+    assert client.put('/api/interventions/3/close', json={'final_state': 'up'}).status_code == 200
+    cli('rebuild-rollups', '--check')
+    
+    # Fermée à nouveau, puis supprimée : minimum et maximum relus dans l'archive
+    client.put('/api/interventions/3/close', json={'final_state': 'up'})
+    cli('rebuild-rollups', '--check')
+    assert client.delete('/api/interventions/3').status_code == 200
+    
+    cli('rebuild-rollups', '--check')
+    point, = client.get('/api/stats/timeseries?date_from=2024-01-01&date_to=2024-01-01').get_json()['points']
+    assert (point['count'], point['min_seconds'], point['max_seconds']) == (2, 3600, 18000)
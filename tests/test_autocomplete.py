@@ -0,0 +1,48 @@
+"""Autocomplétion : réponses SQL tant que l'index n'est pas prêt"""
+import threading
+
+import pytest
+
+from conftest import intervention
+
+@pytest.fixture
+def blocked_index(app, monkeypatch):
+    """Construction de l'index suspendue jusqu'à release.set()"""
+    release = threading.Event()
+    scan = app.autocomplete._scan
+    
+    def slow_scan():
+        release.wait(10)
+        return scan()
+    
+    monkeypatch.setattr(app, 'AUTOCOMPLETE_READY_WAIT_MS', 20)
+    monkeypatch.setattr(app.autocomplete, '_scan', slow_scan)
+    yield release
+    release.set()
+
+def names(client, kind, q):
+    return client.get(f'/api/autocomplete?kind={kind}&q={q}').get_json()
+
+def test_search_falls_back_to_sql_while_index_builds(app, client, blocked_index):
+    client.post('/api/interventions', json=intervention(t_number='T7', site_name='Château Nord'))
+    client.post('/api/interventions', json=intervention(t_number='T8', site_name='Gare Sud', fme_name='Élise Martin'))
+    
+    assert names(client, 'sites', 'chat') == [{'t_number': 'T7', 'site_name': 'Château Nord'}]
+    assert names(client, 'sites', 'sud') == [{'t_number': 'T8', 'site_name': 'Gare Sud'}]
+    assert [row['fme_name'] for row in names(client, 'fme', 'elise')] == ['Élise Martin']
+    assert names(client, 'actions', 'rempl') == [{'action': 'Remplacement batterie'}]
+    assert not app.autocomplete.ready.is_set()
+    
+    blocked_index.set()
+    assert app.autocomplete.ready.wait(10)
+    assert names(client, 'sites', 'chat') == [{'t_number': 'T7', 'site_name': 'Château Nord'}]
+
+def test_search_falls_back_to_sql_after_failed_build(app, client, monkeypatch):
+    def failing_scan():
+        raise RuntimeError('base indisponible')
+    
+    # Avant la première requête, qui lance la construction
+    monkeypatch.setattr(app.autocomplete, '_scan', failing_scan)
+    client.post('/api/interventions', json=intervention(company_name='Réseaux Ouest'))
+    
+    assert [row['company_name'] for row in names(client, 'companies', 'res')] == ['Réseaux Ouest']
@@ -0,0 +1,81 @@
+"""Données initiales du tableau de bord : sélection des listes (lists=),
+lecture de toutes les listes dans un même instantané"""
+import sqlite3
+
+from conftest import intervention
+
+PAGE_KEYS = {'version', 'interventions', 'next_cursor'}
+
+def populate(client):
+    client.post('/api/interventions/bulk', json=[
+        intervention(arrival_time='2024-01-01 08:00:00'),
+        intervention(arrival_time='2024-01-02 08:00:00', t_number='T2', site_name='Site 2',
+                     fme_name='Élise Martin', company_name='Réseaux Ouest', action='Contrôle alarme'),
+    ])
+
+def test_lists_selection(client):
+    populate(client)
+    full = client.get('/api/bootstrap').get_json()
+    assert set(full) == PAGE_KEYS | {'sites', 'companies', 'fme', 'suggestions'}
+    assert [row['id'] for row in full['interventions']] == [2, 1]
+    assert [row['t_number'] for row in full['sites']] == ['T1', 'T2']
+    assert full['suggestions'] == ['Contrôle alarme', 'Remplacement batterie']
+    
+    data = client.get('/api/bootstrap?lists=companies').get_json()
+    assert set(data) == PAGE_KEYS | {'companies'}
+    assert data['companies'] == full['companies']
+    assert data['interventions'] == full['interventions']
+    
+    data = client.get('/api/bootstrap?lists=sites,fme').get_json()
+    assert set(data) == PAGE_KEYS | {'sites', 'fme'}
+    assert data['fme'] == full['fme']
+    # lists vide : première page seule
+    assert set(client.get('/api/bootstrap?lists=').get_json()) == PAGE_KEYS
+    
+    columnar = client.get('/api/bootstrap?lists=sites&format=columnar').get_json()
+    assert set(columnar) == PAGE_KEYS | {'sites'}
+    sites = columnar['sites']
+    assert sites['values'][sites['columns'].index('t_number')] == ['T1', 'T2']
+    
+    response = client.get('/api/bootstrap?lists=sites,tickets')
+    assert response.status_code == 400
+    assert 'lists' in response.get_json()['error']
+
+def test_lists_come_from_one_snapshot(app, client, monkeypatch):
+    populate(client)
+    before = client.get('/api/bootstrap').get_json()
+    query_sites = app.query_sites
+    
+    def write_then_query_sites(cursor):
+        # Écriture validée par une autre connexion après la lecture de la
+        # version et des interventions, avant celle des listes
+        conn = sqlite3.connect(app.DATABASE)
+        conn.execute('DELETE FROM intervention_records WHERE id = 2')
+        conn.execute("INSERT INTO sites (t_number, site_name) VALUES ('T9', 'Gare Sud')")
+        conn.execute("INSERT INTO companies (company_name) VALUES ('Réseaux Est')")
+        conn.execute('''
+            INSERT INTO fme (fme_name, company_id, phone_number)
+            SELECT 'Paul Leroy', id, '0600000009' FROM companies WHERE company_name = 'Réseaux Est'
+        ''')
+        conn.commit()
+        conn.close()
+        return query_sites(cursor)
+    
+    # limit différent à chaque requête : réponses calculées, pas lues dans result_cache
+    monkeypatch.setattr(app, 'query_sites', write_then_query_sites)
+    during = client.get('/api/bootstrap?limit=50').get_json()
+    monkeypatch.setattr(app, 'query_sites', query_sites)
+    
+    # Tout est lu avant l'écriture, version comprise
+    assert during['version'] == before['version']
+    assert [row['id'] for row in during['interventions']] == [2, 1]
+    for name in ('sites', 'companies', 'fme', 'suggestions'):
+        assert during[name] == before[name], name
+    
+    after = client.get('/api/bootstrap?limit=100').get_json()
+    assert after['version'] > before['version']
+    assert [row['id'] for row in after['interventions']] == [1]
+    assert [row['t_number'] for row in after['sites']] == ['T1', 'T2', 'T9']
+    assert 'Réseaux Est' in [row['company_name'] for row in after['companies']]
+    assert 'Paul Leroy' in [row['fme_name'] for row in after['fme']]
+    assert after['suggestions'] == ['Remplacement batterie']
@@ -0,0 +1,72 @@
+"""Import en masse : numéros de ticket, erreurs par ligne, fuseaux"""
+import time
+
+from conftest import intervention
+
+def bulk_row(**fields):
+    return intervention(arrival_time='2024-01-01 08:00:00', **fields)
+
+def tickets(client):
+    return sorted(row['ticket_number'] for row in client.get('/api/interventions?archive=true&limit=500').get_json())
+
+def test_auto_ticket_skips_supplied_ticket_of_same_chunk(client, cli):
+    response = client.post('/api/interventions/bulk', json=[
+        bulk_row(ticket_number='TKT-20240101-0001'),
+        bulk_row(),
+    ])
+    
+    assert response.status_code == 200
+    assert response.get_json() == {'success': True, 'imported': 2, 'errors': []}
+    assert tickets(client) == ['TKT-20240101-0001', 'TKT-20240101-0002']
+    cli('rebuild-stats', '--check')
+
+def test_auto_ticket_skips_existing_ticket_missing_from_sequence(app, client):
+    client.post('/api/interventions/bulk', json=[bulk_row(ticket_number='TKT-20240101-0003')])
+    # Séquence en retard sur les tickets présents (base restaurée, ancien import)
+    conn = app.connect_db()
+    conn.execute('DELETE FROM ticket_sequences')
+    conn.commit()
+    conn.close()
+    
+    response = client.post('/api/interventions/bulk', json=[bulk_row(), bulk_row()])
+    
+    assert response.get_json()['imported'] == 2
+    assert tickets(client) == ['TKT-20240101-0003', 'TKT-20240101-0004', 'TKT-20240101-0005']
+
+def test_rejected_chunk_is_reported_per_row(app, client, monkeypatch):
+    monkeypatch.setattr(app, 'BULK_CHUNK_SIZE', 2)
+    # Contrainte violée seulement à l'insertion : le lot entier est annulé
+    conn = app.connect_db()
+    conn.execute('''CREATE TRIGGER reject_comment BEFORE INSERT ON intervention_records
+        WHEN NEW.comment = 'refus' BEGIN SELECT RAISE(ABORT, 'commentaire refusé'); END''')
+    conn.commit()
+    conn.close()
+    
+    response = client.post('/api/interventions/bulk', json=[
+        bulk_row(ticket_number='TKT-20240101-0001'),
+        bulk_row(ticket_number='TKT-20240101-0001'),
+        bulk_row(comment='refus'),
+        bulk_row(),
+        bulk_row(),
+    ])
+    
+    data = response.get_json()
+    assert response.status_code == 200
+    assert data['imported'] == 2
+    assert [error['row'] for error in data['errors']] == [2, 3, 4]
+    assert 'existe déjà' in data['errors'][0]['error']
+    assert data['errors'][1]['error'].startswith('Lot non importé')
+
+def test_timezone_offset_is_converted_to_local_time(client, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setenv('TZ', 'Europe/Paris')
+        time.tzset()
+        response = client.post('/api/interventions/bulk', json=[
+            intervention(arrival_time='2024-01-01T10:00:00+02:00'),
+            intervention(arrival_time='2024-01-01T10:00:00Z', t_number='T2'),
+        ])
+    time.tzset()
+    
+    assert response.get_json()['imported'] == 2
+    rows = client.get('/api/interventions?archive=true').get_json()
+    assert sorted(row['arrival_time'] for row in rows) == ['2024-01-01 09:00:00', '2024-01-01 11:00:00']
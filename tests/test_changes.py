@@ -0,0 +1,93 @@
+"""Synchronisation delta (/api/changes) : modifications, suppressions,
+purge des tombstones"""
+from conftest import intervention
+
+def version(client):
+    return client.get('/api/changes').get_json()['version']
+
+def changes(client, since, query=''):
+    return client.get(f'/api/changes?since={since}{query}').get_json()
+
+def test_insert_update_and_delete_are_listed_after_since(app, client):
+    start = version(client)
+    created = client.post('/api/interventions', json=intervention()).get_json()
+    
+    delta = changes(client, start)
+    assert [row['id'] for row in delta['interventions']] == [created['id']]
+    assert delta['interventions'][0]['ticket_number'] == created['ticket_number']
+    assert delta['companies'] == [{'id': 1, 'company_name': 'Telco Services'}]
+    assert [site['t_number'] for site in delta['sites']] == ['T1']
+    assert delta['removed'] == []
+    assert delta['version'] > start
+    
+    after_create = delta['version']
+    client.put(f'/api/interventions/{created["id"]}/close', json={'final_state': 'up', 'comment': 'OK'})
+    delta = changes(client, after_create)
+    assert [(row['id'], row['status'], row['comment']) for row in delta['interventions']] == [
+        (created['id'], 'termine', 'OK')]
+    # Entreprises, FME et sites inchangés depuis after_create
+    assert delta['companies'] == delta['fme'] == delta['sites'] == []
+    
+    after_close = delta['version']
+    client.delete(f'/api/interventions/{created["id"]}')
+    delta = changes(client, after_close)
+    assert delta['interventions'] == []
+    assert delta['removed'] == [created['id']]
+    # Tombstone toujours servie à un client resté avant la création
+    assert changes(client, start)['removed'] == [created['id']]
+    assert changes(client, delta['version']) == {
+        'version': delta['version'], 'interventions': [], 'removed': [],
+        'companies': [], 'fme': [], 'sites': []}
+
+def test_row_version_moves_forward_on_close(app, client):
+    created = client.post('/api/interventions', json=intervention()).get_json()
+    conn = app.connect_db(readonly=True)
+    row_version = lambda: conn.execute('SELECT row_version FROM intervention_records WHERE id = ?',
+                                       (created['id'],)).fetchone()[0]
+    try:
+        before = row_version()
+        client.put(f'/api/interventions/{created["id"]}/close', json={'final_state': 'up'})
+        assert row_version() > before
+        assert row_version() == version(client)
+    finally:
+        conn.close()
+
+def test_filtered_feed_lists_rows_leaving_the_filter_as_removed(client):
+    start = version(client)
+    created = client.post('/api/interventions', json=intervention()).get_json()
+    client.put(f'/api/interventions/{created["id"]}/close', json={'final_state': 'up'})
+    
+    delta = changes(client, start, '&status=en_cours')
+    assert delta['interventions'] == []
+    assert delta['removed'] == [created['id']]
+
+def test_since_older_than_pruned_version_forces_reset(app, client):
+    first = client.post('/api/interventions', json=intervention()).get_json()
+    start = version(client)
+    client.delete(f'/api/interventions/{first["id"]}')
+    
+    # Tombstone expirée : purgée à la suppression suivante
+    conn = app.connect_db()
+    conn.execute("UPDATE intervention_tombstones SET deleted_at = datetime('now', '-30 days')")
+    conn.commit()
+    conn.close()
+    second = client.post('/api/interventions', json=intervention()).get_json()
+    client.delete(f'/api/interventions/{second["id"]}')
+    
+    current = version(client)
+    assert changes(client, start) == {'version': current, 'reset': True}
+    assert changes(client, current + 1) == {'version': current, 'reset': True}
+    assert 'reset' not in changes(client, current)
+
+def test_feed_is_not_served_from_result_cache(app, client):
+    start = version(client)
+    client.post('/api/interventions', json=intervention())
+    assert [row['comment'] for row in changes(client, start)['interventions']] == [None]
+    
+    # Écriture d'un autre processus (commande flask) : result_cache n'en sait rien
+    conn = app.connect_db()
+    conn.execute("UPDATE intervention_records SET comment = 'Hors application'")
+    conn.commit()
+    conn.close()
+    
+    assert [row['comment'] for row in changes(client, start)['interventions']] == ['Hors application']
@@ -0,0 +1,210 @@
+"""Conversion d'une base d'avant le schéma compact (table interventions) :
+au démarrage (migration 7) et par lots (commande compact-interventions)"""
+import sqlite3
+
+import pytest
+
+# Schéma d'origine, avant toute migration (PRAGMA user_version = 0)
+LEGACY_SCHEMA = '''
+    CREATE TABLE companies (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        company_name TEXT UNIQUE NOT NULL,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE fme (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fme_name TEXT NOT NULL,
+        company_id INTEGER NOT NULL,
+        phone_number TEXT NOT NULL,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(fme_name, company_id),
+        FOREIGN KEY (company_id) REFERENCES companies (id)
+    );
+    CREATE TABLE sites (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        t_number TEXT UNIQUE NOT NULL,
+        site_name TEXT NOT NULL,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE interventions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ticket_number TEXT UNIQUE NOT NULL,
+        fme_id INTEGER NOT NULL,
+        t_number TEXT NOT NULL,
+        site_name TEXT NOT NULL,
+        initial_state TEXT NOT NULL,
+        action TEXT NOT NULL,
+        arrival_time TEXT NOT NULL,
+        departure_time TEXT,
+        final_state TEXT,
+        comment TEXT,
+        status TEXT DEFAULT 'en_cours',
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (fme_id) REFERENCES fme (id)
+    );
+'''
+
+COMPANIES = [(1, 'Telco Services'), (2, 'Réseaux Ouest')]
+FMES = [(1, 'Jean Dupont', 1, '0600000001'), (2, 'Élise Martin', 2, '0600000002'), (3, 'Paul Leroy', 2, '0600000003')]
+SITES = [(1, 'T1', 'Site 1'), (2, 'T2', 'Gare Sud'), (3, 'T3', 'Château Nord')]
+# (id, ticket, fme, T-Number, site, état initial, action, arrivée, départ, état final, commentaire, statut)
+INTERVENTIONS = [
+    (1, 'TKT-20240101-0001', 1, 'T1', 'Site 1', 'down', 'Remplacement batterie',
+     '2024-01-01 08:00:00', '2024-01-01 09:30:00', 'up', 'RAS', 'termine'),
+    (2, 'TKT-20240101-0002', 2, 'T2', 'Gare Sud (quai 2)', 'down', 'Redémarrage',
+     '2024-01-01 10:00:00', '2024-01-01 10:20:00', 'down', None, 'termine'),
+    (3, 'TKT-20240102-0001', 3, 'T3', 'Château Nord', 'up', 'Contrôle alarme',
+     '2024-01-02 07:00:00', None, None, None, 'en_cours'),
+    (4, 'TKT-20240102-0002', 1, 'T2', 'Gare Sud', 'down', 'Remplacement batterie',
+     '2024-01-02 11:00:00', '2024-01-02 15:00:00', 'up', 'Pièce changée', 'termine'),
+    (5, 'TKT-20240103-0001', 2, 'T1', 'Site 1', 'down', 'Redémarrage',
+     '2024-01-03 09:00:00', None, None, 'En attente', 'en_cours'),
+    (6, 'TKT-20240103-0002', 3, 'T3', 'Château Nord', 'down', 'Remplacement batterie',
+     '2024-01-03 13:00:00', '2024-01-03 13:45:00', 'up', None, 'termine'),
+    (7, 'TKT-20240103-0003', 1, 'T2', 'Gare Sud', 'up', 'Contrôle alarme',
+     '2024-01-03 16:00:00', None, None, None, 'en_cours'),
+]
+
+def create_legacy_database(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.executemany('INSERT INTO companies (id, company_name) VALUES (?, ?)', COMPANIES)
+    conn.executemany('INSERT INTO fme (id, fme_name, company_id, phone_number) VALUES (?, ?, ?, ?)', FMES)
+    conn.executemany('INSERT INTO sites (id, t_number, site_name) VALUES (?, ?, ?)', SITES)
+    conn.executemany('''
+        INSERT INTO interventions (id, ticket_number, fme_id, t_number, site_name, initial_state, action,
+            arrival_time, departure_time, final_state, comment, status, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [row + (row[7],) for row in INTERVENTIONS])
+    conn.commit()
+    conn.close()
+
+def snapshot(app):
+    """Liste des interventions et statistiques servies par l'API"""
+    client = app.app.test_client()
+    return client.get('/api/interventions?limit=100').get_json(), client.get('/api/stats').get_json()
+
+@pytest.fixture
+def reference(app):
+    """Réponses de l'API pour les mêmes interventions importées dans une base neuve"""
+    fme = {fme_id: (name, company_id, phone) for fme_id, name, company_id, phone in FMES}
+    companies = dict(COMPANIES)
+    rows = []
+    for (_, ticket, fme_id, t_number, site_name, initial_state, action,
+         arrival, departure, final_state, comment, status) in INTERVENTIONS:
+        name, company_id, phone = fme[fme_id]
+        rows.append({
+            'ticket_number': ticket, 'fme_name': name, 'company_name': companies[company_id],
+            'phone_number': phone, 't_number': t_number, 'site_name': site_name,
+            'initial_state': initial_state, 'action': action, 'arrival_time': arrival,
+            'departure_time': departure, 'final_state': final_state, 'comment': comment,
+            'status': status, 'created_at': arrival,
+        })
+    client = app.app.test_client()
+    # Sites d'abord : leur nom de référence est celui de la base d'origine
+    for _, t_number, site_name in SITES:
+        client.post('/api/sites', json={'t_number': t_number, 'site_name': site_name})
+    assert client.post('/api/interventions/bulk', json=rows).get_json()['imported'] == len(rows)
+    return snapshot(app)
+
+@pytest.fixture
+def legacy(app, tmp_path, monkeypatch, reference):
+    """Base d'origine dans tmp_path/legacy, devenue la base courante"""
+    (tmp_path / 'legacy').mkdir()
+    path = str(tmp_path / 'legacy' / 'fme_tracker.db')
+    create_legacy_database(path)
+    monkeypatch.setattr(app, 'DATABASE', path)
+    return path
+
+@pytest.fixture
+def legacy_v6(app, legacy, monkeypatch):
+    """Base d'origine migrée jusqu'à la version 6 : table interventions
+    encore en place, à convertir par compact-interventions"""
+    with monkeypatch.context() as patch:
+        patch.setattr(app, 'MIGRATIONS', {version: migration for version, migration in app.MIGRATIONS.items()
+                                          if version <= 6})
+        patch.setattr(app, 'SCHEMA_VERSION', 6)
+        app.init_db()
+    conn = app.connect_db()
+    assert app.is_legacy_interventions(conn.cursor())
+    conn.close()
+    return legacy
+
+def assert_converted(app, reference):
+    conn = app.connect_db(readonly=True)
+    try:
+        assert not app.is_legacy_interventions(conn.cursor())
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == app.SCHEMA_VERSION
+        tickets = [row[0] for row in conn.execute('SELECT ticket_number FROM interventions ORDER BY id')]
+        assert tickets == [row[1] for row in INTERVENTIONS]
+        open_rows = conn.execute('''
+            SELECT id, departure_time, final_state FROM interventions WHERE status = 'en_cours' ORDER BY id
+        ''').fetchall()
+        assert [tuple(row) for row in open_rows] == [(3, None, None), (5, None, None), (7, None, None)]
+    finally:
+        conn.close()
+    
+    interventions, stats = snapshot(app)
+    # Mêmes lignes, champ pour champ (les ids sont ceux de la base d'origine)
+    assert [row['id'] for row in interventions] == [7, 6, 5, 4, 3, 2, 1]
+    assert interventions == reference[0]
+    assert stats == reference[1]
+
+def test_init_db_converts_legacy_database(app, legacy, reference, cli):
+    app.init_db()
+    
+    assert_converted(app, reference)
+    assert 'déjà au schéma compact' in cli('compact-interventions')
+    assert '0 compteur(s) incorrect(s)' in cli('rebuild-stats', '--check')
+    cli('rebuild-rollups', '--check')
+    cli('rebuild-site-status', '--check')
+
+def test_compact_interventions_in_batches(app, legacy_v6, reference, cli):
+    output = cli('compact-interventions', '--batch-size', '3')
+    
+    assert '3 intervention(s) copiée(s)' in output and '7 intervention(s) copiée(s)' in output
+    app.init_db()
+    assert_converted(app, reference)
+    assert '0 compteur(s) incorrect(s)' in cli('rebuild-stats', '--check')
+    cli('rebuild-rollups', '--check')
+    cli('rebuild-site-status', '--check')
+
+def test_compact_interventions_resumes_after_interrupted_batch(app, legacy_v6, reference, cli, monkeypatch):
+    copy = app.copy_legacy_interventions
+    calls = []
+    
+    def interrupted(cursor, where, params=()):
+        calls.append(params)
+        if len(calls) == 2:
+            # Deuxième lot copié puis interrompu avant son COMMIT
+            copy(cursor, where, params)
+            raise KeyboardInterrupt
+        return copy(cursor, where, params)
+    
+    runner = app.app.test_cli_runner()
+    with monkeypatch.context() as patch:
+        patch.setattr(app, 'copy_legacy_interventions', interrupted)
+        result = runner.invoke(args=['compact-interventions', '--batch-size', '3'])
+    assert result.exit_code != 0
+    
+    # Seul le premier lot est validé ; la table d'origine est intacte
+    conn = app.connect_db(readonly=True)
+    assert [row[0] for row in conn.execute('SELECT id FROM intervention_records ORDER BY id')] == [1, 2, 3]
+    assert app.is_legacy_interventions(conn.cursor())
+    conn.close()
+    
+    # Modifiée et supprimée entre les deux exécutions : reprises à la bascule
+    conn = sqlite3.connect(legacy_v6)
+    conn.execute("UPDATE interventions SET comment = 'Corrigé', row_version = row_version + 1 WHERE id = 2")
+    conn.execute('DELETE FROM interventions WHERE id = 1')
+    conn.commit()
+    conn.close()
+    
+    output = cli('compact-interventions', '--batch-size', '3')
+    assert '4 intervention(s) copiée(s)' in output
+    interventions, _ = snapshot(app)
+    assert next(row for row in interventions if row['id'] == 2)['comment'] == 'Corrigé'
+    assert [row['id'] for row in interventions] == [7, 6, 5, 4, 3, 2]
+    assert '0 compteur(s) incorrect(s)' in cli('rebuild-stats', '--check')
+    cli('rebuild-rollups', '--check')
+    cli('rebuild-site-status', '--check')
@@ -0,0 +1,53 @@
+"""Créations simultanées : numéros de ticket uniques et sans trou,
+compteurs statistiques exacts"""
+import threading
+from collections import defaultdict
+
+from conftest import intervention
+
+THREADS = 300
+
+def test_concurrent_creations_allocate_unique_consecutive_tickets(app, cli):
+    barrier = threading.Barrier(THREADS)
+    responses = [None] * THREADS
+    
+    def create(index):
+        client = app.app.test_client()
+        data = intervention(
+            fme_name=f'FME {index % 20}',
+            company_name=f'Entreprise {index % 5}',
+            t_number=f'T{index % 50}',
+            site_name=f'Site {index % 50}',
+            action=f'Action {index % 7}',
+        )
+        barrier.wait()
+        response = client.post('/api/interventions', json=data)
+        responses[index] = (response.status_code, response.get_json())
+    
+    threads = [threading.Thread(target=create, args=(index,)) for index in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert all(200 <= status < 300 for status, _ in responses), [r for r in responses if r[0] >= 300]
+    tickets = [data['ticket_number'] for _, data in responses]
+    assert len(set(tickets)) == THREADS
+    
+    # Par jour (la série peut franchir minuit) : 1, 2, ..., n
+    numbers = defaultdict(list)
+    for ticket in tickets:
+        _, day, number = ticket.split('-')
+        numbers[day].append(int(number))
+    for day_numbers in numbers.values():
+        assert sorted(day_numbers) == list(range(1, len(day_numbers) + 1))
+    
+    # Entreprises, FME et sites créés une seule fois malgré les requêtes simultanées
+    client = app.app.test_client()
+    assert len(client.get('/api/companies').get_json()) == 5
+    assert len(client.get('/api/fme').get_json()) == 20
+    assert len(client.get('/api/sites').get_json()) == 50
+    
+    assert '0 compteur(s) incorrect(s)' in cli('rebuild-stats', '--check')
+    cli('rebuild-rollups', '--check')
+    cli('rebuild-site-status', '--check')
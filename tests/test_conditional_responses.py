@@ -0,0 +1,85 @@
+"""Listes de référence et résultats en cache : ETag, If-None-Match (304),
+ETag renouvelé par les écritures, variante gzip"""
+import gzip
+import json
+
+from conftest import intervention
+
+def test_if_none_match_returns_304_without_body(client):
+    client.post('/api/companies', json={'company_name': 'Telco Services'})
+    first = client.get('/api/companies')
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'no-cache'
+    etag = first.headers['ETag']
+    
+    again = client.get('/api/companies', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == etag
+    
+    # ETag inconnu (processus précédent, autre version) : liste complète
+    stale = client.get('/api/companies', headers={'If-None-Match': '"companies-0-0"'})
+    assert stale.status_code == 200
+    assert stale.data == first.data
+
+def test_etag_changes_after_adding_company_or_site(client):
+    companies = client.get('/api/companies').headers['ETag']
+    fme = client.get('/api/fme').headers['ETag']
+    sites = client.get('/api/sites').headers['ETag']
+    
+    client.post('/api/companies', json={'company_name': 'Réseaux Ouest'})
+    response = client.get('/api/companies', headers={'If-None-Match': companies})
+    assert response.status_code == 200
+    assert [row['company_name'] for row in response.get_json()] == ['Réseaux Ouest']
+    assert response.headers['ETag'] != companies
+    # La liste des FME dépend des entreprises ; celle des sites non
+    assert client.get('/api/fme', headers={'If-None-Match': fme}).status_code == 200
+    assert client.get('/api/sites', headers={'If-None-Match': sites}).status_code == 304
+    
+    # Entreprise déjà connue : rien n'est écrit, l'ETag reste valide
+    companies = response.headers['ETag']
+    client.post('/api/companies', json={'company_name': 'Réseaux Ouest'})
+    assert client.get('/api/companies', headers={'If-None-Match': companies}).status_code == 304
+    
+    client.post('/api/sites', json={'t_number': 'T9', 'site_name': 'Gare Sud'})
+    response = client.get('/api/sites', headers={'If-None-Match': sites})
+    assert response.status_code == 200
+    assert [row['t_number'] for row in response.get_json()] == ['T9']
+    assert client.get('/api/companies', headers={'If-None-Match': companies}).status_code == 304
+
+def test_gzip_variant_has_its_own_etag(client):
+    for n in range(60):
+        client.post('/api/sites', json={'t_number': f'T{n}', 'site_name': f'Site numéro {n}'})
+    plain = client.get('/api/sites')
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+    
+    compressed = client.get('/api/sites', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert len(compressed.data) < len(plain.data)
+    assert gzip.decompress(compressed.data) == plain.data
+    
+    etag = compressed.headers['ETag']
+    assert etag == plain.headers['ETag'][:-1] + '-gz"'
+    assert client.get('/api/sites', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}).status_code == 304
+    # L'ETag de la variante gzip ne valide pas le corps brut, et inversement
+    assert client.get('/api/sites', headers={'If-None-Match': etag}).status_code == 200
+    assert client.get('/api/sites', headers={'Accept-Encoding': 'gzip',
+                                             'If-None-Match': plain.headers['ETag']}).status_code == 200
+
+def test_cached_result_revalidates_until_next_write(client):
+    for n in range(10):
+        client.post('/api/interventions', json=intervention(t_number=f'T{n}', comment='x' * 200))
+    first = client.get('/api/interventions', headers={'Accept-Encoding': 'gzip'})
+    assert first.headers['Content-Encoding'] == 'gzip'
+    assert len(json.loads(gzip.decompress(first.data))) == 10
+    
+    etag = first.headers['ETag']
+    headers = {'Accept-Encoding': 'gzip', 'If-None-Match': etag}
+    assert client.get('/api/interventions', headers=headers).status_code == 304
+    
+    client.post('/api/interventions', json=intervention(t_number='T10'))
+    response = client.get('/api/interventions', headers=headers)
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert len(json.loads(gzip.decompress(response.data))) == 11
@@ -0,0 +1,87 @@
+"""Pool de connexions : connexions rendues après une erreur ou un flux,
+transactions annulées au retour, connexions de lecture en lecture seule"""
+import sqlite3
+
+import pytest
+
+from conftest import intervention
+
+def pooled(app, readonly=True):
+    """Connexions disponibles dans le pool de la base courante"""
+    return list(app._get_pool(readonly).queue)
+
+@pytest.fixture
+def warm(app, client):
+    """Une connexion de lecture dans le pool, après une première requête"""
+    client.post('/api/interventions', json=intervention())
+    client.get('/api/interventions')
+    connections = pooled(app)
+    assert len(connections) == 1
+    return connections[0]
+
+def test_connection_returned_after_error_response(app, client, warm):
+    assert client.get('/api/interventions?cursor=invalide').status_code == 400
+    assert pooled(app) == [warm]
+    
+    # Erreur dans la transaction de lecture de bootstrap : annulée au retour
+    assert client.get('/api/bootstrap?format=csv').status_code == 400
+    assert pooled(app) == [warm]
+    assert not warm.in_transaction
+
+def test_connection_returned_after_exception(app, client, warm, monkeypatch):
+    def failing_query(cursor):
+        raise sqlite3.OperationalError('disk I/O error')
+    
+    monkeypatch.setattr(app, 'query_sites', failing_query)
+    assert client.get('/api/bootstrap').status_code == 500
+    assert pooled(app) == [warm]
+    assert not warm.in_transaction
+
+def test_connection_returned_after_streamed_export(app, client, warm):
+    client.post('/api/interventions', json=intervention(t_number='T2'))
+    response = client.get('/api/export/excel')
+    # Connexion gardée par le flux jusqu'à sa fermeture
+    assert pooled(app) == []
+    assert response.data.count(b'\n') == 3
+    response.close()
+    assert pooled(app) == [warm]
+    assert not warm.in_transaction
+    
+    # Client parti après le premier morceau
+    response = client.get('/api/export/excel?format=xlsx')
+    next(iter(response.response))
+    assert pooled(app) == []
+    response.close()
+    assert pooled(app) == [warm]
+    assert not warm.in_transaction
+
+def test_pool_keeps_at_most_pool_size_connections(app, monkeypatch):
+    monkeypatch.setattr(app, 'POOL_SIZE', 2)
+    connections = [app._acquire_db(readonly=True) for _ in range(3)]
+    assert len({id(conn) for conn in connections}) == 3
+    for conn in connections:
+        app._release_db(conn, readonly=True)
+    assert pooled(app) == connections[:2]
+    with pytest.raises(sqlite3.ProgrammingError):
+        connections[2].execute('SELECT 1')
+
+def test_read_connections_reject_writes(app, client, warm):
+    with pytest.raises(sqlite3.OperationalError, match='readonly'):
+        warm.execute("INSERT INTO companies (company_name) VALUES ('Réseaux Ouest')")
+    with pytest.raises(sqlite3.OperationalError, match='readonly'):
+        warm.execute('DELETE FROM archive.intervention_records')
+    assert warm.execute('PRAGMA query_only').fetchone()[0] == 1
+    
+    conn = app._acquire_db(readonly=False)
+    assert conn.execute('PRAGMA query_only').fetchone()[0] == 0
+    app._release_db(conn, readonly=False)
+
+def test_uncommitted_write_rolled_back_on_release(app, client):
+    conn = app._acquire_db(readonly=False)
+    conn.execute("INSERT INTO companies (company_name) VALUES ('Réseaux Ouest')")
+    assert conn.in_transaction
+    app._release_db(conn, readonly=False)
+    
+    assert pooled(app, readonly=False)[-1] is conn
+    assert not conn.in_transaction
+    assert client.get('/api/companies').get_json() == []
@@ -0,0 +1,107 @@
+"""Flux /api/events servi par gunicorn et gevent (gunicorn.conf.py) :
+des centaines de clients connectés sans un thread chacun"""
+import json
+import os
+import selectors
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+
+pytest.importorskip('gevent')
+pytest.importorskip('gunicorn')
+if not os.path.exists('/proc/self/status'):
+    pytest.skip('Nombre de threads lu dans /proc', allow_module_level=True)
+
+from conftest import intervention
+
+CLIENTS = 500
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def server(tmp_path):
+    """Serveur gunicorn lancé depuis tmp_path (sa base) : (pid, port)"""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'), '-b', f'127.0.0.1:{port}'],
+        cwd=tmp_path, env=dict(os.environ, PYTHONPATH=ROOT),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/stats', timeout=1).read()
+            break
+        except OSError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise
+            time.sleep(0.1)
+    yield process.pid, port
+    # Arrêt rapide, sans attendre la fin des flux
+    process.send_signal(signal.SIGQUIT)
+    process.wait(10)
+
+def worker_threads(master_pid):
+    """Threads système du worker gunicorn"""
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+        worker = int(f.read().split()[0])
+    with open(f'/proc/{worker}/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith('Threads:'))
+
+def read_until(selector, received, marker, timeout):
+    """Lire les clients jusqu'à ce que chacun ait reçu marker ; renvoie les
+    clients qui ne l'ont pas reçu à temps"""
+    waiting = {sock for sock in received if marker not in received[sock]}
+    deadline = time.monotonic() + timeout
+    while waiting and time.monotonic() < deadline:
+        for key, _ in selector.select(timeout=0.5):
+            chunk = key.fileobj.recv(65536)
+            received[key.fileobj] += chunk
+            if marker in received[key.fileobj]:
+                waiting.discard(key.fileobj)
+    return waiting
+
+def test_hundreds_of_subscribers_without_a_thread_each(server):
+    master_pid, port = server
+    url = f'http://127.0.0.1:{port}'
+    threads_before = worker_threads(master_pid)
+    
+    selector = selectors.DefaultSelector()
+    received = {}
+    try:
+        for _ in range(CLIENTS):
+            sock = socket.create_connection(('127.0.0.1', port))
+            sock.sendall(f'GET /api/events HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n\r\n'.encode())
+            sock.setblocking(False)
+            selector.register(sock, selectors.EVENT_READ)
+            received[sock] = b''
+        assert not read_until(selector, received, b'retry:', timeout=30)
+        assert all(data.startswith(b'HTTP/1.1 200') and b'text/event-stream' in data for data in received.values())
+    
+        # Abonnés inactifs : aucun thread de plus, et le serveur répond toujours
+        assert worker_threads(master_pid) <= threads_before + 10
+        started = time.monotonic()
+        urllib.request.urlopen(f'{url}/api/stats', timeout=5).read()
+        assert time.monotonic() - started < 1
+    
+        request = urllib.request.Request(
+            f'{url}/api/interventions', data=json.dumps(intervention()).encode(),
+            headers={'Content-Type': 'application/json'}
+        )
+        created = json.loads(urllib.request.urlopen(request, timeout=5).read())
+        assert not read_until(selector, received, b'event: created', timeout=10)
+        assert all(f'"id": {created["id"]}'.encode() in data for data in received.values())
+    finally:
+        for sock in received:
+            sock.close()
+        selector.close()
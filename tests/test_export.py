@@ -0,0 +1,81 @@
+"""Export CSV et XLSX : contenu, ordre sur les deux bases, lecture au fil de l'index"""
+import csv
+import io
+
+import pytest
+
+from conftest import intervention
+
+def closed(day, **fields):
+    return intervention(arrival_time=f'{day} 08:00:00', departure_time=f'{day} 09:00:00',
+                        created_at=f'{day} 08:00:00', final_state='up', status='termine', **fields)
+
+@pytest.fixture
+def history(client, cli):
+    """Interventions 1 et 3 archivées, 2 et 4 dans la base principale"""
+    client.post('/api/interventions/bulk', json=[
+        closed('2024-01-01', comment='Ligne 1, "citée"\nsur deux lignes'),
+        intervention(arrival_time='2024-01-02 08:00:00', created_at='2024-01-02 08:00:00'),
+        closed('2024-01-03', t_number='T2'),
+        intervention(arrival_time='2024-01-04 08:00:00', created_at='2024-01-04 08:00:00',
+                     comment='Contrôle\x01\x0b fin'),
+    ])
+    cli('archive-interventions', '--days', '90')
+    assert [row['id'] for row in client.get('/api/interventions').get_json()] == [4, 2]
+    return client
+
+def test_csv_export_has_bom_header_and_merges_both_databases(app, history):
+    response = history.get('/api/export/excel')
+    
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    body = response.get_data()
+    assert body.startswith(b'\xef\xbb\xbf')
+    rows = list(csv.reader(io.StringIO(body.decode('utf-8-sig'))))
+    assert rows[0] == [header for header, _ in app.EXPORT_COLUMNS]
+    assert [row[0] for row in rows[1:]] == ['4', '3', '2', '1']
+    assert rows[4][12] == 'Ligne 1, "citée"\nsur deux lignes'
+    assert rows[2][5] == 'T2' and rows[2][10] == '2024-01-03 09:00:00'
+    # Intervention en cours : départ et état final vides
+    assert rows[3][10] == '' and rows[3][11] == ''
+
+def test_csv_export_applies_filters(history):
+    body = history.get('/api/export/excel?status=termine').get_data().decode('utf-8-sig')
+    assert [row[0] for row in csv.reader(io.StringIO(body))][1:] == ['3', '1']
+
+def test_xlsx_export_opens_in_openpyxl(app, history):
+    openpyxl = pytest.importorskip('openpyxl')
+    response = history.get('/api/export/excel?format=xlsx')
+    
+    assert response.mimetype == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    sheet = openpyxl.load_workbook(io.BytesIO(response.get_data())).active
+    rows = list(sheet.iter_rows(values_only=True))
+    assert len(rows) == 5
+    assert list(rows[0]) == [header for header, _ in app.EXPORT_COLUMNS]
+    assert [row[0] for row in rows[1:]] == [4, 3, 2, 1]
+    # Caractères de contrôle interdits en XML retirés
+    assert rows[1][12] == 'Contrôle fin'
+
+def test_xlsx_row_skips_empty_cells_and_escapes_text(app):
+    row = app._xlsx_row(3, [7, None, '', 'a<b & \x00c', 1.5])
+    assert row == (
+        '<row r="3"><c r="A3"><v>7</v></c>'
+        '<c r="D3" t="inlineStr"><is><t xml:space="preserve">a&lt;b &amp; c</t></is></c>'
+        '<c r="E3"><v>1.5</v></c></row>'
+    )
+    assert app._xlsx_column(25) == 'Z' and app._xlsx_column(26) == 'AA'
+
+def test_unfiltered_export_reads_each_database_in_index_order(app):
+    conn = app.connect_db(readonly=True)
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        list(app.export_rows(conn.cursor(), {}))
+        selects = [sql for sql in statements if sql.lstrip().startswith('SELECT')]
+        assert len(selects) == 2
+        for sql in selects:
+            plan = [row['detail'] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql)]
+            assert 'SCAN r USING INDEX idx_interventions_created_at' in plan, plan
+            assert not any('TEMP B-TREE' in line for line in plan), plan
+    finally:
+        conn.close()
@@ -0,0 +1,109 @@
+"""Formats compacts des listes (format=rows, format=columnar) : mêmes
+enregistrements que le format par défaut, pagination comprise"""
+import pytest
+
+from conftest import intervention
+
+FORMATS = ('rows', 'columnar')
+
+def decode(payload):
+    """Liste d'objets encodée par encode_rows au format rows ou columnar"""
+    columns = payload['columns']
+    if 'rows' in payload:
+        return [dict(zip(columns, row)) for row in payload['rows']]
+    assert len(payload['values']) == len(columns)
+    return [dict(zip(columns, row)) for row in zip(*payload['values'])]
+
+@pytest.fixture
+def populated(client, cli):
+    client.post('/api/interventions/bulk', json=[
+        intervention(arrival_time='2024-01-01 08:00:00', departure_time='2024-01-01 09:00:00',
+                     final_state='up', status='termine'),
+        intervention(arrival_time='2024-01-02 08:00:00', t_number='T2', site_name='Site 2', comment='Accès badge'),
+        intervention(arrival_time='2024-01-03 08:00:00', departure_time='2024-01-03 10:00:00',
+                     final_state='down', status='termine', fme_name='Élise Martin', company_name='Réseaux Ouest'),
+        intervention(arrival_time='2024-01-04 08:00:00', action='Contrôle alarme'),
+        intervention(arrival_time='2024-01-05 08:00:00', t_number='T2', site_name='Site 2', initial_state='down'),
+    ])
+    cli('archive-interventions', '--days', '90')
+
+def pages(client, path, **params):
+    """Pages successives de path (deux lignes par page) et leurs curseurs"""
+    result, cursor = [], ''
+    while True:
+        response = client.get(path, query_string={**params, 'limit': 2, 'cursor': cursor})
+        assert response.status_code == 200
+        cursor = response.headers.get('X-Next-Cursor')
+        result.append((response.get_json(), cursor))
+        if not cursor:
+            return result
+
+@pytest.mark.parametrize('format', FORMATS)
+@pytest.mark.parametrize('query', [{}, {'archive': 'true'}, {'archive': 'true', 'status': 'termine'}])
+def test_interventions_pages(client, populated, format, query):
+    default = pages(client, '/api/interventions', **query)
+    compact = pages(client, '/api/interventions', format=format, **query)
+    
+    assert len(default) == len(compact)
+    for (records, cursor), (payload, compact_cursor) in zip(default, compact):
+        assert decode(payload) == records
+        assert compact_cursor == cursor
+        if format == 'rows':
+            assert 'values' not in payload
+        else:
+            assert 'rows' not in payload
+
+@pytest.mark.parametrize('format', FORMATS)
+def test_site_timeline_pages(client, populated, format):
+    default = pages(client, '/api/sites/T1/interventions')
+    compact = pages(client, '/api/sites/T1/interventions', format=format)
+    
+    assert [len(body['interventions']) for body, _ in default] == [2, 1]
+    for (body, cursor), (compact_body, compact_cursor) in zip(default, compact):
+        assert decode(compact_body.pop('interventions')) == body.pop('interventions')
+        assert compact_body == body
+        assert compact_cursor == cursor
+
+@pytest.mark.parametrize('format', FORMATS)
+@pytest.mark.parametrize('path', ['/api/sites', '/api/companies', '/api/fme', '/api/sites/down'])
+def test_lists(client, populated, format, path):
+    records = client.get(path).get_json()
+    assert records
+    assert decode(client.get(path, query_string={'format': format}).get_json()) == records
+
+@pytest.mark.parametrize('format', FORMATS)
+def test_bootstrap_and_changes(client, populated, format):
+    default = client.get('/api/bootstrap?limit=2').get_json()
+    compact = client.get(f'/api/bootstrap?limit=2&format={format}').get_json()
+    assert compact['next_cursor'] == default['next_cursor'] is not None
+    for name in ('interventions', 'sites', 'companies', 'fme'):
+        assert decode(compact[name]) == default[name], name
+    assert compact['suggestions'] == default['suggestions']
+    
+    # Après l'archivage (qui invite à tout recharger) : une création, une clôture, une suppression
+    version = client.get('/api/changes').get_json()['version']
+    client.post('/api/interventions', json=intervention(fme_name='Paul Leroy', company_name='Réseaux Est',
+                                                        t_number='T3', site_name='Site 3'))
+    client.put('/api/interventions/4/close', json={'final_state': 'up'})
+    client.delete('/api/interventions/5')
+    default = client.get(f'/api/changes?since={version}').get_json()
+    compact = client.get(f'/api/changes?since={version}&format={format}').get_json()
+    assert [row['id'] for row in default['interventions']] == [6, 4]
+    assert default['removed'] == [5]
+    for name in ('interventions', 'companies', 'fme', 'sites'):
+        assert decode(compact[name]) == default[name], name
+    assert compact['removed'] == default['removed']
+
+def test_empty_lists_keep_their_columns(client):
+    rows = client.get('/api/interventions?format=rows').get_json()
+    columnar = client.get('/api/interventions?format=columnar').get_json()
+    assert rows['columns'] == columnar['columns'] and 'ticket_number' in rows['columns']
+    assert rows['rows'] == []
+    assert columnar['values'] == [[] for _ in columnar['columns']]
+    assert decode(rows) == decode(columnar) == []
+
+def test_unknown_format(client):
+    for path in ('/api/interventions', '/api/sites', '/api/bootstrap', '/api/changes'):
+        response = client.get(path, query_string={'format': 'csv', 'since': 0})
+        assert response.status_code == 400, path
+        assert 'format' in response.get_json()['error']
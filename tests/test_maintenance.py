@@ -0,0 +1,152 @@
+"""Maintenance : sauvegardes en ligne (backup-db), récupération de l'espace
+libre par pas bornés (incremental_vacuum), reconstruction (vacuum-db)"""
+import os
+import sqlite3
+
+import pytest
+
+from conftest import intervention
+
+@pytest.fixture
+def populated(client, cli):
+    rows = [intervention(arrival_time=f'2024-01-{day:02d} 08:00:00', departure_time=f'2024-01-{day:02d} 09:00:00',
+                         final_state='up', status='termine', t_number=f'T{day % 4}') for day in range(1, 29)]
+    rows += [intervention(arrival_time=f'2024-02-{n % 28 + 1:02d} 08:00:00', t_number=f'T{n}', comment='x' * 500)
+             for n in range(40)]
+    assert client.post('/api/interventions/bulk', json=rows).get_json()['imported'] == 68
+    cli('archive-interventions', '--days', '90')
+
+def table_counts(path):
+    conn = sqlite3.connect(path)
+    try:
+        names = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        )]
+        return {name: conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0] for name in names}
+    finally:
+        conn.close()
+
+def integrity(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('PRAGMA integrity_check').fetchall()
+    finally:
+        conn.close()
+
+def test_backup_is_consistent_snapshot(app, populated, cli, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'BACKUP_DIR', str(tmp_path / 'backups'))
+    monkeypatch.setattr(app, 'BACKUP_STEP_PAGES', 4)
+    monkeypatch.setattr(app, 'BACKUP_STEP_SLEEP_MS', 0)
+    sources = {'main': app.DATABASE, 'archive': app.archive_database()}
+    expected = {schema: table_counts(path) for schema, path in sources.items()}
+    assert expected['main']['intervention_records'] == 40
+    assert expected['archive']['intervention_records'] == 28
+    
+    # Écriture validée entre deux pas de la copie : absente de la sauvegarde
+    sleep = app.time.sleep
+    writes = []
+    
+    def write_between_steps(seconds):
+        if not writes:
+            conn = sqlite3.connect(app.DATABASE)
+            conn.execute('DELETE FROM intervention_records WHERE id = 68')
+            conn.commit()
+            conn.close()
+            writes.append(seconds)
+        sleep(seconds)
+    
+    monkeypatch.setattr(app.time, 'sleep', write_between_steps)
+    files = app.backup_database()
+    monkeypatch.setattr(app.time, 'sleep', sleep)
+    assert writes
+    
+    for schema, backup in files.items():
+        assert os.path.dirname(backup['path']) == str(tmp_path / 'backups')
+        assert backup['steps'] > 1
+        assert integrity(backup['path']) == [('ok',)]
+        assert table_counts(backup['path']) == expected[schema]
+    assert table_counts(app.DATABASE)['intervention_records'] == 39
+    assert not [name for name in os.listdir(tmp_path / 'backups') if name.endswith('.partial')]
+
+def test_backup_db_command(app, populated, cli, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'BACKUP_DIR', str(tmp_path / 'backups'))
+    output = cli('backup-db')
+    
+    paths = [line.split(' : ')[0] for line in output.splitlines()]
+    sources = (app.DATABASE, app.archive_database())
+    assert len(paths) == len(sources)
+    for path, source in zip(paths, sources):
+        root, extension = os.path.splitext(os.path.basename(source))
+        assert os.path.basename(path).startswith(root + '-') and path.endswith(extension)
+        assert integrity(path) == [('ok',)]
+        assert table_counts(path) == table_counts(source)
+
+def free_pages(path, filler_rows):
+    """Créer puis supprimer une table d'environ filler_rows Kio : pages libres de la base"""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute('CREATE TABLE filler (data BLOB)')
+        conn.executemany('INSERT INTO filler VALUES (zeroblob(1000))', [()] * filler_rows)
+        conn.commit()
+        conn.execute('DROP TABLE filler')
+        conn.commit()
+        return conn.execute('PRAGMA freelist_count').fetchone()[0]
+    finally:
+        conn.close()
+
+def counted_jobs(app, monkeypatch):
+    """Pages libres restantes après chaque job soumis à write_queue"""
+    remaining = []
+    submit = app.write_queue.submit
+    
+    def counting_submit(job):
+        future = submit(job)
+        future.add_done_callback(lambda done: remaining.append(done.result()))
+        return future
+    
+    monkeypatch.setattr(app.write_queue, 'submit', counting_submit)
+    return remaining
+
+def test_incremental_vacuum_steps_are_bounded(app, populated, monkeypatch):
+    monkeypatch.setattr(app, 'VACUUM_MIN_FREE_PAGES', 16)
+    monkeypatch.setattr(app, 'VACUUM_STEP_PAGES', 8)
+    monkeypatch.setattr(app, 'VACUUM_MAX_STEPS', 3)
+    pages = free_pages(app.DATABASE, 400)
+    assert pages > 100
+    remaining = counted_jobs(app, monkeypatch)
+    
+    # Au plus VACUUM_MAX_STEPS jobs de VACUUM_STEP_PAGES pages par passage
+    result = app.maintenance_vacuum()
+    assert result['free_pages']['main'] == pages
+    assert result['reclaimed_pages']['main'] == 24
+    assert remaining == [pages - 8, pages - 16, pages - 24]
+    
+    # Passages suivants : jusqu'à ce qu'il reste moins de VACUUM_MIN_FREE_PAGES pages
+    while app.maintenance_vacuum()['reclaimed_pages']:
+        pass
+    steps = [before - after for before, after in zip([pages] + remaining, remaining)]
+    assert all(0 < step <= 8 for step in steps)
+    assert remaining[-1] < 16
+    assert integrity(app.DATABASE) == [('ok',)]
+
+def test_vacuum_db_enables_incremental_vacuum(app, populated, cli, monkeypatch):
+    # Base créée avant auto_vacuum = INCREMENTAL
+    conn = sqlite3.connect(app.DATABASE)
+    conn.execute('PRAGMA auto_vacuum = NONE')
+    conn.execute('VACUUM')
+    conn.close()
+    before = {path: table_counts(path) for path in (app.DATABASE, app.archive_database())}
+    free_pages(app.DATABASE, 400)
+    monkeypatch.setattr(app, 'VACUUM_MIN_FREE_PAGES', 16)
+    assert 'main' not in app.maintenance_vacuum()['free_pages']
+    
+    output = cli('vacuum-db')
+    assert output.startswith('main : ') and '\narchive : ' in output
+    for path, counts in before.items():
+        conn = sqlite3.connect(path)
+        assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+        assert conn.execute('PRAGMA freelist_count').fetchone()[0] == 0
+        conn.close()
+        assert integrity(path) == [('ok',)]
+        assert table_counts(path) == counts
+    assert app.maintenance_vacuum()['free_pages'] == {'main': 0, 'archive': 0}
@@ -0,0 +1,40 @@
+"""Mesures /metrics : désactivées par défaut, séries SQL en nombre borné"""
+import re
+
+import pytest
+
+@pytest.fixture
+def instrumented(app, monkeypatch):
+    monkeypatch.setattr(app, 'METRICS_ENABLED', True)
+    monkeypatch.setattr(app, 'metrics', app.Metrics(app.METRICS_BUCKETS_MS, app.SLOW_QUERY_MS,
+                                                   app.SLOW_QUERY_LOG_SIZE, max_statements=20))
+    return app
+
+def sql_series(text):
+    return set(re.findall(r'^fme_sql_statements_total\{statement="([^"]*)"\}', text, re.M))
+
+def test_metrics_disabled_by_default(app, client):
+    assert app.METRICS_ENABLED is False
+    assert 'fme_metrics_enabled 0' in client.get('/metrics').get_data(as_text=True)
+
+def test_statement_labels_are_bounded_hashes(instrumented):
+    conn = instrumented.connect_db()
+    try:
+        # Longueurs de liste IN confondues, puis textes tous différents
+        for size in range(1, 20):
+            conn.execute(f'SELECT id FROM companies WHERE id IN ({", ".join("?" * size)})', list(range(size))).fetchall()
+        for value in range(50):
+            conn.execute(f'SELECT {value} FROM companies').fetchall()
+    finally:
+        conn.close()
+    
+    client = instrumented.app.test_client()
+    series = sql_series(client.get('/metrics').get_data(as_text=True))
+    assert len(series) <= 21
+    assert 'other' in series
+    assert all(label == 'other' or re.fullmatch(r'[0-9a-f]{12}', label) for label in series)
+    
+    texts = {entry['statement']: entry['sql'] for entry in client.get('/api/metrics/statements').get_json()['statements']}
+    assert texts[instrumented.statement_id('SELECT id FROM companies WHERE id IN (?, ?)')] == \
+        'SELECT id FROM companies WHERE id IN (?, ...)'
+    assert texts['other'] is None
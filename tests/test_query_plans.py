@@ -0,0 +1,52 @@
+"""Plans d'exécution de la liste des interventions : chaque combinaison de
+filtres passe par un index, sans parcours complet de intervention_records"""
+import itertools
+import re
+
+import pytest
+
+FILTERS = {
+    'status': 'en_cours',
+    'company': 'Telco Services',
+    'site_down': 'true',
+    'date_from': '2024-01-01',
+    'date_to': '2024-01-31',
+    'q': 'T000123',
+}
+
+def filter_combinations():
+    for size in range(len(FILTERS) + 1):
+        for names in itertools.combinations(FILTERS, size):
+            yield {name: FILTERS[name] for name in names}
+
+def query_plan(app, args, history):
+    conn = app.connect_db(readonly=True)
+    try:
+        query, params, _ = app.intervention_page_query(args, history)
+        return [row['detail'] for row in conn.execute('EXPLAIN QUERY PLAN ' + query, params)]
+    finally:
+        conn.close()
+
+def full_scans(plan):
+    """Tables parcourues en entier : SCAN sans index, hors tables virtuelles
+    (FTS) et sous-requêtes déjà filtrées (co-routines, vues matérialisées)"""
+    subqueries = {line.split()[-1] for line in plan if line.startswith(('CO-ROUTINE ', 'MATERIALIZE '))}
+    return [
+        line for line in plan
+        if re.fullmatch(r'SCAN [\w.]+', line)
+        and line.split()[1] not in subqueries
+    ]
+
+@pytest.mark.parametrize('history', [False, True], ids=['recent', 'archive'])
+@pytest.mark.parametrize('cursor', [False, True], ids=['first-page', 'next-page'])
+@pytest.mark.parametrize('args', list(filter_combinations()), ids=lambda args: '+'.join(args) or 'none')
+def test_page_query_uses_indexes(app, args, cursor, history):
+    args = dict(args)
+    if cursor:
+        args['cursor'] = app.encode_cursor('2024-01-15 08:00:00', 42)
+    
+    plan = query_plan(app, args, history)
+    
+    assert not full_scans(plan), plan
+    assert any(re.match(r'(SCAN|SEARCH) \w+ USING (COVERING )?INDEX |SEARCH \w+ USING INTEGER PRIMARY KEY', line)
+               for line in plan), plan
@@ -0,0 +1,68 @@
+"""Cache de résultats : invalidation par les écritures, éviction LRU bornée en octets"""
+from conftest import intervention
+
+def test_write_invalidates_cached_list_and_stats(app, client):
+    client.post('/api/interventions', json=intervention())
+    first = client.get('/api/interventions')
+    stats = client.get('/api/stats').get_json()
+    hits = app.result_cache.stats()['hits']
+    
+    # Sans écriture : servies par le cache, même ETag
+    again = client.get('/api/interventions')
+    assert again.headers['ETag'] == first.headers['ETag']
+    assert client.get('/api/stats').get_json() == stats
+    assert app.result_cache.stats()['hits'] == hits + 2
+    
+    generation = app.result_cache.stats()['generation']
+    created = client.post('/api/interventions', json=intervention(t_number='T2')).get_json()
+    assert app.result_cache.stats()['generation'] > generation
+    
+    after = client.get('/api/interventions')
+    assert after.headers['ETag'] != first.headers['ETag']
+    assert [row['id'] for row in after.get_json()] == [created['id'], 1]
+    assert client.get('/api/stats').get_json()['total'] == stats['total'] + 1
+    
+    # Clôture puis suppression : chaque lecture suit l'écriture précédente
+    client.put(f'/api/interventions/{created["id"]}/close', json={'final_state': 'up'})
+    assert client.get('/api/interventions').get_json()[0]['status'] == 'termine'
+    client.delete(f'/api/interventions/{created["id"]}')
+    assert [row['id'] for row in client.get('/api/interventions').get_json()] == [1]
+    assert client.get('/api/stats').get_json()['total'] == stats['total']
+
+def test_response_computed_before_a_write_is_not_stored(app):
+    cache = app.ResultCache(max_bytes=1000, max_entry_bytes=1000, max_age=30)
+    entry, generation = cache.get('liste')
+    assert entry is None
+    
+    cache.bump()
+    cache.put('liste', generation, b'[]', [])
+    assert cache.get('liste')[0] is None
+    assert cache.stats()['entries'] == 0
+
+def test_cache_evicts_least_recently_read_entries_beyond_max_bytes(app):
+    cache = app.ResultCache(max_bytes=100, max_entry_bytes=60, max_age=30)
+    generation = cache.get('a')[1]
+    cache.put('a', generation, b'a' * 40, [])
+    cache.put('b', generation, b'b' * 40, [])
+    assert cache.get('a')[0] is not None
+    
+    # 120 octets : b, lue moins récemment que a, est évincée
+    cache.put('c', generation, b'c' * 40, [])
+    assert list(cache.entries) == ['a', 'c']
+    assert cache.stats()['bytes'] == 80
+    assert cache.stats()['evictions'] == 1
+    
+    # Au-delà de max_entry_bytes : servie sans être conservée
+    cache.put('d', generation, b'd' * 61, [])
+    assert list(cache.entries) == ['a', 'c']
+
+def test_global_cache_stays_within_max_bytes(app, client, monkeypatch):
+    monkeypatch.setattr(app, 'result_cache', app.ResultCache(max_bytes=2000, max_entry_bytes=2000, max_age=30))
+    client.post('/api/interventions', json=intervention())
+    
+    for limit in range(1, 40):
+        assert client.get(f'/api/interventions?limit={limit}').status_code == 200
+    stats = app.result_cache.stats()
+    assert stats['bytes'] <= 2000
+    assert stats['evictions'] > 0
+    assert stats['entries'] < 39
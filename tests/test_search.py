@@ -0,0 +1,98 @@
+"""Recherche plein texte (tokenizer trigram) des interventions et des FME :
+sous-chaînes, requêtes courtes (LIKE), suivi des écritures, rebuild-search"""
+import sqlite3
+
+import pytest
+
+from conftest import intervention
+
+@pytest.fixture
+def client(app, monkeypatch):
+    # Réponses recalculées à chaque requête : ce sont les index qui sont testés
+    monkeypatch.setattr(app, 'RESULT_CACHE_ENABLED', False)
+    client = app.app.test_client()
+    client.post('/api/sites', json={'t_number': 'T100', 'site_name': 'Gare Montparnasse'})
+    client.post('/api/sites', json={'t_number': 'T200', 'site_name': 'Château Rouge'})
+    client.post('/api/interventions/bulk', json=[
+        intervention(t_number='T100', site_name='Gare Montparnasse', ticket_number='TKT-20240101-0001',
+                     arrival_time='2024-01-01 08:00:00'),
+        intervention(t_number='T200', site_name='Château Rouge', ticket_number='TKT-20240102-0001',
+                     fme_name='Élise Martin', company_name='Réseaux Ouest', arrival_time='2024-01-02 08:00:00'),
+        intervention(t_number='T100', site_name='Gare Montparnasse', ticket_number='TKT-20240103-0001',
+                     arrival_time='2024-01-03 08:00:00'),
+    ])
+    return client
+
+def search(client, query):
+    response = client.get('/api/interventions/search', query_string={'query': query})
+    return [row['ticket_number'] for row in response.get_json()]
+
+def search_fme(client, query):
+    response = client.get('/api/fme/search', query_string={'query': query})
+    return [row['fme_name'] for row in response.get_json()]
+
+def test_substring_match(client):
+    assert sorted(search(client, 'parnas')) == ['TKT-20240101-0001', 'TKT-20240103-0001']
+    assert search(client, 'château') == ['TKT-20240102-0001']
+    assert search(client, '20240102') == ['TKT-20240102-0001']
+    assert search(client, 'T20') == ['TKT-20240102-0001']
+    assert search(client, 'Bordeaux') == []
+    # Guillemets : cherchés tels quels, pas interprétés par MATCH
+    assert search(client, '"Gare') == []
+    
+    assert search_fme(client, 'upon') == ['Jean Dupont']
+    assert search_fme(client, 'Réseaux') == ['Élise Martin']
+
+def test_short_query_falls_back_to_like(app, client):
+    assert app.FTS_MIN_QUERY_LENGTH == 3
+    assert sorted(search(client, 'ou')) == ['TKT-20240102-0001']
+    assert sorted(search(client, 'T1')) == ['TKT-20240101-0001', 'TKT-20240103-0001']
+    assert search(client, 'zz') == []
+    
+    assert search_fme(client, 'li') == ['Élise Martin']
+    assert search_fme(client, 'Te') == ['Jean Dupont']
+
+def test_no_stale_hits_after_delete_or_update(app, client):
+    client.delete('/api/interventions/1')
+    assert search(client, 'parnas') == ['TKT-20240103-0001']
+    assert search(client, 'T1') == ['TKT-20240103-0001']
+    
+    # Écritures hors de l'application : l'index suit par ses triggers
+    conn = sqlite3.connect(app.DATABASE)
+    conn.execute("UPDATE intervention_records SET site_name = 'Gare du Nord' WHERE id = 3")
+    conn.execute("UPDATE fme SET fme_name = 'Jean Durand' WHERE fme_name = 'Jean Dupont'")
+    conn.execute("UPDATE companies SET company_name = 'Réseaux Est' WHERE company_name = 'Réseaux Ouest'")
+    conn.commit()
+    conn.close()
+    
+    assert search(client, 'parnas') == []
+    assert search(client, 'du Nord') == ['TKT-20240103-0001']
+    assert search_fme(client, 'upon') == []
+    assert search_fme(client, 'Durand') == ['Jean Durand']
+    assert search_fme(client, 'Ouest') == []
+    assert search_fme(client, 'Est') == ['Élise Martin']
+
+def test_archived_interventions_are_searched(client, cli):
+    client.put('/api/interventions/1/close', json={'final_state': 'up'})
+    cli('archive-interventions', '--days', '90')
+    assert sorted(search(client, 'parnas')) == ['TKT-20240101-0001', 'TKT-20240103-0001']
+    assert sorted(search(client, 'T1')) == ['TKT-20240101-0001', 'TKT-20240103-0001']
+
+def test_rebuild_search_restores_index(app, client, cli):
+    client.put('/api/interventions/1/close', json={'final_state': 'up'})
+    cli('archive-interventions', '--days', '90')
+    conn = sqlite3.connect(app.DATABASE)
+    conn.execute('ATTACH DATABASE ? AS archive', (app.archive_database(),))
+    conn.execute("INSERT INTO interventions_fts (interventions_fts) VALUES ('delete-all')")
+    conn.execute('DELETE FROM archive.interventions_fts')
+    conn.execute('DELETE FROM fme_fts')
+    conn.commit()
+    conn.close()
+    assert search(client, 'parnas') == []
+    assert search_fme(client, 'upon') == []
+    
+    assert 'Index de recherche reconstruit' in cli('rebuild-search')
+    assert sorted(search(client, 'parnas')) == ['TKT-20240101-0001', 'TKT-20240103-0001']
+    assert search(client, 'ou') == ['TKT-20240102-0001']
+    assert search_fme(client, 'upon') == ['Jean Dupont']
+    assert search_fme(client, 'Réseaux') == ['Élise Martin']
@@ -0,0 +1,38 @@
+"""État courant des sites (site_status) et archive"""
+from conftest import intervention
+
+def closed(arrival_time, final_state):
+    return intervention(arrival_time=arrival_time, departure_time=arrival_time[:11] + '23:00:00',
+                        final_state=final_state, status='termine')
+
+def down_sites(client):
+    return [row['t_number'] for row in client.get('/api/sites/down').get_json()]
+
+def test_delete_after_archive_falls_back_to_archived_interventions(client, cli):
+    client.post('/api/interventions/bulk', json=[
+        closed('2024-01-01 08:00:00', 'up'),
+        closed('2024-01-02 08:00:00', 'down'),
+    ])
+    cli('archive-interventions', '--days', '90')
+    assert down_sites(client) == ['T1']
+    
+    created = client.post('/api/interventions', json=intervention(initial_state='up')).get_json()
+    assert down_sites(client) == []
+    assert client.delete(f'/api/interventions/{created["id"]}').status_code == 200
+    
+    assert down_sites(client) == ['T1']
+    cli('rebuild-site-status', '--check')
+
+def test_delete_keeps_newer_archived_intervention(client, cli):
+    # Intervention ouverte ancienne (jamais archivée) et intervention plus
+    # récente archivée : la seconde reste la dernière du site
+    client.post('/api/interventions/bulk', json=[
+        intervention(arrival_time='2024-01-01 08:00:00', initial_state='up'),
+        closed('2024-01-02 08:00:00', 'down'),
+    ])
+    cli('archive-interventions', '--days', '90')
+    created = client.post('/api/interventions', json=intervention(initial_state='up')).get_json()
+    client.delete(f'/api/interventions/{created["id"]}')
+    
+    assert down_sites(client) == ['T1']
+    cli('rebuild-site-status', '--check')
@@ -0,0 +1,94 @@
+"""Durées sur site (/api/stats/timeseries) : valeurs lues dans
+duration_rollups après des clôtures de durées connues, puis des suppressions"""
+from datetime import datetime
+
+import pytest
+
+from conftest import intervention
+
+@pytest.fixture
+def clock(app, monkeypatch):
+    """clock('2024-03-04 08:10:00') : heure renvoyée par datetime.now() dans app"""
+    now = []
+    
+    class FixedDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now[-1]
+    
+    monkeypatch.setattr(app, 'datetime', FixedDatetime)
+    return lambda text: now.append(FixedDatetime.strptime(text, '%Y-%m-%d %H:%M:%S'))
+
+# (arrivée, départ) : 600 s, 1200 s et 5400 s le 4 mars, 20000 s et 100000 s le 5
+CLOSED = [
+    ('2024-03-04 08:00:00', '2024-03-04 08:10:00'),
+    ('2024-03-04 09:00:00', '2024-03-04 09:20:00'),
+    ('2024-03-04 10:00:00', '2024-03-04 11:30:00'),
+    ('2024-03-05 06:00:00', '2024-03-05 11:33:20'),
+    ('2024-03-05 07:00:00', '2024-03-06 10:46:40'),
+]
+
+@pytest.fixture
+def closed(client, clock):
+    """Interventions de CLOSED fermées par la route de clôture, plus une
+    intervention restée en cours (non comptée)"""
+    clock('2024-03-06 12:00:00')
+    rows = [intervention(arrival_time=arrival) for arrival, _ in CLOSED]
+    rows[3]['action'] = 'Redémarrage'
+    rows.append(intervention(arrival_time='2024-03-05 12:00:00'))
+    assert client.post('/api/interventions/bulk', json=rows).get_json()['imported'] == 6
+    for intervention_id, (_, departure) in enumerate(CLOSED, start=1):
+        clock(departure)
+        client.put(f'/api/interventions/{intervention_id}/close', json={'final_state': 'up'})
+
+def timeseries(client, query=''):
+    return client.get(f'/api/stats/timeseries?date_from=2024-03-01&date_to=2024-03-31&{query}').get_json()
+
+def summary(point):
+    return (point['count'], point['avg_seconds'], point['min_seconds'], point['max_seconds'], point['histogram'])
+
+def test_known_durations(client, closed):
+    data = timeseries(client)
+    assert data['buckets'] == [900, 1800, 3600, 7200, 14400, 28800, 86400]
+    first, second = data['points']
+    assert first['period'] == '2024-03-04'
+    assert summary(first) == (3, 2400, 600, 5400, [1, 1, 0, 1, 0, 0, 0, 0])
+    # Quantiles interpolés dans l'histogramme, bornés par le min et le max
+    assert (first['p50_seconds'], first['p90_seconds']) == (1350, 5400)
+    assert second['period'] == '2024-03-05'
+    assert summary(second) == (2, 60000, 20000, 100000, [0, 0, 0, 0, 0, 1, 0, 1])
+    
+    assert summary(data['totals']) == (5, 25440, 600, 100000, [1, 1, 0, 1, 0, 1, 0, 1])
+    week, = timeseries(client, 'interval=week')['points']
+    assert week['period'] == '2024-03-04'
+    assert summary(week) == summary(data['totals'])
+    
+    by_action = timeseries(client, 'interval=month&group_by=action')['points']
+    assert [(point['action'], point['count'], point['avg_seconds']) for point in by_action] == [
+        ('Redémarrage', 1, 20000), ('Remplacement batterie', 4, 26800)
+    ]
+
+def test_rollups_follow_close_again_and_delete(client, clock, closed, cli):
+    # Fermée à nouveau : l'ancienne durée (1200 s) est remplacée
+    clock('2024-03-04 09:05:00')
+    client.put('/api/interventions/2/close', json={'final_state': 'up'})
+    first = timeseries(client)['points'][0]
+    assert summary(first) == (3, 2100, 300, 5400, [2, 0, 0, 1, 0, 0, 0, 0])
+    
+    # Suppression du maximum, puis du minimum : extrêmes relus dans les interventions restantes
+    client.delete('/api/interventions/3')
+    first = timeseries(client)['points'][0]
+    assert summary(first) == (2, 450, 300, 600, [2, 0, 0, 0, 0, 0, 0, 0])
+    client.delete('/api/interventions/2')
+    first = timeseries(client)['points'][0]
+    assert summary(first) == (1, 600, 600, 600, [1, 0, 0, 0, 0, 0, 0, 0])
+    
+    # Dernière intervention terminée du jour : le jour disparaît de la série
+    client.delete('/api/interventions/1')
+    data = timeseries(client)
+    assert [point['period'] for point in data['points']] == ['2024-03-05']
+    assert summary(data['totals']) == (2, 60000, 20000, 100000, [0, 0, 0, 0, 0, 1, 0, 1])
+    # L'intervention en cours n'est jamais comptée
+    client.delete('/api/interventions/6')
+    assert summary(timeseries(client)['totals'])[0] == 2
+    cli('rebuild-rollups', '--check')
@@ -0,0 +1,102 @@
+"""File d'écriture : lots validés en une transaction, SAVEPOINT par job,
+taille des lots bornée"""
+import threading
+
+import pytest
+
+from conftest import intervention
+
+@pytest.fixture
+def held_queue(app):
+    """held_queue(batch_size) : file neuve dont le thread écrivain est
+    retenu par un premier job jusqu'à release() ; les jobs soumis
+    entre-temps sont en attente et forment les lots suivants"""
+    releases = []
+    
+    def make(batch_size):
+        started, released = threading.Event(), threading.Event()
+        releases.append(released)
+    
+        def hold(cursor):
+            started.set()
+            released.wait(10)
+    
+        write_queue = app.WriteQueue(batch_size, max_wait_ms=0)
+        write_queue.submit(hold)
+        assert started.wait(10)
+        return write_queue, released.set
+    
+    yield make
+    for released in releases:
+        released.set()
+
+def insert_company(name, fail=False):
+    def job(cursor):
+        cursor.execute('INSERT INTO companies (company_name) VALUES (?)', (name,))
+        if fail:
+            raise ValueError(name)
+        # Lignes des jobs précédents du lot, pas encore validées
+        cursor.execute("SELECT COUNT(*) FROM companies WHERE company_name LIKE 'Entreprise %'")
+        return cursor.fetchone()[0]
+    return job
+
+def company_names(app):
+    conn = app.connect_db(readonly=True)
+    try:
+        return [row[0] for row in conn.execute('SELECT company_name FROM companies ORDER BY id')]
+    finally:
+        conn.close()
+
+def test_queued_jobs_share_one_transaction(app, held_queue):
+    write_queue, release = held_queue(64)
+    futures = [write_queue.submit(insert_company(f'Entreprise {n}')) for n in range(5)]
+    assert write_queue.stats()['pending'] == 5
+    release()
+    
+    # Chaque job voit les lignes des précédents : un seul lot, une seule transaction
+    assert [future.result(10) for future in futures] == [1, 2, 3, 4, 5]
+    assert write_queue.stats() == {'batches': 2, 'jobs': 6, 'pending': 0}
+    assert company_names(app) == [f'Entreprise {n}' for n in range(5)]
+
+def test_failing_job_is_rolled_back_alone(app, held_queue):
+    write_queue, release = held_queue(64)
+    futures = [
+        write_queue.submit(insert_company('Entreprise A')),
+        write_queue.submit(insert_company('Entreprise B', fail=True)),
+        write_queue.submit(insert_company('Entreprise A')),
+        write_queue.submit(insert_company('Entreprise C')),
+    ]
+    release()
+    
+    assert futures[0].result(10) == 1
+    with pytest.raises(ValueError, match='Entreprise B'):
+        futures[1].result(10)
+    # Doublon : contrainte UNIQUE, annulée jusqu'à son SAVEPOINT
+    with pytest.raises(app.sqlite3.IntegrityError):
+        futures[2].result(10)
+    assert futures[3].result(10) == 2
+    assert write_queue.stats()['batches'] == 2
+    assert company_names(app) == ['Entreprise A', 'Entreprise C']
+
+def test_batches_respect_batch_size(app, held_queue):
+    write_queue, release = held_queue(2)
+    futures = [write_queue.submit(insert_company(f'Entreprise {n}')) for n in range(5)]
+    release()
+    
+    assert [future.result(10) for future in futures] == [1, 2, 3, 4, 5]
+    # Le job retenu, puis des lots de 2, 2 et 1
+    assert write_queue.stats() == {'batches': 4, 'jobs': 6, 'pending': 0}
+
+def test_direct_commit_without_queue(app, client, monkeypatch):
+    monkeypatch.setattr(app, 'WRITE_QUEUE_ENABLED', False)
+    before = app.write_queue.stats()
+    
+    created = client.post('/api/interventions', json=intervention()).get_json()
+    assert client.put(f'/api/interventions/{created["id"]}/close', json={'final_state': 'up'}).status_code == 200
+    assert [row['status'] for row in client.get('/api/interventions').get_json()] == ['termine']
+    
+    # Job en échec : exception levée par result(), rien n'est validé
+    with pytest.raises(ValueError):
+        app.write_queue.submit(insert_company('Entreprise A', fail=True)).result()
+    assert 'Entreprise A' not in company_names(app)
+    assert app.write_queue.stats()['jobs'] - before['jobs'] == 3